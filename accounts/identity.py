@@ -0,0 +1,108 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+UserModel = get_user_model()
+
+CLAIM_FIELDS = ("username", "email", "first_name", "last_name")
+
+
+@dataclass(frozen=True)
+class IdentityClaims:
+    subject: str
+    username: str
+    email: str
+    first_name: str
+    last_name: str
+
+    @classmethod
+    def from_identity(cls, identity: Any) -> "IdentityClaims | None":
+        """Claims of an `app.tokens.Identity`, or None without a subject."""
+        subject = getattr(getattr(identity, "subject", None), "value", None) if identity else None
+        if not subject:
+            return None
+        return cls(
+            subject=subject,
+            username=getattr(identity, "preferred_username", None) or subject,
+            email=getattr(getattr(identity, "email", None), "value", None) or "",
+            first_name=getattr(identity, "first_name", None) or "",
+            last_name=getattr(identity, "last_name", None) or "",
+        )
+
+    def values(self) -> dict[str, str]:
+        return {name: getattr(self, name) for name in CLAIM_FIELDS}
+
+
+class _IdentityCache:
+    """Per-process LRU of resolved users by subject, each entry expiring after a TTL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, tuple[float, IdentityClaims, Any]] = OrderedDict()
+
+    def get(self, claims: IdentityClaims):
+        with self._lock:
+            entry = self._items.get(claims.subject)
+            if entry is None:
+                return None
+            expires_at, cached_claims, user = entry
+            if expires_at <= time.monotonic() or cached_claims != claims:
+                del self._items[claims.subject]
+                return None
+            self._items.move_to_end(claims.subject)
+            return user
+
+    def put(self, claims: IdentityClaims, user) -> None:
+        with self._lock:
+            self._items[claims.subject] = (time.monotonic() + settings.IDENTITY_CACHE_TTL, claims, user)
+            self._items.move_to_end(claims.subject)
+            while len(self._items) > settings.IDENTITY_CACHE_SIZE:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+identity_cache = _IdentityCache()
+
+
+def _upsert(claims: IdentityClaims):
+    user = UserModel(id=claims.subject, **claims.values())
+    UserModel.objects.bulk_create(
+        [user],
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=list(CLAIM_FIELDS),
+    )
+    return user
+
+
+def resolve_user(identity: Any):
+    """
+    The local user row for a Keycloak identity, created on first sight.
+    Served from a TTL cache; the row is only written (as an upsert) when the
+    username, email or name claims differ from what is stored.
+    """
+    claims = IdentityClaims.from_identity(identity)
+    if claims is None:
+        return None
+
+    user = identity_cache.get(claims)
+    if user is None:
+        user = UserModel.objects.filter(pk=claims.subject).first()
+        if user is None:
+            user = _upsert(claims)
+        elif any(getattr(user, name) != value for name, value in claims.values().items()):
+            _upsert(claims)
+            for name, value in claims.values().items():
+                setattr(user, name, value)
+        identity_cache.put(claims, user)
+    # Callers may modify what they get; the cached instance is shared.
+    return copy.copy(user)
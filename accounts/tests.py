@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.identity import identity_cache, resolve_user
+from app.tokens import Identity
+
+CLAIMS = {
+    "sub": "student-1",
+    "preferred_username": "student",
+    "email": "student@example.com",
+    "given_name": "Sam",
+    "family_name": "Lee",
+}
+
+
+def writes(queries: CaptureQueriesContext) -> list[str]:
+    return [query["sql"] for query in queries if not query["sql"].lstrip().upper().startswith("SELECT")]
+
+
+class ResolveUserTests(TestCase):
+    def setUp(self):
+        identity_cache.clear()
+        self.addCleanup(identity_cache.clear)
+
+    def resolve(self, **claims):
+        return resolve_user(Identity.from_claims({**CLAIMS, **claims}))
+
+    def test_creates_the_user_on_first_sight(self):
+        user = self.resolve()
+
+        stored = get_user_model().objects.get(pk="student-1")
+        self.assertEqual(user.pk, stored.pk)
+        self.assertEqual(
+            (stored.username, stored.email, stored.first_name, stored.last_name),
+            ("student", "student@example.com", "Sam", "Lee"),
+        )
+
+    def test_unchanged_claims_are_not_written(self):
+        self.resolve()
+
+        with self.assertNumQueries(0):
+            self.resolve()
+
+        identity_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.resolve()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(writes(queries), [])
+
+    def test_a_changed_claim_is_upserted_once(self):
+        self.resolve()
+
+        with CaptureQueriesContext(connection) as queries:
+            user = self.resolve(email="sam@example.com")
+
+        self.assertEqual(len(writes(queries)), 1)
+        self.assertEqual(user.email, "sam@example.com")
+        self.assertEqual(get_user_model().objects.get(pk="student-1").email, "sam@example.com")
+        with self.assertNumQueries(0):
+            self.resolve(email="sam@example.com")
+
+    @override_settings(IDENTITY_CACHE_TTL=0)
+    def test_expired_entries_are_read_again(self):
+        self.resolve()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.resolve()
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(writes(queries), [])
+
+    def test_callers_get_their_own_copy(self):
+        self.resolve().email = "changed@example.com"
+
+        self.assertEqual(self.resolve().email, "student@example.com")
+
+    def test_no_subject_resolves_to_none(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolve_user(None))
@@ -1,24 +1,187 @@
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
-from pkg_auth.integrations.django import create_django_auth
-from pkg_auth.integrations.strawberry import create_strawberry_auth
-from strawberry.django.views import GraphQLView
-
-authz = create_django_auth(
-    keycloak_base_url=settings.KEYCLOAK_BASE_URL,
-    realm=settings.KEYCLOAK_REALM,
-    client_id=settings.KEYCLOAK_CLIENT_ID,
-    audience=getattr(settings, "KEYCLOAK_AUDIENCE", None),
-)
-
-strawberry_auth = create_strawberry_auth(
-    keycloak_base_url=settings.KEYCLOAK_BASE_URL,
-    realm=settings.KEYCLOAK_REALM,
-    client_id=settings.KEYCLOAK_CLIENT_ID,
-    audience=getattr(settings, "KEYCLOAK_AUDIENCE", None),
-)
-
-context_getter = strawberry_auth.make_django_context_getter(optional=True)
-
-class AuthedGraphQLView(GraphQLView):
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from strawberry.django.context import StrawberryDjangoContext
+# HTTPException has moved between packages across strawberry releases
+# (strawberry.http, lia, cross_web); the Django view module always has the
+# class its request parsing raises.
+from strawberry.django.views import AsyncGraphQLView, GraphQLView, HTTPException
+from strawberry.permission import BasePermission
+
+from app.permissions import Permission
+from app.persisted_queries import persisted_query
+from app.tokens import Identity, authenticate_request
+from surveys.etags import survey_etag
+
+
+class TokenAuthMiddleware:
+    """
+    Verifies the bearer token in-process (see app.tokens) and sets
+    `request.identity`, None for anonymous or invalid tokens.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.identity = authenticate_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Keeps RSA verification and JWKS fetches off the event loop; the
+        # verifier is thread-safe and touches no database connection.
+        request.identity = await sync_to_async(authenticate_request, thread_sensitive=False)(request)
+        return await self.get_response(request)
+
+
+@dataclass
+class AuthenticatedUser:
+    identity: Identity
+
+
+@dataclass
+class AuthContext(StrawberryDjangoContext):
+    user: AuthenticatedUser | None = None
+
+
+def context_getter(request, response) -> AuthContext:
+    # TokenAuthMiddleware has normally verified the token already.
+    identity = request.identity if hasattr(request, "identity") else authenticate_request(request)
+    return AuthContext(
+        request=request,
+        response=response,
+        user=AuthenticatedUser(identity) if identity is not None else None,
+    )
+
+
+class RequireAuth(BasePermission):
+    message = "Authentication required"
+
+    def has_permission(self, source, info, **kwargs) -> bool:
+        return getattr(info.context, "user", None) is not None
+
+
+def has_permission(identity: Identity, permission: Permission) -> bool:
+    # Permissions are roles of this service's Keycloak client (see keycloak_init),
+    # which Keycloak puts under resource_access.<client id>.roles.
+    access = identity.claims.get("resource_access") or {}
+    roles = (access.get(settings.KEYCLOAK_CLIENT_ID) or {}).get("roles") or ()
+    return permission.value in roles
+
+
+class RequirePermission(BasePermission):
+    message = "Permission denied"
+    permission: Permission
+
+    def has_permission(self, source, info, **kwargs) -> bool:
+        user = getattr(info.context, "user", None)
+        return user is not None and has_permission(user.identity, self.permission)
+
+
+class CanEnrollUsers(RequirePermission):
+    permission = Permission.ASSESSMENT_ENROLL
+
+
+class GraphQLHTTPCachingMixin:
+    """ETag/304 and Cache-Control handling shared by the sync and async views."""
+
+    def should_render_graphql_ide(self, request) -> bool:
+        # Persisted-query GETs carry no `query` parameter.
+        return "extensions" not in request.query_params and super().should_render_graphql_ide(request)
+
+    @staticmethod
+    def etag_for(data) -> str | None:
+        if isinstance(data, list):
+            return None
+        query = data.query or persisted_query(data.extensions)
+        return survey_etag(query, data.variables, data.operation_name)
+
+    @staticmethod
+    def not_modified(request, etag: str | None) -> HttpResponseNotModified | None:
+        # Survey definitions answer If-None-Match before any resolver runs.
+        if etag is None or etag not in parse_etags(request.headers.get("If-None-Match", "")):
+            return None
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    @staticmethod
+    def patch_cache_headers(request, response, etag: str | None):
+        if etag is not None and response.status_code == 200 and not getattr(request, "_graphql_has_errors", True):
+            response["ETag"] = etag
+        if request.method == "GET" and response.status_code == 200 and not response.has_header("Cache-Control"):
+            max_age = settings.GRAPHQL_GET_CACHE_MAX_AGE
+            if getattr(request, "_graphql_has_errors", True) or max_age <= 0:
+                response["Cache-Control"] = "no-store"
+            else:
+                scope = "private" if "Authorization" in request.headers else "public"
+                response["Cache-Control"] = f"{scope}, max-age={max_age}"
+            patch_vary_headers(response, ["Authorization"])
+        return response
+
+
+class AuthedGraphQLView(GraphQLHTTPCachingMixin, GraphQLView):
     def get_context(self, request, response):
-        return context_getter(request, response)
\ No newline at end of file
+        return context_getter(request, response)
+
+    def process_result(self, request, result):
+        request._graphql_has_errors = bool(result.errors)
+        return super().process_result(request, result)
+
+    def request_etag(self, request) -> str | None:
+        if request.method not in ("GET", "POST"):
+            return None
+        try:
+            data = self.parse_http_body(self.request_adapter_class(request))
+        except HTTPException:
+            return None
+        return self.etag_for(data)
+
+    def dispatch(self, request, *args, **kwargs):
+        etag = self.request_etag(request)
+        response = self.not_modified(request, etag)
+        if response is not None:
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        return self.patch_cache_headers(request, response, etag)
+
+
+class AsyncAuthedGraphQLView(GraphQLHTTPCachingMixin, AsyncGraphQLView):
+    """AuthedGraphQLView for ASGI deployments; resolvers run via django_resolver."""
+
+    async def get_context(self, request, response):
+        if not hasattr(request, "identity"):
+            request.identity = await sync_to_async(authenticate_request)(request)
+        return context_getter(request, response)
+
+    async def process_result(self, request, result):
+        request._graphql_has_errors = bool(result.errors)
+        return await super().process_result(request, result)
+
+    async def request_etag(self, request) -> str | None:
+        if request.method not in ("GET", "POST"):
+            return None
+        try:
+            data = await self.parse_http_body(self.request_adapter_class(request))
+        except HTTPException:
+            return None
+        return await sync_to_async(self.etag_for)(data)
+
+    async def dispatch(self, request, *args, **kwargs):
+        etag = await self.request_etag(request)
+        response = self.not_modified(request, etag)
+        if response is not None:
+            return response
+        response = await super().dispatch(request, *args, **kwargs)
+        return self.patch_cache_headers(request, response, etag)
@@ -6,10 +6,12 @@ from django.conf import settings
 from django.db import connections
 from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.urls import reverse
 from django.views.decorators.http import require_GET
 
+from app.metrics import registry
+
 logger = logging.getLogger(__name__)
 
 
@@ -92,3 +94,9 @@ def readyz(request):
 def startupz(request):
     """Startup endpoint: reuse readiness checks during container startup."""
     return JsonResponse({"status": "ok", "git_sha": _git_sha()}, status=200)
+
+
+@require_GET
+def metrics(request):
+    """Metrics endpoint: this worker's counters in the Prometheus text format."""
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4")
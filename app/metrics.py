@@ -0,0 +1,74 @@
+import threading
+from typing import Callable
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.kind = "counter"
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """A value read at collection time from `read`, or set explicitly."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float] | None = None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = "gauge"
+        self._read = read
+        self._value = 0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._read() if self._read is not None else self._value
+
+
+class Registry:
+    """Per-process metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, Counter | Gauge] = {}
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float] | None = None) -> Gauge:
+        return self.register(Gauge(name, help_text, read))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            try:
+                value = metric.value
+            except Exception:
+                continue
+            lines += [
+                f"# HELP {metric.name} {metric.help_text}",
+                f"# TYPE {metric.name} {metric.kind}",
+                f"{metric.name} {value}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -2,4 +2,5 @@ import enum
 
 
 class Permission(enum.Enum):
-    SURVEY_CREATE = 'surveys:create'
\ No newline at end of file
+    SURVEY_CREATE = 'surveys:create'
+    ASSESSMENT_ENROLL = 'assessments:enroll'
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Iterator
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import GraphQLError
+from strawberry.extensions import SchemaExtension
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+PERSISTED_QUERY_NOT_SUPPORTED = "PersistedQueryNotSupported"
+
+
+def _cache_key(digest: str) -> str:
+    return f"graphql:apq:{digest}"
+
+
+def _error(message: str, code: str) -> GraphQLError:
+    return GraphQLError(message, extensions={"code": code})
+
+
+def persisted_query(extensions: dict | None) -> str | None:
+    """Stored document for a hash-only APQ request, if any."""
+    persisted = (extensions or {}).get("persistedQuery")
+    if not isinstance(persisted, dict) or not persisted.get("sha256Hash"):
+        return None
+    return caches[settings.GRAPHQL_CACHE_ALIAS].get(_cache_key(str(persisted["sha256Hash"]).lower()))
+
+
+class PersistedQueriesExtension(SchemaExtension):
+    """
+    Automatic persisted queries (Apollo APQ, version 1). A request may send
+    only `extensions.persistedQuery.sha256Hash`; unknown hashes answer
+    PersistedQueryNotFound so the client retries with the full query, which
+    is then stored under its hash. Must be listed first so no other extension
+    has started when a lookup fails.
+    """
+
+    def on_operation(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        persisted = (execution_context.operation_extensions or {}).get("persistedQuery")
+        if persisted:
+            if persisted.get("version") != 1:
+                raise _error(PERSISTED_QUERY_NOT_SUPPORTED, "PERSISTED_QUERY_NOT_SUPPORTED")
+            digest = str(persisted.get("sha256Hash") or "").lower()
+            cache = caches[settings.GRAPHQL_CACHE_ALIAS]
+            if execution_context.query:
+                if hashlib.sha256(execution_context.query.encode()).hexdigest() != digest:
+                    raise _error("provided sha does not match query", "INVALID_PERSISTED_QUERY")
+                cache.set(_cache_key(digest), execution_context.query, timeout=settings.GRAPHQL_PERSISTED_QUERY_TIMEOUT)
+            else:
+                execution_context.query = cache.get(_cache_key(digest))
+                if execution_context.query is None:
+                    raise _error(PERSISTED_QUERY_NOT_FOUND, "PERSISTED_QUERY_NOT_FOUND")
+        yield
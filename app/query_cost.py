@@ -0,0 +1,226 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Collection, Iterator, Mapping
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLInputObjectType,
+    GraphQLList,
+    GraphQLNamedType,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    SelectionSetNode,
+    Undefined,
+    get_named_type,
+    get_nullable_type,
+)
+from graphql import ExecutionResult as GraphQLExecutionResult
+from graphql.utilities import get_operation_ast, value_from_ast_untyped
+from strawberry.extensions import SchemaExtension
+
+FieldKey = tuple[str, str]
+
+# Extension instances are shared by every request on the schema.
+_current: ContextVar["QueryCost | None"] = ContextVar("query_cost", default=None)
+
+
+@dataclass(frozen=True)
+class QueryCost:
+    cost: int
+    depth: int
+
+
+class _CostWalker:
+    def __init__(
+        self, schema, document, variables, weights, list_sizes, default_list_size, limit_argument, paginated_fields
+    ):
+        self.schema = schema
+        self.fragments: dict[str, FragmentDefinitionNode] = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.variables = variables or {}
+        self.weights = weights
+        self.list_sizes = list_sizes
+        self.default_list_size = default_list_size
+        self.limit_argument = limit_argument
+        self.paginated_fields = paginated_fields
+
+    def _fields(self, parent: GraphQLNamedType, selection_set: SelectionSetNode | None, seen: frozenset = frozenset()):
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                yield parent, selection
+            elif isinstance(selection, InlineFragmentNode):
+                condition = selection.type_condition
+                target = self.schema.get_type(condition.name.value) if condition else parent
+                yield from self._fields(target or parent, selection.selection_set, seen)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in seen:
+                    continue
+                target = self.schema.get_type(fragment.type_condition.name.value)
+                yield from self._fields(target or parent, fragment.selection_set, seen | {name})
+
+    def _limit(self, field_def, node: FieldNode) -> int | None:
+        # `limit: Int` directly on the field, or as a member of an input object.
+        values = {argument.name.value: argument.value for argument in node.arguments}
+        for name, argument in field_def.args.items():
+            value = value_from_ast_untyped(values[name], self.variables) if name in values else Undefined
+            if name == self.limit_argument:
+                limit = argument.default_value if value is Undefined else value
+            else:
+                input_type = get_named_type(argument.type)
+                if not isinstance(input_type, GraphQLInputObjectType) or self.limit_argument not in input_type.fields:
+                    continue
+                value = argument.default_value if value is Undefined else value
+                default = input_type.fields[self.limit_argument].default_value
+                limit = (value or {}).get(self.limit_argument, default) if isinstance(value, dict) else default
+            if isinstance(limit, int) and limit >= 0:
+                return limit
+        return None
+
+    def walk(self, parent: GraphQLNamedType, selection_set, page_size: int | None = None) -> QueryCost:
+        cost = depth = 0
+        for field_parent, node in self._fields(parent, selection_set):
+            name = node.name.value
+            if name.startswith("__") or not isinstance(field_parent, GraphQLObjectType):
+                continue
+            field_def = field_parent.fields.get(name)
+            if field_def is None:
+                continue
+            field_type = get_named_type(field_def.type)
+            is_list = isinstance(get_nullable_type(field_def.type), GraphQLList)
+            key = (field_parent.name, name)
+
+            limit = self._limit(field_def, node)
+            if is_list:
+                if limit is None and key in self.paginated_fields:
+                    limit = page_size
+                size = limit if limit is not None else self.list_sizes.get(key, self.default_list_size)
+                child_page_size = None
+            else:
+                size = 1
+                child_page_size = limit if limit is not None else page_size
+
+            child = self.walk(field_type, node.selection_set, child_page_size) if node.selection_set else QueryCost(0, 0)
+            weight = self.weights.get(key, 1 if node.selection_set else 0)
+            cost += size * (weight + child.cost)
+            depth = max(depth, child.depth + 1)
+        return QueryCost(cost=cost, depth=depth)
+
+
+def query_cost(
+    schema,
+    document,
+    operation_name: str | None,
+    variables: dict[str, Any] | None,
+    weights: Mapping[FieldKey, int],
+    list_sizes: Mapping[FieldKey, int],
+    default_list_size: int = 10,
+    limit_argument: str = "limit",
+    paginated_fields: Collection[FieldKey] = (),
+) -> QueryCost:
+    """
+    Estimated cost of an operation: each field costs its weight (1 for object
+    fields, 0 for scalars unless overridden) plus its children, times the
+    number of rows it returns. Row counts come from a `limit` argument, else
+    from `list_sizes`, else `default_list_size`. A list in
+    `paginated_fields` (such as a page's `items`) takes the `limit` of the
+    field enclosing it. Introspection is free.
+    """
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return QueryCost(cost=0, depth=0)
+    root = schema.get_root_type(operation.operation)
+    walker = _CostWalker(
+        schema, document, variables, weights, list_sizes, default_list_size, limit_argument, paginated_fields
+    )
+    return walker.walk(root, operation.selection_set)
+
+
+class QueryCostExtension(SchemaExtension):
+    """
+    Rejects operations whose estimated cost exceeds `max_cost` or whose depth
+    exceeds `max_depth` before any resolver runs, and reports the estimate
+    under `extensions.cost`. Costs depend on variables, so they are computed
+    per request after validation rather than as a (cached) validation rule.
+    The limits may be callables, read on every request.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_cost: int | Callable[[], int] | None = None,
+        max_depth: int | Callable[[], int] | None = None,
+        weights: Mapping[FieldKey, int] | None = None,
+        list_sizes: Mapping[FieldKey, int] | None = None,
+        default_list_size: int = 10,
+        paginated_fields: Collection[FieldKey] = (),
+    ):
+        self._max_cost = max_cost
+        self._max_depth = max_depth
+        self.weights = weights or {}
+        self.list_sizes = list_sizes or {}
+        self.default_list_size = default_list_size
+        self.paginated_fields = frozenset(paginated_fields)
+
+    @property
+    def max_cost(self) -> int | None:
+        return self._max_cost() if callable(self._max_cost) else self._max_cost
+
+    @property
+    def max_depth(self) -> int | None:
+        return self._max_depth() if callable(self._max_depth) else self._max_depth
+
+    def on_operation(self) -> Iterator[None]:
+        # Not reset on exit: get_results() runs after the operation hook.
+        _current.set(None)
+        yield
+
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        cost = query_cost(
+            execution_context.schema._schema,
+            execution_context.graphql_document,
+            execution_context.operation_name,
+            execution_context.variables,
+            self.weights,
+            self.list_sizes,
+            self.default_list_size,
+            paginated_fields=self.paginated_fields,
+        )
+        _current.set(cost)
+        max_cost, max_depth = self.max_cost, self.max_depth
+        error = None
+        if max_depth and cost.depth > max_depth:
+            error = GraphQLError(
+                f"Query depth {cost.depth} exceeds the maximum of {max_depth}.",
+                extensions={"code": "QUERY_TOO_DEEP", "depth": cost.depth, "maximum": max_depth},
+            )
+        elif max_cost and cost.cost > max_cost:
+            error = GraphQLError(
+                f"Query cost {cost.cost} exceeds the maximum of {max_cost}.",
+                extensions={"code": "QUERY_TOO_COSTLY", "cost": cost.cost, "maximum": max_cost},
+            )
+        if error is not None:
+            # A preset result makes strawberry skip execution entirely.
+            execution_context.result = GraphQLExecutionResult(data=None, errors=[error])
+        yield
+
+    def get_results(self) -> dict[str, Any]:
+        cost = _current.get()
+        if cost is None:
+            return {}
+        return {
+            "cost": {
+                "requested": cost.cost,
+                "maximum": self.max_cost,
+                "depth": cost.depth,
+                "maximumDepth": self.max_depth,
+            }
+        }
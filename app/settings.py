@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     "django.contrib.auth",
     'django.contrib.contenttypes',
     'django.contrib.staticfiles',
+    "django.contrib.postgres",
     "strawberry.django",
     "accounts",
     'surveys',
@@ -48,7 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "pkg_auth.integrations.django.PkgAuthMiddleware",
+    "app.auth.TokenAuthMiddleware",
     'django.middleware.common.CommonMiddleware',
 ]
 
@@ -84,6 +85,9 @@ DATABASES = {
         'PASSWORD': os.environ.get('DATABASE_PASS', 'default'),
         "HOST": os.environ.get("DATABASE_HOST", "localhost"),
         "PORT": os.environ.get("DATABASE_PORT", "5432"),
+        # Seconds a connection is kept open between requests (0 closes it
+        # after each one); see SURVEYS_LIST_CONCURRENT_COUNTS.
+        "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", "0")),
     }
 }
 
@@ -143,8 +147,106 @@ else:
 # Compute API client id from service/app name
 KEYCLOAK_CLIENT_ID = f"{SERVICE_NAME}-api"
 
+# Bearer tokens are verified in-process (app.tokens): signing keys are
+# refreshed in the background every KEYCLOAK_JWKS_REFRESH_INTERVAL seconds and
+# on an unknown key id at most every KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL.
+KEYCLOAK_AUDIENCE = os.environ.get("KEYCLOAK_AUDIENCE") or None
+KEYCLOAK_JWKS_REFRESH_INTERVAL = int(os.environ.get("KEYCLOAK_JWKS_REFRESH_INTERVAL", "300"))
+KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL = int(os.environ.get("KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL", "30"))
+KEYCLOAK_HTTP_TIMEOUT = float(os.environ.get("KEYCLOAK_HTTP_TIMEOUT", "5"))
+KEYCLOAK_TOKEN_LEEWAY = int(os.environ.get("KEYCLOAK_TOKEN_LEEWAY", "30"))
+# Verified tokens are cached by hash until they expire, at most this long.
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", "10000"))
+VERIFIED_TOKEN_CACHE_MAX_AGE = int(os.environ.get("VERIFIED_TOKEN_CACHE_MAX_AGE", "300"))
+
 
 STRAWBERRY_DJANGO = {
     "FIELD_DESCRIPTION_FROM_HELP_TEXT": True,
     "TYPE_DESCRIPTION_FROM_MODEL_DOCSTRING": True,
 }
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+# "local" keeps survey and GraphQL caches in process memory (one copy per
+# worker, so writes made through another worker are only seen once entries
+# expire); "shared" stores them in Redis at REDIS_URL.
+SURVEYS_CACHE_BACKEND = os.environ.get("SURVEYS_CACHE_BACKEND", "shared" if REDIS_URL else "local")
+_SHARED_CACHE = {
+    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+    "LOCATION": REDIS_URL,
+    "KEY_PREFIX": SERVICE_NAME,
+}
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    **{
+        alias: (
+            _SHARED_CACHE
+            if SURVEYS_CACHE_BACKEND == "shared"
+            else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": alias}
+        )
+        for alias in ("surveys", "graphql")
+    },
+}
+SURVEYS_CACHE_ALIAS = "surveys"
+# Seconds a Query.surveys result stays cached; 0 disables the cache.
+SURVEYS_LIST_CACHE_TIMEOUT = int(os.environ.get("SURVEYS_LIST_CACHE_TIMEOUT", "300"))
+# Compiled survey definitions (Query.survey): shared-cache TTL in seconds and
+# the number kept in each process.
+SURVEYS_DEFINITION_CACHE_TIMEOUT = int(os.environ.get("SURVEYS_DEFINITION_CACHE_TIMEOUT", "86400"))
+SURVEYS_DEFINITION_LOCAL_SIZE = int(os.environ.get("SURVEYS_DEFINITION_LOCAL_SIZE", "256"))
+
+# Query.surveys with totalMode=ESTIMATED reports the planner's row estimate
+# instead of running COUNT(*) once the estimate reaches this many rows.
+SURVEYS_TOTAL_ESTIMATE_THRESHOLD = int(os.environ.get("SURVEYS_TOTAL_ESTIMATE_THRESHOLD", "10000"))
+
+# Fraction of Query.surveys requests whose filter/sort shape is recorded for
+# the advise_survey_indexes command (0 disables recording).
+SURVEYS_QUERY_SHAPE_SAMPLE_RATE = float(os.environ.get("SURVEYS_QUERY_SHAPE_SAMPLE_RATE", "0.01"))
+
+# Under the async view, run a Query.surveys request's total/facets and page
+# concurrently on two extra connections. Only worth it with persistent
+# connections (DATABASE_CONN_MAX_AGE > 0); otherwise each request pays for
+# opening both.
+SURVEYS_LIST_CONCURRENT_COUNTS = os.environ.get("SURVEYS_LIST_CONCURRENT_COUNTS", "0") == "1"
+
+# Serve /graphql with the async view (set by app.asgi; see AsyncAuthedGraphQLView).
+GRAPHQL_ASYNC = os.environ.get("GRAPHQL_ASYNC", "0") == "1"
+
+# Automatic persisted queries are kept in the "graphql" cache for this many
+# seconds; parsed/validated documents in a per-process LRU of this size.
+GRAPHQL_CACHE_ALIAS = "graphql"
+GRAPHQL_PERSISTED_QUERY_TIMEOUT = int(os.environ.get("GRAPHQL_PERSISTED_QUERY_TIMEOUT", "604800"))
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.environ.get("GRAPHQL_DOCUMENT_CACHE_SIZE", "512"))
+# max-age for successful GraphQL GET responses (private when the request is
+# authenticated); 0 sends no-store.
+GRAPHQL_GET_CACHE_MAX_AGE = int(os.environ.get("GRAPHQL_GET_CACHE_MAX_AGE", "60"))
+
+# Operations estimated above this cost, or nested deeper than this, are
+# rejected before execution (see app.query_cost); 0 disables the check.
+GRAPHQL_MAX_QUERY_COST = int(os.environ.get("GRAPHQL_MAX_QUERY_COST", "50000"))
+GRAPHQL_MAX_QUERY_DEPTH = int(os.environ.get("GRAPHQL_MAX_QUERY_DEPTH", "10"))
+
+# Mutation.bulkEnrollAssessment: largest accepted cohort, and rows per INSERT.
+BULK_ENROLLMENT_MAX_SIZE = int(os.environ.get("BULK_ENROLLMENT_MAX_SIZE", "10000"))
+BULK_ENROLLMENT_BATCH_SIZE = int(os.environ.get("BULK_ENROLLMENT_BATCH_SIZE", "1000"))
+# Mutation.submitAnswers: largest accepted page of answers.
+SUBMIT_ANSWERS_MAX_SIZE = int(os.environ.get("SUBMIT_ANSWERS_MAX_SIZE", "500"))
+
+# Mutation.autosaveAnswer buffers answers in Redis at REDIS_URL ("shared",
+# survives a worker restart) or in process memory ("local", single-worker
+# deployments only: another worker's submit cannot see the buffer), or writes
+# them straight to UserAnswer ("direct", the default without Redis). Buffers
+# are flushed every AUTOSAVE_FLUSH_INTERVAL seconds (0 leaves it to section
+# submits and the flush_autosave command); a flush holds its assessment for at
+# most AUTOSAVE_FLUSH_LEASE seconds, and a submit waits AUTOSAVE_SUBMIT_WAIT
+# seconds for a running flush before giving up.
+AUTOSAVE_BACKEND = os.environ.get("AUTOSAVE_BACKEND", "shared" if REDIS_URL else "direct")
+AUTOSAVE_FLUSH_INTERVAL = float(os.environ.get("AUTOSAVE_FLUSH_INTERVAL", "5"))
+AUTOSAVE_FLUSH_LEASE = float(os.environ.get("AUTOSAVE_FLUSH_LEASE", "60"))
+AUTOSAVE_SUBMIT_WAIT = float(os.environ.get("AUTOSAVE_SUBMIT_WAIT", "5"))
+
+# Resolved Keycloak identities are cached per process (see accounts.identity).
+IDENTITY_CACHE_TTL = int(os.environ.get("IDENTITY_CACHE_TTL", "300"))
+IDENTITY_CACHE_SIZE = int(os.environ.get("IDENTITY_CACHE_SIZE", "10000"))
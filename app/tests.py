@@ -0,0 +1,385 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import jwt
+import strawberry
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from graphql import build_schema, parse
+
+from app import tokens
+from app.auth import AuthedGraphQLView, TokenAuthMiddleware, has_permission
+from app.permissions import Permission
+from app.persisted_queries import PersistedQueriesExtension
+from app.query_cost import query_cost
+from app.tokens import Identity, JWKSCache, TokenError, TokenVerifier, VerifiedTokenCache, authenticate_request
+from surveys.models import Question, Survey
+from surveys.tests import create_exam
+
+REALM_PATH = "/realms/test"
+
+
+class KeycloakStub:
+    """Serves a realm's discovery document and JWKS on localhost."""
+
+    def __init__(self):
+        self.keys: dict[str, rsa.RSAPrivateKey] = {}
+        self.requests: list[str] = []
+        self.available = True
+        self.rotate()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(self.path)
+                if not stub.available:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                if self.path == f"{REALM_PATH}/.well-known/openid-configuration":
+                    body = {"issuer": stub.issuer, "jwks_uri": f"{stub.base_url}{REALM_PATH}/protocol/openid-connect/certs"}
+                elif self.path == f"{REALM_PATH}/protocol/openid-connect/certs":
+                    body = {"keys": [stub.jwk(kid) for kid in stub.keys]}
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.issuer = f"{self.base_url}{REALM_PATH}"
+        self.well_known_url = f"{self.issuer}/.well-known/openid-configuration"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def rotate(self) -> str:
+        kid = f"key-{len(self.keys) + 1}"
+        self.keys = {kid: rsa.generate_private_key(public_exponent=65537, key_size=2048)}
+        return kid
+
+    def jwk(self, kid: str) -> dict:
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.keys[kid].public_key()))
+        return {**jwk, "kid": kid, "use": "sig", "alg": "RS256"}
+
+    def token(self, kid: str | None = None, **claims) -> str:
+        kid = kid or next(iter(self.keys))
+        now = int(time.time())
+        payload = {
+            "iss": self.issuer,
+            "sub": "user-1",
+            "aud": "itq-forms-api",
+            "exp": now + 300,
+            "iat": now,
+            "preferred_username": "alice",
+            "email": "alice@example.com",
+            "given_name": "Alice",
+            "family_name": "Doe",
+            **claims,
+        }
+        return jwt.encode(payload, self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@override_settings(KEYCLOAK_HTTP_TIMEOUT=2)
+class TokenVerifierTests(SimpleTestCase):
+    def setUp(self):
+        self.keycloak = KeycloakStub()
+        self.addCleanup(self.keycloak.stop)
+        self.jwks = JWKSCache(self.keycloak.well_known_url, refresh_interval=3600, min_refresh_interval=0)
+        self.addCleanup(self.jwks.stop)
+        self.verifier = TokenVerifier(self.jwks, VerifiedTokenCache(size=100, max_age=300), audience="itq-forms-api")
+
+    def test_verifies_token_against_discovered_jwks(self):
+        identity = self.verifier.verify(self.keycloak.token())
+
+        self.assertEqual(identity.subject.value, "user-1")
+        self.assertEqual(identity.email.value, "alice@example.com")
+        self.assertEqual((identity.preferred_username, identity.first_name, identity.last_name), ("alice", "Alice", "Doe"))
+
+    def test_verified_token_is_served_from_cache(self):
+        token = self.keycloak.token()
+        self.verifier.verify(token)
+        fetched = len(self.keycloak.requests)
+        hits = tokens.token_cache_hits.value
+
+        with mock.patch("app.tokens.jwt.decode") as decode:
+            identity = self.verifier.verify(token)
+
+        decode.assert_not_called()
+        self.assertEqual(identity.subject.value, "user-1")
+        self.assertEqual(len(self.keycloak.requests), fetched)
+        self.assertEqual(tokens.token_cache_hits.value, hits + 1)
+
+    def test_keycloak_is_not_needed_once_keys_are_cached(self):
+        self.verifier.verify(self.keycloak.token(sub="warm-up"))
+        self.keycloak.available = False
+
+        identity = self.verifier.verify(self.keycloak.token(sub="user-2"))
+
+        self.assertEqual(identity.subject.value, "user-2")
+
+    def test_rotated_key_is_fetched_on_unknown_kid(self):
+        self.verifier.verify(self.keycloak.token())
+        kid = self.keycloak.rotate()
+
+        identity = self.verifier.verify(self.keycloak.token(kid=kid, sub="user-3"))
+
+        self.assertEqual(identity.subject.value, "user-3")
+
+    def test_background_refresh_picks_up_new_keys(self):
+        self.verifier.verify(self.keycloak.token())
+        kid = self.keycloak.rotate()
+        self.jwks.stop()
+        self.jwks.refresh_interval = 0.05
+        self.jwks._thread = None
+        self.jwks.start()
+
+        deadline = time.monotonic() + 5
+        while self.jwks._keys.keys() != {kid} and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        self.assertEqual(set(self.jwks._keys), {kid})
+
+    def test_rejects_invalid_tokens(self):
+        other = KeycloakStub()
+        self.addCleanup(other.stop)
+        cases = {
+            "expired": self.keycloak.token(exp=int(time.time()) - 3600),
+            "wrong audience": self.keycloak.token(aud="another-api"),
+            "wrong issuer": self.keycloak.token(iss="https://evil.example.com/realms/test"),
+            "foreign key": other.token(),
+            "garbage": "not-a-token",
+        }
+        for name, token in cases.items():
+            with self.subTest(name), self.assertRaises(TokenError):
+                self.verifier.verify(token)
+
+
+class TokenAuthMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.keycloak = KeycloakStub()
+        self.addCleanup(self.keycloak.stop)
+        jwks = JWKSCache(self.keycloak.well_known_url, refresh_interval=3600, min_refresh_interval=0)
+        self.addCleanup(jwks.stop)
+        patcher = mock.patch("app.tokens._verifier", TokenVerifier(jwks, VerifiedTokenCache(size=10, max_age=300)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = TokenAuthMiddleware(lambda request: HttpResponse())
+
+    def test_sets_identity_from_bearer_token(self):
+        request = RequestFactory().get("/graphql", HTTP_AUTHORIZATION=f"Bearer {self.keycloak.token()}")
+        self.middleware(request)
+        self.assertEqual(request.identity.subject.value, "user-1")
+
+    def test_invalid_or_missing_token_is_anonymous(self):
+        for headers in ({}, {"HTTP_AUTHORIZATION": "Bearer nope"}, {"HTTP_AUTHORIZATION": "Basic abc"}):
+            request = RequestFactory().get("/graphql", **headers)
+            self.middleware(request)
+            self.assertIsNone(request.identity)
+
+    def test_async_middleware_verifies_off_the_event_loop(self):
+        loop_threads, verify_threads = [], []
+
+        async def get_response(request):
+            loop_threads.append(threading.get_ident())
+            return HttpResponse()
+
+        def authenticate(request):
+            verify_threads.append(threading.get_ident())
+            return authenticate_request(request)
+
+        middleware = TokenAuthMiddleware(get_response)
+        request = RequestFactory().get("/graphql", HTTP_AUTHORIZATION=f"Bearer {self.keycloak.token()}")
+        async def handle():
+            return await middleware(request)
+
+        with mock.patch("app.auth.authenticate_request", authenticate):
+            async_to_sync(handle)()
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(request.identity.subject.value, "user-1")
+        self.assertEqual(len(verify_threads), 1)
+        self.assertNotEqual(verify_threads, loop_threads)
+
+
+@override_settings(KEYCLOAK_CLIENT_ID="itq-forms-api")
+class PermissionTests(SimpleTestCase):
+    def test_permissions_are_client_roles(self):
+        admin = Identity.from_claims(
+            {"sub": "admin-1", "resource_access": {"itq-forms-api": {"roles": ["assessments:enroll"]}}}
+        )
+        other_client = Identity.from_claims(
+            {"sub": "admin-2", "resource_access": {"another-api": {"roles": ["assessments:enroll"]}}}
+        )
+        respondent = Identity.from_claims({"sub": "user-1", "realm_access": {"roles": ["assessments:enroll"]}})
+
+        self.assertTrue(has_permission(admin, Permission.ASSESSMENT_ENROLL))
+        self.assertFalse(has_permission(other_client, Permission.ASSESSMENT_ENROLL))
+        self.assertFalse(has_permission(respondent, Permission.ASSESSMENT_ENROLL))
+
+
+class QueryCostTests(SimpleTestCase):
+    schema = build_schema(
+        """
+        type Query { page(limit: Int = 20): Page! }
+        type Page { total: Int items: [Item!]! facets: [Facet!]! }
+        type Item { id: ID children: [Item!]! }
+        type Facet { name: String }
+        """
+    )
+
+    def cost(self, query: str, **variables) -> int:
+        return query_cost(
+            self.schema,
+            parse(query),
+            None,
+            variables,
+            weights={},
+            list_sizes={("Item", "children"): 3, ("Page", "facets"): 4},
+            paginated_fields={("Page", "items")},
+        ).cost
+
+    def test_page_limit_sizes_only_the_paginated_list(self):
+        query = "query ($limit: Int) { page(limit: $limit) { items { id children { id } } facets { name } } }"
+
+        # page + limit * (item + 3 children) + 4 facets
+        self.assertEqual(self.cost(query, limit=1), 1 + 1 * 4 + 4)
+        self.assertEqual(self.cost(query, limit=100), 1 + 100 * 4 + 4)
+        self.assertEqual(self.cost("{ page { items { id } } }"), 1 + 20)
+
+
+@strawberry.type
+class GreetingQuery:
+    @strawberry.field
+    def hello(self) -> str:
+        return "world"
+
+
+@override_settings(GRAPHQL_GET_CACHE_MAX_AGE=60)
+class GraphQLViewTests(SimpleTestCase):
+    QUERY = "{ hello }"
+
+    def setUp(self):
+        caches["graphql"].clear()
+        schema = strawberry.Schema(query=GreetingQuery, extensions=[PersistedQueriesExtension])
+        self.view = AuthedGraphQLView.as_view(schema=schema)
+        self.digest = hashlib.sha256(self.QUERY.encode()).hexdigest()
+
+    def get(self, query: str | None = None, **headers) -> HttpResponse:
+        params = {"extensions": json.dumps({"persistedQuery": {"version": 1, "sha256Hash": self.digest}})}
+        if query is not None:
+            params["query"] = query
+        request = RequestFactory().get("/graphql", params, headers=headers)
+        request.identity = None
+        return self.view(request)
+
+    def test_persisted_query_miss_register_then_hit(self):
+        with self.assertLogs("strawberry.execution", "ERROR"):
+            miss = json.loads(self.get().content)
+        self.assertEqual(miss["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND")
+
+        registered = self.get(self.QUERY)
+        self.assertEqual(json.loads(registered.content)["data"], {"hello": "world"})
+
+        hit = self.get()
+        self.assertEqual(json.loads(hit.content), {"data": {"hello": "world"}})
+
+    def test_rejects_a_query_that_does_not_match_its_hash(self):
+        with self.assertLogs("strawberry.execution", "ERROR"):
+            mismatch = json.loads(self.get("{ __typename }").content)
+            lookup = json.loads(self.get().content)
+
+        self.assertEqual(mismatch["errors"][0]["extensions"]["code"], "INVALID_PERSISTED_QUERY")
+        self.assertEqual(lookup["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND")
+
+    def test_get_responses_are_cacheable_and_vary_on_authorization(self):
+        public = self.get(self.QUERY)
+        self.assertEqual(public["Cache-Control"], "public, max-age=60")
+        self.assertEqual(public["Vary"], "Authorization")
+
+        private = self.get(Authorization="Bearer token")
+        self.assertEqual(private["Cache-Control"], "private, max-age=60")
+        self.assertEqual(private["Vary"], "Authorization")
+
+    def test_errors_are_not_cached(self):
+        with self.assertLogs("strawberry.execution", "ERROR"):
+            self.assertEqual(self.get()["Cache-Control"], "no-store")
+        with override_settings(GRAPHQL_GET_CACHE_MAX_AGE=0):
+            self.assertEqual(self.get(self.QUERY)["Cache-Control"], "no-store")
+
+
+@strawberry.type
+class SurveyTitleQuery:
+    @strawberry.field
+    def survey(self, id: int) -> str | None:
+        return Survey.objects.filter(pk=id).values_list("title", flat=True).first()
+
+
+class SurveyETagTests(TestCase):
+    QUERY = "query ($id: Int!) { survey(id: $id) }"
+
+    def setUp(self):
+        self.view = AuthedGraphQLView.as_view(schema=strawberry.Schema(query=SurveyTitleQuery))
+        # Never published, so the ETag follows the draft's content_version.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.survey = create_exam(1)
+
+    def post(self, **headers) -> HttpResponse:
+        body = json.dumps({"query": self.QUERY, "variables": {"id": self.survey.pk}})
+        request = RequestFactory().post("/graphql", body, content_type="application/json", headers=headers)
+        request.identity = None
+        return self.view(request)
+
+    def test_if_none_match_answers_304_without_running_resolvers(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        # Only the survey's version is read.
+        with self.assertNumQueries(1):
+            cached = self.post(**{"If-None-Match": etag})
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], etag)
+        self.assertEqual(self.post(**{"If-None-Match": '"other"'}).status_code, 200)
+
+    def test_etag_moves_after_a_child_edit(self):
+        etag = self.post()["ETag"]
+        question = Question.objects.get(survey=self.survey)
+        question.title = "Edited"
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+
+        response = self.post(**{"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_moves_only_when_the_definition_changes(self):
+        etag = self.post()["ETag"]
+        self.survey.save()
+        self.assertEqual(self.post()["ETag"], etag)
+
+        self.survey.title = "Renamed"
+        self.survey.save(update_fields=["title"])
+        self.assertNotEqual(self.post()["ETag"], etag)
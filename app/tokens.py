@@ -0,0 +1,276 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+import jwt
+from django.conf import settings
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+token_cache_hits = registry.counter("auth_token_cache_hits_total", "Bearer tokens served from the verified-token cache")
+token_cache_misses = registry.counter("auth_token_cache_misses_total", "Bearer tokens verified with a JWKS key")
+token_rejections = registry.counter("auth_token_rejections_total", "Bearer tokens that failed verification")
+jwks_refreshes = registry.counter("auth_jwks_refreshes_total", "Successful JWKS fetches from Keycloak")
+jwks_refresh_failures = registry.counter("auth_jwks_refresh_failures_total", "Failed discovery or JWKS fetches")
+
+
+class TokenError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Subject:
+    value: str
+
+
+@dataclass(frozen=True)
+class Email:
+    value: str
+
+
+@dataclass(frozen=True)
+class Identity:
+    """Verified token claims, in the shape resolvers read (`subject.value`, `email.value`, ...)."""
+
+    subject: Subject
+    email: Email | None = None
+    preferred_username: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    expires_at: int | None = None
+    claims: dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_claims(cls, claims: dict[str, Any]) -> "Identity":
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject:
+            raise TokenError("Token is missing the `sub` claim")
+        email = claims.get("email")
+        return cls(
+            subject=Subject(subject),
+            email=Email(email) if isinstance(email, str) and "@" in email else None,
+            preferred_username=claims.get("preferred_username"),
+            first_name=claims.get("given_name"),
+            last_name=claims.get("family_name"),
+            expires_at=claims.get("exp"),
+            claims=claims,
+        )
+
+
+def _fetch_json(url: str) -> dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=settings.KEYCLOAK_HTTP_TIMEOUT) as response:
+        return json.loads(response.read())
+
+
+class JWKSCache:
+    """
+    Signing keys for the realm, fetched through OpenID discovery and refreshed
+    by a background thread so requests never wait on Keycloak. An unknown
+    `kid` (key rotation) triggers an inline refresh, at most once per
+    `min_refresh_interval`.
+    """
+
+    def __init__(self, well_known_url: str, refresh_interval: float, min_refresh_interval: float):
+        self.well_known_url = well_known_url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.issuer: str | None = None
+        self._jwks_uri: str | None = None
+        self._keys: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._last_attempt = 0.0
+        self._thread: threading.Thread | None = None
+        self._thread_pid: int | None = None
+        self._stopped = threading.Event()
+
+    def refresh(self) -> bool:
+        with self._lock:
+            self._last_attempt = time.monotonic()
+            try:
+                if self._jwks_uri is None:
+                    discovery = _fetch_json(self.well_known_url)
+                    self.issuer = discovery["issuer"]
+                    self._jwks_uri = discovery["jwks_uri"]
+                keys = {}
+                for jwk in _fetch_json(self._jwks_uri).get("keys", []):
+                    if jwk.get("use", "sig") != "sig" or "kid" not in jwk:
+                        continue
+                    try:
+                        keys[jwk["kid"]] = jwt.PyJWK.from_dict(jwk)
+                    except jwt.PyJWKError:
+                        logger.warning("Skipping unusable JWKS key %s", jwk["kid"])
+            except Exception:
+                jwks_refresh_failures.inc()
+                logger.exception("JWKS refresh from %s failed", self.well_known_url)
+                return False
+            # Keep serving the previous keys if Keycloak briefly returns none.
+            if keys:
+                self._keys = keys
+            jwks_refreshes.inc()
+            return True
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self) -> None:
+        # Threads do not survive a fork, so each worker process starts its own.
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def key(self, kid: str | None) -> jwt.PyJWK | None:
+        self.start()
+        key = self._keys.get(kid)
+        if key is None and (not self._last_attempt or time.monotonic() - self._last_attempt >= self.min_refresh_interval):
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+
+class VerifiedTokenCache:
+    """LRU of identities by token hash, each kept until the token expires (capped by `max_age`)."""
+
+    def __init__(self, size: int, max_age: float):
+        self.size = size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, tuple[float, Identity]] = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Identity | None:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, identity: Identity) -> None:
+        expires_at = time.time() + self.max_age
+        if identity.expires_at is not None:
+            expires_at = min(expires_at, identity.expires_at)
+        with self._lock:
+            self._items[key] = (expires_at, identity)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class TokenVerifier:
+    """Verifies Keycloak access tokens in-process against the cached JWKS."""
+
+    algorithms = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "PS256")
+
+    def __init__(self, jwks: JWKSCache, cache: VerifiedTokenCache, audience: str | None = None, leeway: float = 0):
+        self.jwks = jwks
+        self.cache = cache
+        self.audience = audience
+        self.leeway = leeway
+
+    def verify(self, token: str) -> Identity:
+        key = self.cache.key(token)
+        identity = self.cache.get(key)
+        if identity is not None:
+            token_cache_hits.inc()
+            return identity
+        token_cache_misses.inc()
+
+        try:
+            header = jwt.get_unverified_header(token)
+            signing_key = self.jwks.key(header.get("kid"))
+            if signing_key is None:
+                raise TokenError("No JWKS key matches the token")
+            if signing_key.algorithm_name not in self.algorithms:
+                raise TokenError(f"Unsupported signing algorithm {signing_key.algorithm_name}")
+            claims = jwt.decode(
+                token,
+                signing_key.key,
+                algorithms=[signing_key.algorithm_name],
+                issuer=self.jwks.issuer,
+                audience=self.audience,
+                leeway=self.leeway,
+                options={"require": ["exp", "sub"], "verify_aud": self.audience is not None},
+            )
+            identity = Identity.from_claims(claims)
+        except (jwt.PyJWTError, TokenError) as exc:
+            token_rejections.inc()
+            raise TokenError(str(exc)) from exc
+
+        self.cache.put(key, identity)
+        return identity
+
+
+_verifier: TokenVerifier | None = None
+_verifier_lock = threading.Lock()
+
+
+def get_token_verifier() -> TokenVerifier:
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                if not settings.KEYCLOAK_WELL_KNOWN_URL:
+                    raise TokenError("KEYCLOAK_WELL_KNOWN_URL is not configured")
+                _verifier = TokenVerifier(
+                    JWKSCache(
+                        settings.KEYCLOAK_WELL_KNOWN_URL,
+                        refresh_interval=settings.KEYCLOAK_JWKS_REFRESH_INTERVAL,
+                        min_refresh_interval=settings.KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL,
+                    ),
+                    VerifiedTokenCache(
+                        size=settings.VERIFIED_TOKEN_CACHE_SIZE,
+                        max_age=settings.VERIFIED_TOKEN_CACHE_MAX_AGE,
+                    ),
+                    audience=settings.KEYCLOAK_AUDIENCE,
+                    leeway=settings.KEYCLOAK_TOKEN_LEEWAY,
+                )
+    return _verifier
+
+
+def bearer_token(request) -> str | None:
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def authenticate_request(request) -> Identity | None:
+    """Identity for the request's bearer token, or None when absent or invalid."""
+    token = bearer_token(request)
+    if token is None:
+        return None
+    try:
+        return get_token_verifier().verify(token)
+    except TokenError as exc:
+        logger.info("Rejected bearer token: %s", exc)
+        return None
@@ -14,18 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
-from strawberry.django.views import AsyncGraphQLView
 
-from app.auth import AuthedGraphQLView
-from app.health import healthz, readyz, startupz
+from app.auth import AsyncAuthedGraphQLView, AuthedGraphQLView
+from app.health import healthz, metrics, readyz, startupz
 from surveys import schema
 
+graphql_view = AsyncAuthedGraphQLView if settings.GRAPHQL_ASYNC else AuthedGraphQLView
+
 urlpatterns = [
-    path("graphql", csrf_exempt(AuthedGraphQLView.as_view(schema=schema.schema))),
+    path("graphql", csrf_exempt(graphql_view.as_view(schema=schema.schema))),
     path("healthz/", healthz, name="healthz"),
     path("readyz/", readyz, name="readyz"),
     path("startupz/", startupz, name="startupz"),
+    path("metrics/", metrics, name="metrics"),
 ]
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Q, QuerySet
+from django.utils.timezone import now
+
+from surveys.filters import survey_sort_input_to_keyset
+from surveys.inputs import SurveySortInput
+from surveys.models import Survey, SurveyQueryShape
+
+RANGE_FILTERS = ("created_at", "updated_at")
+SEARCH_FILTERS = ("q",)
+FILTER_COLUMNS = {"status": "current_status"}
+# Window used for range filters when replaying a shape; the recorded bounds
+# are not kept.
+RANGE_SAMPLE_WINDOW = timedelta(days=30)
+SAMPLE_LIMIT = 20
+# Low-cardinality filters whose values are recorded with a shape (booleans
+# are kept too). Free text and ids are stored as SAMPLE_PLACEHOLDER so user
+# input never reaches SurveyQueryShape.sample.
+SAMPLED_FILTERS = ("status", "language", "assessment_type")
+SAMPLE_PLACEHOLDER = "?"
+
+
+def filter_column(name: str) -> str | None:
+    column = FILTER_COLUMNS.get(name, name)
+    for model_field in Survey._meta.concrete_fields:
+        if column in (model_field.name, model_field.attname):
+            return model_field.name
+    return None
+
+
+def _sample_value(name: str, value: Any) -> Any:
+    if name not in SAMPLED_FILTERS and not isinstance(value, bool):
+        return SAMPLE_PLACEHOLDER
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    equality: tuple[str, ...]
+    ranges: tuple[str, ...]
+    sort: tuple[str, ...]
+    has_search: bool
+
+    @property
+    def signature(self) -> str:
+        payload = json.dumps([self.equality, self.ranges, self.sort, self.has_search])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @classmethod
+    def from_record(cls, record: SurveyQueryShape) -> "QueryShape":
+        return cls(tuple(record.equality), tuple(record.ranges), tuple(record.sort), record.has_search)
+
+
+def query_shape(filters_data: dict[str, Any], sort: SurveySortInput | None) -> tuple[QueryShape, dict[str, Any]]:
+    active = {name: value for name, value in filters_data.items() if value is not None}
+    equality = tuple(sorted(name for name in active if name not in RANGE_FILTERS + SEARCH_FILTERS))
+    shape = QueryShape(
+        equality=equality,
+        ranges=tuple(sorted(name for name in active if name in RANGE_FILTERS)),
+        sort=tuple(key.token for key in survey_sort_input_to_keyset(sort)),
+        has_search=any(name in active for name in SEARCH_FILTERS),
+    )
+    return shape, {name: _sample_value(name, active[name]) for name in equality}
+
+
+def record_query_shape(filters_data: dict[str, Any], sort: SurveySortInput | None) -> None:
+    """Record the request's filter/sort shape for a sample of calls."""
+    if random.random() >= settings.SURVEYS_QUERY_SHAPE_SAMPLE_RATE:
+        return
+    shape, sample = query_shape(filters_data, sort)
+    SurveyQueryShape.record(
+        shape.signature,
+        equality=list(shape.equality),
+        ranges=list(shape.ranges),
+        sort=list(shape.sort),
+        has_search=shape.has_search,
+        sample=sample,
+    )
+
+
+def sample_queryset(shape: QueryShape, sample: dict[str, Any]) -> QuerySet:
+    """Rebuild a representative first page for `shape` from its recorded sample."""
+    lookups = {}
+    for name in shape.equality:
+        column = filter_column(name)
+        if column is None or name not in sample:
+            continue
+        value = sample[name]
+        if value == SAMPLE_PLACEHOLDER:
+            # Any stored value keeps the plan an equality lookup.
+            value = Survey.objects.exclude(**{f"{column}__isnull": True}).values_list(column, flat=True).first()
+        lookups[column] = value
+    for name in shape.ranges:
+        lookups[f"{filter_column(name)}__gte"] = now() - RANGE_SAMPLE_WINDOW
+    return Survey.objects.filter(**lookups).order_by(*shape.sort)[:SAMPLE_LIMIT]
+
+
+def explain_cost(qs: QuerySet) -> float | None:
+    """Planner total cost for `qs` on Postgres; None elsewhere."""
+    if connections[qs.db].vendor != "postgresql":
+        return None
+    plan = json.loads(qs.explain(format="json"))
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def _unique(values: list[str]) -> list[str]:
+    return list(dict.fromkeys(values))
+
+
+def propose_index(shape: QueryShape, sample: dict[str, Any]) -> models.Index | None:
+    """
+    Composite index for `shape`: equality columns first, then the range
+    column, then the sort columns when the range column leads the sort.
+    Boolean equality filters become the partial-index condition instead.
+    """
+    keys, condition = [], {}
+    for name in shape.equality:
+        column = filter_column(name)
+        if column is None:
+            continue
+        if isinstance(Survey._meta.get_field(column), models.BooleanField) and isinstance(sample.get(name), bool):
+            condition[column] = sample[name]
+        else:
+            keys.append(column)
+
+    sort_keys = [token for token in shape.sort if "__" not in token.lstrip("-")]
+    range_columns = [filter_column(name) for name in shape.ranges]
+    if range_columns and (not sort_keys or sort_keys[0].lstrip("-") != range_columns[0]):
+        keys.append(range_columns[0])
+    else:
+        keys.extend(sort_keys)
+
+    keys = _unique(keys)
+    if not keys:
+        return None
+    condition_q = Q(**dict(sorted(condition.items()))) if condition else None
+    digest = hashlib.sha1(repr((keys, sorted(condition.items()))).encode()).hexdigest()[:8]
+    return models.Index(fields=keys, condition=condition_q, name=f"ix_survey_adv_{digest}")
+
+
+def is_covered(index: models.Index) -> bool:
+    """True when an existing Survey index already starts with the same columns."""
+    for existing in Survey._meta.indexes:
+        # GIN indexes (search vector, title trigrams) do not serve equality and sort.
+        if type(existing) is not models.Index or existing.condition is not None or not existing.fields:
+            continue
+        if list(existing.fields[: len(index.fields)]) == list(index.fields):
+            return True
+    return False
+
+
+def measure_index(index: models.Index, qs: QuerySet) -> float | None:
+    """
+    Create `index` inside a transaction that is rolled back, and return the
+    planner cost of `qs` while it exists. Postgres only.
+    """
+    connection = connections[qs.db]
+    if connection.vendor != "postgresql":
+        return None
+    with transaction.atomic(using=qs.db):
+        with connection.schema_editor(atomic=False) as editor:
+            editor.add_index(Survey, index)
+        cost = explain_cost(qs)
+        transaction.set_rollback(True, using=qs.db)
+    return cost
+
+
+@dataclass
+class IndexProposal:
+    index: models.Index
+    hits: int = 0
+    shapes: int = 0
+    cost_before: float | None = None
+    cost_after: float | None = None
+    sample: QuerySet | None = None
+
+    @property
+    def gain(self) -> float | None:
+        if not self.cost_before or self.cost_after is None:
+            return None
+        return (self.cost_before - self.cost_after) / self.cost_before
+
+
+def advise(min_hits: int = 1, measure: bool = False) -> list[IndexProposal]:
+    """Group recorded shapes by the index they would use, busiest first."""
+    proposals: dict[str, IndexProposal] = {}
+    for record in SurveyQueryShape.objects.filter(hits__gte=min_hits).order_by("-hits"):
+        shape = QueryShape.from_record(record)
+        index = propose_index(shape, record.sample)
+        if index is None or is_covered(index):
+            continue
+        proposal = proposals.setdefault(index.name, IndexProposal(index=index))
+        proposal.hits += record.hits
+        proposal.shapes += 1
+        if proposal.sample is None:
+            proposal.sample = sample_queryset(shape, record.sample)
+
+    for proposal in proposals.values():
+        # Costs come from the busiest shape's sample only, so the command runs
+        # one or two EXPLAINs per proposal regardless of workload size.
+        proposal.cost_before = explain_cost(proposal.sample)
+        if measure:
+            proposal.cost_after = measure_index(proposal.index, proposal.sample)
+    return sorted(proposals.values(), key=lambda proposal: -proposal.hits)
@@ -0,0 +1,126 @@
+import dataclasses
+import datetime
+import hashlib
+import json
+import logging
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_VERSION_KEY = "surveys:catalogue-version"
+
+
+def survey_cache() -> BaseCache:
+    return caches[settings.SURVEYS_CACHE_ALIAS]
+
+
+def catalogue_version() -> int:
+    """
+    Current catalogue version. A missing counter (eviction, restart) is seeded
+    from the clock rather than 0 so it never repeats a version that older
+    entries may still be stored under.
+    """
+    cache = survey_cache()
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version() -> None:
+    cache = survey_cache()
+    try:
+        try:
+            cache.incr(CATALOGUE_VERSION_KEY)
+        except ValueError:
+            cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+    except Exception:
+        logger.exception("Failed to bump the survey catalogue version")
+
+
+def canonical(value: Any) -> Any:
+    """
+    JSON-ready normal form of a strawberry input: None values and empty
+    containers are dropped and enums/datetimes reduced to their values, so
+    equivalent inputs produce the same key.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if isinstance(value, dict):
+        items = {key: canonical(item) for key, item in value.items()}
+        return {key: item for key, item in sorted(items.items()) if item not in (None, {}, [])}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def cache_key(namespace: str, version: int, *parts: Any) -> str:
+    payload = json.dumps([canonical(part) for part in parts], sort_keys=True, separators=(",", ":"), default=str)
+    return f"surveys:{namespace}:{version}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def selection_key(paths: Iterable[tuple[str, ...]]) -> list[str]:
+    return sorted(".".join(path) for path in paths)
+
+
+def _lookup(key_parts: tuple, namespace: str) -> tuple[str | None, Any]:
+    """(key, cached value); the key is None when the cache is unreachable."""
+    cache = survey_cache()
+    try:
+        key = cache_key(namespace, catalogue_version(), *key_parts)
+        return key, cache.get(key)
+    except Exception:
+        logger.exception("Survey cache read failed")
+        return None, None
+
+
+def _store(key: str, value: Any, timeout: int) -> None:
+    try:
+        survey_cache().set(key, value, timeout=timeout)
+    except Exception:
+        logger.exception("Survey cache write failed")
+
+
+def get_or_compute(key_parts: tuple, compute: Callable[[], Any], namespace: str, timeout: int) -> Any:
+    """
+    Return the cached value for `key_parts` under the current catalogue
+    version, computing and storing it on a miss. Cache outages fall back to
+    `compute()`.
+    """
+    if timeout <= 0:
+        return compute()
+    key, value = _lookup(key_parts, namespace)
+    if value is not None:
+        return value
+
+    value = compute()
+    if key is not None:
+        _store(key, value, timeout)
+    return value
+
+
+async def aget_or_compute(
+    key_parts: tuple, compute: Callable[[], Awaitable[Any]], namespace: str, timeout: int
+) -> Any:
+    """`get_or_compute` for async resolvers; `compute` returns an awaitable."""
+    if timeout <= 0:
+        return await compute()
+    key, value = await sync_to_async(_lookup)(key_parts, namespace)
+    if value is not None:
+        return value
+
+    value = await compute()
+    if key is not None:
+        await sync_to_async(_store)(key, value, timeout)
+    return value
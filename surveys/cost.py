@@ -0,0 +1,35 @@
+# Per-field weights and expected row counts for QueryCostExtension, keyed by
+# (GraphQL type name, GraphQL field name). Weights approximate the database
+# work a field adds per row; unlisted object fields weigh 1, scalars 0.
+SURVEY_FIELD_WEIGHTS = {
+    ("Query", "surveys"): 10,
+    ("Query", "survey"): 5,
+    ("Query", "surveyTitleSuggestions"): 2,
+    ("Query", "userAssessments"): 2,
+    ("Mutation", "bulkEnrollAssessment"): 20,
+    ("Mutation", "submitAnswers"): 10,
+    ("Mutation", "submitAssessment"): 15,
+    ("Mutation", "autosaveAnswer"): 1,
+    ("SurveyResultsGQL", "facets"): 5,
+}
+
+# Expected rows for list fields that take no `limit`. These are typical
+# sizes, not maxima: they multiply down the tree, so worst-case sizes would
+# price an ordinary full survey (5 sections of 10 questions with 4 options
+# each) out of the budget.
+SURVEY_LIST_SIZES = {
+    ("SurveyType", "sections"): 5,
+    ("SurveyType", "classifications"): 5,
+    ("SurveyType", "actions"): 3,
+    ("SurveyType", "recommendations"): 10,
+    ("SectionType", "questions"): 10,
+    ("AnswerSchemaType", "options"): 4,
+    ("AnswerSchemaOptionType", "recommendations"): 1,
+    ("SurveyResultsGQL", "facets"): 6,
+    ("FacetGQL", "values"): 20,
+}
+
+# Lists sized by the `limit` of the field returning them (one page of results).
+SURVEY_PAGINATED_FIELDS = {
+    ("SurveyResultsGQL", "items"),
+}
@@ -0,0 +1,313 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import Prefetch
+
+from surveys.cache import survey_cache
+from surveys.models import (
+    Action,
+    AnswerSchema,
+    AnswerSchemaOption,
+    Classification,
+    Question,
+    Recommendation,
+    Section,
+    Survey,
+)
+
+logger = logging.getLogger(__name__)
+
+Row = dict[str, Any]
+
+# Bumped whenever the document layout changes so processes on different
+# releases never read each other's shared-cache entries.
+DEFINITION_FORMAT = 3
+
+
+@dataclass(frozen=True)
+class SurveyDefinition:
+    """
+    A survey with its sections, questions, answer schemas, options,
+    classifications, actions and recommendations, as plain column values.
+    Treat as read-only: it is shared between requests.
+    """
+
+    survey_id: int
+    version: str
+    survey: Row
+    sections: tuple[Row, ...]
+    classifications: tuple[Row, ...] = ()
+    actions: tuple[Row, ...] = ()
+    recommendations: tuple[Row, ...] = ()
+
+
+def definition_version(content_version) -> str:
+    return str(content_version or 0)
+
+
+def _row(instance: models.Model) -> Row:
+    deferred = instance.get_deferred_fields()
+    return {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+        if field.attname not in deferred
+    }
+
+
+def compile_survey_definition(survey_id: int) -> SurveyDefinition | None:
+    survey = (
+        Survey.objects.filter(pk=survey_id)
+        .defer("search_vector")
+        .prefetch_related(
+            Prefetch("sections", queryset=Section.objects.order_by("order", "id")),
+            Prefetch("sections__questions", queryset=Question.objects.order_by("order", "id")),
+            "sections__questions__answer_schema",
+            Prefetch("sections__questions__answer_schema__options", queryset=AnswerSchemaOption.objects.order_by("order", "id")),
+            Prefetch(
+                "sections__questions__answer_schema__options__option_recommendations",
+                queryset=Recommendation.objects.filter(deleted_at__isnull=True),
+            ),
+            Prefetch("classifications", queryset=Classification.objects.filter(deleted_at__isnull=True)),
+            "actions",
+            Prefetch("recommendations", queryset=Recommendation.objects.filter(deleted_at__isnull=True)),
+        )
+        .first()
+    )
+    if survey is None:
+        return None
+
+    sections = []
+    for section in survey.sections.all():
+        questions = []
+        for question in section.questions.all():
+            schema = getattr(question, "answer_schema", None)
+            questions.append(
+                {
+                    "fields": _row(question),
+                    "answer_schema": (
+                        {
+                            "fields": _row(schema),
+                            "options": tuple(
+                                {
+                                    "fields": _row(option),
+                                    "recommendations": tuple(
+                                        _row(recommendation) for recommendation in option.option_recommendations.all()
+                                    ),
+                                }
+                                for option in schema.options.all()
+                            ),
+                        }
+                        if schema is not None
+                        else None
+                    ),
+                }
+            )
+        sections.append({"fields": _row(section), "questions": tuple(questions)})
+
+    return SurveyDefinition(
+        survey_id=survey.pk,
+        version=definition_version(survey.content_version),
+        survey=_row(survey),
+        sections=tuple(sections),
+        classifications=tuple(_row(classification) for classification in survey.classifications.all()),
+        actions=tuple(_row(action) for action in survey.actions.all()),
+        recommendations=tuple(_row(recommendation) for recommendation in survey.recommendations.all()),
+    )
+
+
+def _typed(model: type[models.Model], row: Row) -> Row:
+    # JSON round-trips leave datetimes, decimals and UUIDs as strings; columns
+    # dropped since the document was written are ignored.
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    return {
+        name: fields[name].to_python(value) if value is not None else None
+        for name, value in row.items()
+        if name in fields
+    }
+
+
+def definition_to_document(definition: SurveyDefinition) -> dict[str, Any]:
+    """JSON-serialisable form of `definition` (with DjangoJSONEncoder)."""
+    return {"format": DEFINITION_FORMAT, **asdict(definition)}
+
+
+def definition_from_document(document: dict[str, Any], version: str | None = None) -> SurveyDefinition:
+    """Inverse of `definition_to_document`, restoring column types."""
+
+    def option(doc):
+        return {
+            "fields": _typed(AnswerSchemaOption, doc["fields"]),
+            "recommendations": tuple(_typed(Recommendation, row) for row in doc["recommendations"]),
+        }
+
+    def question(doc):
+        schema = doc["answer_schema"]
+        return {
+            "fields": _typed(Question, doc["fields"]),
+            "answer_schema": (
+                {
+                    "fields": _typed(AnswerSchema, schema["fields"]),
+                    "options": tuple(option(option_doc) for option_doc in schema["options"]),
+                }
+                if schema is not None
+                else None
+            ),
+        }
+
+    return SurveyDefinition(
+        survey_id=document["survey_id"],
+        version=version if version is not None else document["version"],
+        survey=_typed(Survey, document["survey"]),
+        sections=tuple(
+            {
+                "fields": _typed(Section, section["fields"]),
+                "questions": tuple(question(question_doc) for question_doc in section["questions"]),
+            }
+            for section in document["sections"]
+        ),
+        classifications=tuple(_typed(Classification, row) for row in document["classifications"]),
+        actions=tuple(_typed(Action, row) for row in document["actions"]),
+        recommendations=tuple(_typed(Recommendation, row) for row in document["recommendations"]),
+    )
+
+
+def _instance(model: type[models.Model], row: Row) -> models.Model:
+    return model.from_db(DEFAULT_DB_ALIAS, list(row), list(row.values()))
+
+
+def _set_prefetched(instance: models.Model, name: str, objects: list) -> None:
+    # Same shape Django's prefetch_related leaves behind, so `.all()` and
+    # strawberry_django's manager resolution read it without a query.
+    qs = getattr(instance, name).get_queryset()
+    qs._result_cache = objects
+    qs._prefetch_done = True
+    if not hasattr(instance, "_prefetched_objects_cache"):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = qs
+
+
+def hydrate_survey(definition: SurveyDefinition) -> Survey:
+    """Fresh model instances for `definition`, with every relation pre-populated."""
+    survey = _instance(Survey, definition.survey)
+    classifications = [_instance(Classification, row) for row in definition.classifications]
+    classifications_by_id = {classification.pk: classification for classification in classifications}
+    _set_prefetched(survey, "classifications", classifications)
+    _set_prefetched(survey, "actions", [_instance(Action, row) for row in definition.actions])
+    _set_prefetched(survey, "recommendations", [_instance(Recommendation, row) for row in definition.recommendations])
+
+    sections = []
+    for section_doc in definition.sections:
+        section = _instance(Section, section_doc["fields"])
+        section.survey = survey
+        questions = []
+        for question_doc in section_doc["questions"]:
+            question = _instance(Question, question_doc["fields"])
+            question.section = section
+            schema_doc = question_doc["answer_schema"]
+            if schema_doc is None:
+                Question.answer_schema.related.set_cached_value(question, None)
+            else:
+                schema = _instance(AnswerSchema, schema_doc["fields"])
+                question.answer_schema = schema
+                options = []
+                for option_doc in schema_doc["options"]:
+                    option = _instance(AnswerSchemaOption, option_doc["fields"])
+                    if option.classification_id in classifications_by_id:
+                        option.classification = classifications_by_id[option.classification_id]
+                    _set_prefetched(
+                        option,
+                        "option_recommendations",
+                        [_instance(Recommendation, row) for row in option_doc["recommendations"]],
+                    )
+                    options.append(option)
+                _set_prefetched(schema, "options", options)
+            questions.append(question)
+        _set_prefetched(section, "questions", questions)
+        sections.append(section)
+    _set_prefetched(survey, "sections", sections)
+    return survey
+
+
+class _LocalDefinitions:
+    """Per-process LRU of the latest definition per key (the survey id by default)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: OrderedDict[Any, SurveyDefinition] = OrderedDict()
+
+    def get(self, key: Any, version: str) -> SurveyDefinition | None:
+        with self._lock:
+            definition = self._items.get(key)
+            if definition is None or definition.version != version:
+                return None
+            self._items.move_to_end(key)
+            return definition
+
+    def put(self, definition: SurveyDefinition, key: Any = None) -> None:
+        key = definition.survey_id if key is None else key
+        with self._lock:
+            self._items[key] = definition
+            self._items.move_to_end(key)
+            while len(self._items) > settings.SURVEYS_DEFINITION_LOCAL_SIZE:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+local_definitions = _LocalDefinitions()
+# Published snapshots by SurveyVersion id; they never change, so entries are
+# only evicted for space.
+local_versions = _LocalDefinitions()
+
+
+def _shared_key(survey_id: int, version: str) -> str:
+    return f"surveys:definition:{DEFINITION_FORMAT}:{survey_id}:{version}"
+
+
+def get_survey_definition(survey_id: int) -> SurveyDefinition | None:
+    """
+    Current definition for `survey_id`, checked against the survey's
+    `content_version` (which child edits bump) and served from the process LRU,
+    then the shared cache, compiling it on a miss.
+    """
+    versions = Survey.objects.filter(pk=survey_id).order_by().values_list("content_version", flat=True)
+    if not versions:
+        return None
+    return draft_survey_definition(survey_id, definition_version(versions[0]))
+
+
+def draft_survey_definition(survey_id: int, version: str) -> SurveyDefinition | None:
+    """`get_survey_definition` for a caller that already read the version."""
+    definition = local_definitions.get(survey_id, version)
+    if definition is not None:
+        return definition
+
+    cache = survey_cache()
+    try:
+        definition = cache.get(_shared_key(survey_id, version))
+    except Exception:
+        logger.exception("Survey definition cache read failed")
+        definition = None
+
+    if definition is None:
+        definition = compile_survey_definition(survey_id)
+        if definition is None:
+            return None
+        try:
+            cache.set(
+                _shared_key(definition.survey_id, definition.version),
+                definition,
+                timeout=settings.SURVEYS_DEFINITION_CACHE_TIMEOUT,
+            )
+        except Exception:
+            logger.exception("Survey definition cache write failed")
+
+    local_definitions.put(definition)
+    return definition
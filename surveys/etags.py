@@ -0,0 +1,98 @@
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any
+
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    GraphQLError,
+    IntValueNode,
+    OperationDefinitionNode,
+    OperationType,
+    StringValueNode,
+    VariableNode,
+    parse,
+)
+
+from surveys.models import Survey
+
+
+@lru_cache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+def _parse(query: str):
+    try:
+        return parse(query, no_location=True)
+    except GraphQLError:
+        return None
+
+
+def _operation(document, operation_name: str | None) -> OperationDefinitionNode | None:
+    operations = [
+        definition for definition in document.definitions if isinstance(definition, OperationDefinitionNode)
+    ]
+    if operation_name is not None:
+        operations = [operation for operation in operations if operation.name and operation.name.value == operation_name]
+    return operations[0] if len(operations) == 1 else None
+
+
+def requested_survey_id(query: str, variables: dict[str, Any] | None, operation_name: str | None) -> int | None:
+    """
+    Id of the survey when the operation is a query selecting nothing but
+    `survey(id: ...)` at the root (plus `__typename`); otherwise None.
+    """
+    document = _parse(query)
+    operation = _operation(document, operation_name) if document is not None else None
+    if operation is None or operation.operation != OperationType.QUERY or operation.directives:
+        return None
+
+    selections = operation.selection_set.selections
+    fields = [selection for selection in selections if isinstance(selection, FieldNode)]
+    if len(fields) != len(selections):
+        return None
+    fields = [field for field in fields if field.name.value != "__typename"]
+    if len(fields) != 1 or fields[0].name.value != "survey" or fields[0].directives:
+        return None
+
+    for argument in fields[0].arguments:
+        if argument.name.value != "id":
+            continue
+        value = argument.value
+        if isinstance(value, VariableNode):
+            value = (variables or {}).get(value.name.value)
+        elif isinstance(value, (IntValueNode, StringValueNode)):
+            value = value.value
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def survey_etag(query: str | None, variables: dict[str, Any] | None, operation_name: str | None) -> str | None:
+    """
+    Strong ETag for a `Query.survey` operation: the published snapshot (or,
+    for never-published surveys, the content version) combined with the
+    document and variables, which fix the response shape.
+    """
+    if not query:
+        return None
+    survey_id = requested_survey_id(query, variables, operation_name)
+    if survey_id is None:
+        return None
+    row = (
+        Survey.objects.filter(pk=survey_id)
+        .order_by()
+        .values_list("published_version_id", "content_version")
+        .first()
+    )
+    if row is None:
+        return None
+    published_version_id, content_version = row
+    served = f"v{published_version_id}" if published_version_id is not None else str(content_version)
+    payload = json.dumps(
+        [survey_id, served, query, variables or {}, operation_name],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return f'"{hashlib.sha256(payload.encode()).hexdigest()[:32]}"'
@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import F, QuerySet
+
+from surveys.models import SurveyFacetCount
+from surveys.pagination import resolve_lookup_field
+
+
+@dataclass(frozen=True)
+class FacetField:
+    name: str
+    lookup: str
+
+    @property
+    def alias(self) -> str:
+        return f"facet_{self.name}"
+
+
+@dataclass(frozen=True)
+class FacetResult:
+    total: int
+    facets: dict[str, list[tuple[Any, int]]]
+
+
+SURVEY_FACETS: dict[str, FacetField] = {
+    facet.name: facet
+    for facet in (
+        FacetField("status", "current_status"),
+        FacetField("assessment_type", "assessment_type"),
+        FacetField("language", "language"),
+        FacetField("category", "category_id"),
+        FacetField("sponsor", "sponsor"),
+        FacetField("is_timed", "is_timed"),
+    )
+}
+DEFAULT_SURVEY_FACETS = ("status", "assessment_type", "language")
+
+
+def _source_sql(qs: QuerySet, facets: list[FacetField]) -> tuple[str, tuple]:
+    source = qs.order_by().annotate(**{facet.alias: F(facet.lookup) for facet in facets})
+    return source.values(*[facet.alias for facet in facets]).query.sql_with_params()
+
+
+def _grouping_sets_rows(cursor, qs: QuerySet, facets: list[FacetField]) -> list[tuple[int, Any, int]]:
+    quote = connections[qs.db].ops.quote_name
+    columns = [quote(facet.alias) for facet in facets]
+    sql, params = _source_sql(qs, facets)
+    sets = ", ".join(["()"] + [f"({column})" for column in columns])
+    cursor.execute(
+        f"SELECT GROUPING({', '.join(columns)}), {', '.join(columns)}, COUNT(*) "
+        f"FROM ({sql}) AS facet_source GROUP BY GROUPING SETS ({sets})",
+        params,
+    )
+
+    # GROUPING() sets one bit per column that is *not* part of the row's
+    # grouping set, leftmost column in the most significant bit.
+    width = len(facets)
+    rows = []
+    for grouping, *values, count in cursor.fetchall():
+        index = next((i for i in range(width) if not grouping & (1 << (width - 1 - i))), -1)
+        rows.append((index, values[index] if index >= 0 else None, count))
+    return rows
+
+
+def _union_rows(cursor, qs: QuerySet, facets: list[FacetField]) -> list[tuple[int, Any, int]]:
+    quote = connections[qs.db].ops.quote_name
+    sql, params = _source_sql(qs, facets)
+    branches = [f"SELECT -1, NULL, COUNT(*) FROM ({sql}) AS facet_source"]
+    for index, facet in enumerate(facets):
+        column = quote(facet.alias)
+        branches.append(
+            f"SELECT {index}, {column}, COUNT(*) FROM ({sql}) AS facet_source GROUP BY {column}"
+        )
+    cursor.execute(" UNION ALL ".join(branches), tuple(params) * len(branches))
+    return cursor.fetchall()
+
+
+def compute_facets(qs: QuerySet, names: Iterable[str]) -> FacetResult:
+    """
+    Count `qs` and bucket it by each requested facet in a single round trip:
+    GROUPING SETS on Postgres, a UNION ALL of group-bys elsewhere.
+    """
+    facets = [SURVEY_FACETS[name] for name in dict.fromkeys(names)]
+    if not facets:
+        return FacetResult(total=qs.count(), facets={})
+
+    connection = connections[qs.db]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                rows = _grouping_sets_rows(cursor, qs, facets)
+            else:
+                rows = _union_rows(cursor, qs, facets)
+    except EmptyResultSet:
+        # Filters that can match nothing (`.none()`, `pk__in=[]`) compile to no SQL.
+        rows = []
+
+    total = 0
+    buckets: dict[str, list[tuple[Any, int]]] = {facet.name: [] for facet in facets}
+    for index, value, count in rows:
+        if index < 0:
+            total = count
+            continue
+        facet = facets[index]
+        field = resolve_lookup_field(qs.model, facet.lookup)
+        if field is not None and value is not None:
+            value = field.to_python(value)
+        buckets[facet.name].append((value, count))
+
+    for values in buckets.values():
+        values.sort(key=lambda item: (item[0] is None, item[0] if item[0] is not None else ""))
+    return FacetResult(total=total, facets=buckets)
+
+
+def facets_from_counts(filters: dict[str, Any], names: Iterable[str]) -> FacetResult | None:
+    """
+    Serve the total and facets from `SurveyFacetCount` when every active filter
+    and every requested facet is one of its dimensions; otherwise return None.
+    """
+    names = list(dict.fromkeys(names))
+    dimensions = SurveyFacetCount.DIMENSIONS
+    active = {name: value for name, value in filters.items() if value is not None}
+    if not set(active) <= set(dimensions) or not set(names) <= set(dimensions):
+        return None
+
+    total = 0
+    buckets: dict[str, dict[str | None, int]] = {name: {} for name in names}
+    rows = SurveyFacetCount.objects.filter(**active, count__gt=0).values_list(*dimensions, "count")
+    for *key, count in rows:
+        total += count
+        values = dict(zip(dimensions, key))
+        for name in names:
+            value = values[name] or None
+            buckets[name][value] = buckets[name].get(value, 0) + count
+
+    return FacetResult(
+        total=total,
+        facets={
+            name: sorted(counts.items(), key=lambda item: (item[0] is None, item[0] or ""))
+            for name, counts in buckets.items()
+        },
+    )
@@ -1,4 +1,6 @@
+import re
 from dataclasses import dataclass, fields as dc_fields
+from typing import Iterable
 
 from pkg_filters.core import BaseQuerySpec, BaseProjectionSpec
 from pkg_filters.core.specs.sort import SortSpec, SortField
@@ -8,13 +10,55 @@ from pkg_filters.integrations.django import (
     DjangoSearchFilterHandler, DjangoSortHandler,
     DjangoAllExactFiltersHandler, DjangoExactFilterHandler,
 )
+from django.db.models import QuerySet
+from pkg_filters.integrations.strawberry import SortDirection
 
 from surveys.inputs import SurveyFilters, SurveySortField, SurveySortInput
+from surveys.models import Survey
+from surveys.pagination import KeysetKey
+
+
+# GraphQL fields on SurveyType that are resolvers rather than columns, mapped
+# to the columns they read.
+SURVEY_PROJECTION_EXTRA: dict[str, tuple[str, ...]] = {
+    "status": ("current_status",),
+}
+
+
+def _snake_case(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def _survey_column(name: str) -> str | None:
+    for field in Survey._meta.concrete_fields:
+        if name in (field.name, field.attname):
+            return field.name
+    return None
 
 
 @dataclass(frozen=True)
 class SurveyProjection(BaseProjectionSpec):
-    pass
+    """Survey columns to load; empty means no pruning."""
+
+    columns: frozenset[str] = frozenset()
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[tuple[str, ...]], prefix: tuple[str, ...] = ("items",)) -> "SurveyProjection":
+        columns = set()
+        for path in paths:
+            if len(path) <= len(prefix) or tuple(path[: len(prefix)]) != prefix:
+                continue
+            name = _snake_case(path[len(prefix)])
+            if name in SURVEY_PROJECTION_EXTRA:
+                columns.update(SURVEY_PROJECTION_EXTRA[name])
+            elif (column := _survey_column(name)) is not None:
+                columns.add(column)
+        return cls(columns=frozenset(columns))
+
+    def apply(self, qs: QuerySet) -> QuerySet:
+        if not self.columns:
+            return qs
+        return qs.only(*sorted({"id", *self.columns}))
 
 SurveySpec = BaseQuerySpec[SurveyFilters, SurveyProjection]
 
@@ -35,13 +79,43 @@ def survey_sort_input_to_spec(inp: SurveySortInput | None) -> SortSpec | None:
 
 
 SURVEY_SORT_MAP: dict[str, str] = {f.value: f.value for f in SurveySortField}
-SURVEY_SORT_MAP["status"] = "status__status"
+SURVEY_SORT_MAP["status"] = "current_status"
+
+
+def survey_sort_input_to_keyset(
+    inp: SurveySortInput | None,
+    default_ordering: list[str] | tuple[str, ...] = tuple(Survey._meta.ordering),
+) -> list[KeysetKey]:
+    if inp is None or not inp.fields:
+        keys = [
+            KeysetKey(lookup=value.lstrip("-"), descending=value.startswith("-"))
+            for value in default_ordering
+        ]
+    else:
+        keys = [
+            KeysetKey(lookup=SURVEY_SORT_MAP[f.field.value], descending=f.direction == SortDirection.DESC)
+            for f in inp.fields
+        ]
+    if not any(key.lookup == "id" for key in keys):
+        keys.append(KeysetKey(lookup="id", descending=keys[-1].descending))
+    return keys
 
 pipeline = DjangoPipeline([
     DjangoRangeFilterHandler("created_at"),
     DjangoRangeFilterHandler("updated_at"),
-    DjangoExactFilterHandler("status", lookup="status__status"),
+    DjangoExactFilterHandler("status", lookup="current_status"),
+    DjangoAllExactFiltersHandler(excluded={"created_at", "updated_at", "q", "status"}),
+    DjangoSearchFilterHandler("q", fields=Survey.SEARCH_INDEX),
+    DjangoSortHandler(sort_map=SURVEY_SORT_MAP),
+])
+
+# Same pipeline without the icontains handler; `q` is applied afterwards by
+# surveys.search.apply_full_text_search.
+full_text_pipeline = DjangoPipeline([
+    DjangoRangeFilterHandler("created_at"),
+    DjangoRangeFilterHandler("updated_at"),
+    DjangoExactFilterHandler("status", lookup="current_status"),
     DjangoAllExactFiltersHandler(excluded={"created_at", "updated_at", "q", "status"}),
-    DjangoSearchFilterHandler("q", fields=("title", "description", "short_description")),
     DjangoSortHandler(sort_map=SURVEY_SORT_MAP),
 ])
+FULL_TEXT_ORDERING = ("-search_rank", "-id")
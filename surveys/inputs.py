@@ -116,9 +116,57 @@ class SurveySortInput:
     fields: List[SurveySortFieldInput]
 
 
+@strawberry.enum
+class SurveyFacetField(str, Enum):
+    STATUS = "status"
+    ASSESSMENT_TYPE = "assessment_type"
+    LANGUAGE = "language"
+    CATEGORY = "category"
+    SPONSOR = "sponsor"
+    IS_TIMED = "is_timed"
+
+
+@strawberry.enum
+class SurveySearchMode(str, Enum):
+    CONTAINS = "contains"
+    FULL_TEXT = "full_text"
+
+
+@strawberry.enum
+class SurveyTotalMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+
+@strawberry.enum
+class SurveyPaginationMode(str, Enum):
+    OFFSET = "offset"
+    CURSOR = "cursor"
+
+
 @strawberry.input
 class SurveysListInput:
     limit: int = 20
     offset: int = 0
     filters: Optional[SurveyFiltersInput] = None
     sort: Optional[SurveySortInput] = None
+    pagination: SurveyPaginationMode = SurveyPaginationMode.OFFSET
+    after: Optional[str] = None
+    before: Optional[str] = None
+    facets: Optional[List[SurveyFacetField]] = None
+    search_mode: SurveySearchMode = SurveySearchMode.CONTAINS
+    total_mode: SurveyTotalMode = SurveyTotalMode.EXACT
+
+
+@strawberry.input
+class EnrollmentInput:
+    user_id: str
+    child_id: Optional[str] = None
+
+
+@strawberry.input
+class AnswerInput:
+    question_id: int
+    answer: Optional[str] = None
+    selected_option_ids: Optional[List[int]] = None
@@ -0,0 +1,90 @@
+from contextvars import ContextVar
+from typing import Any, Iterable
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Model, Prefetch, QuerySet, prefetch_related_objects
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor, ReverseManyToOneDescriptor
+from strawberry.extensions import SchemaExtension
+from strawberry.utils.inspect import in_async_context
+
+
+class RelationLoader:
+    """
+    Request-scoped batching for relation fields. Instances returned together
+    (a result page, or every child loaded for one page) form a sibling group;
+    the first time a relation is resolved on any member it is prefetched for
+    the whole group in one query, and the loaded children become the group
+    for the next level down. A list of N rows therefore costs one query per
+    relation level, not N.
+    """
+
+    def __init__(self):
+        self._groups: dict[int, list[Model]] = {}
+        self._expanded: set[tuple[int, str]] = set()
+
+    def track(self, instances: Iterable[Model | None]) -> list[Model]:
+        group = [instance for instance in instances if instance is not None]
+        for instance in group:
+            self._groups[id(instance)] = group
+        return group
+
+    def is_loaded(self, instance: Model, name: str) -> bool:
+        group = self._groups.get(id(instance))
+        return group is not None and (id(group), name) in self._expanded
+
+    def load(self, instance: Model, name: str, queryset: QuerySet | None = None) -> Any:
+        group = self._groups.get(id(instance)) or self.track([instance])
+        prefetch_related_objects(group, Prefetch(name, queryset=queryset) if queryset is not None else name)
+        if (id(group), name) not in self._expanded:
+            self._expanded.add((id(group), name))
+            children = []
+            for member in group:
+                value = _related(member, name)
+                children.extend(value if isinstance(value, list) else [value])
+            self.track(children)
+        return _related(instance, name)
+
+
+def _related(instance: Model, name: str) -> Any:
+    descriptor = getattr(type(instance), name)
+    if isinstance(descriptor, (ReverseManyToOneDescriptor, ManyToManyDescriptor)):
+        return list(getattr(instance, name).all())
+    try:
+        return getattr(instance, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+_current: ContextVar[RelationLoader | None] = ContextVar("surveys_relation_loader", default=None)
+
+
+def track(instances: Iterable[Model | None]) -> list[Model]:
+    """Register `instances` as siblings for batched relation loading."""
+    loader = _current.get()
+    if loader is None:
+        return [instance for instance in instances if instance is not None]
+    return loader.track(instances)
+
+
+def load_related(instance: Model, name: str, queryset: QuerySet | None = None) -> Any:
+    """
+    Resolve relation `name` on `instance`, batched across its siblings.
+    `queryset` narrows or orders the related rows, as with `Prefetch`.
+    Under async execution the first load of a sibling group runs in a worker
+    thread (an awaitable is returned); later ones are read from the prefetch
+    cache inline.
+    """
+    loader = _current.get() or RelationLoader()
+    if in_async_context() and not loader.is_loaded(instance, name):
+        return sync_to_async(loader.load)(instance, name, queryset)
+    return loader.load(instance, name, queryset)
+
+
+class RelationLoaderExtension(SchemaExtension):
+    def on_operation(self):
+        token = _current.set(RelationLoader())
+        try:
+            yield
+        finally:
+            _current.reset(token)
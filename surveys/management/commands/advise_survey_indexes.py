@@ -0,0 +1,98 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from surveys.advisor import advise
+
+
+def _format_cost(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+class Command(BaseCommand):
+    help = "Propose Survey indexes for the filter/sort combinations recorded from Query.surveys"
+
+    def add_arguments(self, parser):
+        parser.epilog = (
+            "Examples:\n"
+            "  python manage.py advise_survey_indexes --min-hits 50\n"
+            "  python manage.py advise_survey_indexes --measure\n"
+            "  python manage.py advise_survey_indexes --accept ix_survey_adv_1a2b3c4d --emit-migration\n"
+            "\n"
+            "Shapes are recorded for SURVEYS_QUERY_SHAPE_SAMPLE_RATE of requests.\n"
+            "--measure builds each index inside a rolled-back transaction (Postgres),\n"
+            "which locks the surveys table for writes while it runs.\n"
+        )
+        parser.add_argument("--min-hits", type=int, default=1, help="Ignore shapes seen fewer times")
+        parser.add_argument("--top", type=int, default=20, help="Number of proposals to show")
+        parser.add_argument(
+            "--measure",
+            action="store_true",
+            help="Estimate the gain by planning each sample query with the index in place",
+        )
+        parser.add_argument(
+            "--accept",
+            nargs="+",
+            default=None,
+            metavar="NAME",
+            help="Index names to keep for --emit-migration (default: all shown)",
+        )
+        parser.add_argument(
+            "--emit-migration",
+            action="store_true",
+            help="Write a surveys migration adding the accepted indexes",
+        )
+
+    def handle(self, *args, **options):
+        proposals = advise(min_hits=options["min_hits"], measure=options["measure"])[: options["top"]]
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("No index proposals: recorded shapes are already covered"))
+            return
+
+        for proposal in proposals:
+            index = proposal.index
+            gain = f"{proposal.gain:.0%}" if proposal.gain is not None else "-"
+            condition = ""
+            if index.condition is not None:
+                condition = " WHERE " + " AND ".join(f"{key}={value}" for key, value in index.condition.children)
+            self.stdout.write(
+                f"{index.name}  ({', '.join(index.fields)}){condition}  "
+                f"hits={proposal.hits} shapes={proposal.shapes} "
+                f"cost={_format_cost(proposal.cost_before)}->{_format_cost(proposal.cost_after)} gain={gain}"
+            )
+
+        if not options["emit_migration"]:
+            return
+
+        accepted = proposals
+        if options["accept"]:
+            by_name = {proposal.index.name: proposal for proposal in proposals}
+            unknown = sorted(set(options["accept"]) - set(by_name))
+            if unknown:
+                raise CommandError(f"Unknown index proposals: {', '.join(unknown)}")
+            accepted = [by_name[name] for name in options["accept"]]
+        self._write_migration([proposal.index for proposal in accepted])
+
+    def _write_migration(self, indexes):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaves = loader.graph.leaf_nodes("surveys")
+        if len(leaves) != 1:
+            raise CommandError("Resolve conflicting surveys migrations before emitting a new one")
+        leaf = leaves[0]
+        number = (MigrationAutodetector.parse_number(leaf[1]) or 0) + 1
+
+        migration = migrations.Migration(f"{number:04d}_survey_advised_indexes", "surveys")
+        migration.dependencies = [leaf]
+        migration.operations = [migrations.AddIndex(model_name="survey", index=index) for index in indexes]
+
+        writer = MigrationWriter(migration)
+        with open(writer.path, "w", encoding="utf-8") as fh:
+            fh.write(writer.as_string())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {os.path.relpath(writer.path)}"))
+        self.stdout.write("Add these to Survey.Meta.indexes so makemigrations stays clean:")
+        for index in indexes:
+            self.stdout.write(f"    {MigrationWriter.serialize(index)[0]},")
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from app.auth import AsyncAuthedGraphQLView, AuthedGraphQLView
+from surveys.schema import schema
+
+DEFAULT_QUERY = """
+query ($input: SurveysListInput!) {
+  surveys(surveysListInput: $input) {
+    total
+    facets { name values { value count } }
+    items {
+      id
+      title
+      sections { id questions { id title } }
+    }
+  }
+}
+"""
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = "Compare /graphql throughput and latency under the WSGI and ASGI views"
+
+    def add_arguments(self, parser):
+        parser.epilog = (
+            "Examples:\n"
+            "  python manage.py benchmark_graphql\n"
+            "  python manage.py benchmark_graphql --requests 500 --concurrency 50 --workers 4\n"
+            "  python manage.py benchmark_graphql --query-file survey.graphql --variables '{\"id\": 1}'\n"
+            "\n"
+            "Both views run in-process against the configured database, without the\n"
+            "HTTP server. WSGI mode serves at most --workers requests at a time (one\n"
+            "per sync worker); ASGI mode serves every in-flight request from one event\n"
+            "loop. The survey list cache is bypassed unless --use-cache is given.\n"
+        )
+        parser.add_argument("--mode", choices=["both", "wsgi", "asgi"], default="both")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per mode")
+        parser.add_argument("--concurrency", type=int, default=20, help="Clients issuing requests at once")
+        parser.add_argument("--workers", type=int, default=2, help="Sync workers in WSGI mode")
+        parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per mode")
+        parser.add_argument("--query-file", default=None, help="GraphQL document (default: a survey list)")
+        parser.add_argument("--variables", default=None, help="JSON variables for the document")
+        parser.add_argument("--limit", type=int, default=20, help="Page size for the default query")
+        parser.add_argument("--token", default=None, help="Bearer token sent with every request")
+        parser.add_argument("--use-cache", action="store_true", help="Keep the survey list cache enabled")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1 or options["workers"] < 1:
+            raise CommandError("--requests, --concurrency and --workers must be positive")
+        if options["query_file"]:
+            with open(options["query_file"]) as handle:
+                query = handle.read()
+        else:
+            query = DEFAULT_QUERY
+        try:
+            variables = json.loads(options["variables"]) if options["variables"] else {"input": {"limit": options["limit"]}}
+        except ValueError as exc:
+            raise CommandError(f"--variables is not valid JSON: {exc}")
+
+        body = json.dumps({"query": query, "variables": variables})
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {options['token']}"} if options["token"] else {}
+        overrides = {} if options["use_cache"] else {"SURVEYS_LIST_CACHE_TIMEOUT": 0}
+
+        results = {}
+        with override_settings(**overrides):
+            if options["mode"] in ("both", "wsgi"):
+                results["wsgi"] = self.run_wsgi(body, headers, options)
+            if options["mode"] in ("both", "asgi"):
+                results["asgi"] = asyncio.run(self.run_asgi(body, headers, options))
+
+        for mode, (elapsed, latencies, responses) in results.items():
+            errors = sum(1 for status, content in responses if status != 200 or b'"errors"' in content)
+            self.stdout.write(
+                f"{mode.upper():5} {len(latencies)} requests in {elapsed:.2f}s  "
+                f"{len(latencies) / elapsed:8.1f} req/s  "
+                f"p50 {_percentile(latencies, 0.50) * 1000:7.1f}ms  "
+                f"p95 {_percentile(latencies, 0.95) * 1000:7.1f}ms  "
+                f"p99 {_percentile(latencies, 0.99) * 1000:7.1f}ms  "
+                f"mean {statistics.fmean(latencies) * 1000:7.1f}ms  errors {errors}"
+            )
+            if errors:
+                status, content = next((s, c) for s, c in responses if s != 200 or b'"errors"' in c)
+                self.stdout.write(self.style.WARNING(f"  first error ({status}): {content[:300].decode(errors='replace')}"))
+
+        if len(results) == 2:
+            wsgi, asgi = results["wsgi"], results["asgi"]
+            if json.loads(wsgi[2][0][1]) != json.loads(asgi[2][0][1]):
+                self.stdout.write(self.style.WARNING("WSGI and ASGI responses differ"))
+            speedup = (len(asgi[1]) / asgi[0]) / (len(wsgi[1]) / wsgi[0])
+            self.stdout.write(self.style.SUCCESS(f"ASGI throughput is {speedup:.2f}x WSGI"))
+
+    def run_wsgi(self, body: str, headers: dict, options) -> tuple[float, list[float], list[tuple[int, bytes]]]:
+        view = AuthedGraphQLView.as_view(schema=schema)
+        factory = RequestFactory()
+        workers = threading.BoundedSemaphore(options["workers"])
+
+        def call(_index) -> tuple[float, tuple[int, bytes]]:
+            started = time.perf_counter()
+            with workers:
+                close_old_connections()
+                try:
+                    response = view(factory.post("/graphql", data=body, content_type="application/json", **headers))
+                finally:
+                    close_old_connections()
+            return time.perf_counter() - started, (response.status_code, response.content)
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(call, range(options["warmup"])))
+            started = time.perf_counter()
+            outcomes = list(pool.map(call, range(options["requests"])))
+            elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in outcomes], [response for _, response in outcomes]
+
+    async def run_asgi(self, body: str, headers: dict, options) -> tuple[float, list[float], list[tuple[int, bytes]]]:
+        view = AsyncAuthedGraphQLView.as_view(schema=schema)
+        factory = AsyncRequestFactory()
+        in_flight = asyncio.Semaphore(options["concurrency"])
+
+        async def call() -> tuple[float, tuple[int, bytes]]:
+            async with in_flight:
+                started = time.perf_counter()
+                # As ASGIHandler does, give each request its own thread for
+                # thread-sensitive ORM work.
+                async with ThreadSensitiveContext():
+                    response = await view(factory.post("/graphql", data=body, content_type="application/json", **headers))
+                    await sync_to_async(close_old_connections)()
+                return time.perf_counter() - started, (response.status_code, response.content)
+
+        await asyncio.gather(*(call() for _ in range(options["warmup"])))
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(call() for _ in range(options["requests"])))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in outcomes], [response for _, response in outcomes]
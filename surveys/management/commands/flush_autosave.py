@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from user_surveys.autosave import flush_due, get_autosave_buffer
+
+
+class Command(BaseCommand):
+    help = "Write autosaved answers buffered by Mutation.autosaveAnswer to UserAnswer"
+
+    def add_arguments(self, parser):
+        parser.epilog = (
+            "Examples:\n"
+            "  python manage.py flush_autosave\n"
+            "  python manage.py flush_autosave --loop --interval 5\n"
+            "\n"
+            "With AUTOSAVE_BACKEND=shared, run this with --loop as a sidecar (or with\n"
+            "AUTOSAVE_FLUSH_INTERVAL=0 on the web workers) so buffers left by a\n"
+            "crashed worker are still flushed. With the local backend it only sees\n"
+            "its own process, and with the direct backend nothing is buffered.\n"
+        )
+        parser.add_argument("--max-age", type=float, default=None, help="Only flush buffers at least this many seconds old")
+        parser.add_argument("--loop", action="store_true", help="Keep flushing every --interval seconds")
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be positive")
+        buffer = get_autosave_buffer()
+        if buffer is None:
+            self.stdout.write(self.style.WARNING("AUTOSAVE_BACKEND=direct buffers nothing; there is nothing to flush"))
+            return
+        while True:
+            written = flush_due(options["max_age"], buffer)
+            close_old_connections()
+            self.stdout.write(self.style.SUCCESS(f"Flushed {written} answers; {buffer.depth()} assessments buffered"))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
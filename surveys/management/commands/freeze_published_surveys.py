@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from surveys.models import Status, Survey
+from surveys.versions import publish_survey_version
+
+
+class Command(BaseCommand):
+    help = "Freeze a SurveyVersion for every published survey that does not have one yet"
+
+    def add_arguments(self, parser):
+        parser.epilog = (
+            "Run once after deploying survey versions: surveys published before then\n"
+            "are served from their live tree until they have a snapshot.\n"
+        )
+
+    def handle(self, *args, **options):
+        frozen = 0
+        surveys = Survey.objects.filter(current_status=Status.STATUS_PUBLISHED, published_version__isnull=True)
+        for survey in surveys.iterator():
+            with transaction.atomic():
+                survey.published_version = publish_survey_version(survey)
+                survey.save(update_fields=["published_version"])
+            frozen += 1
+        self.stdout.write(self.style.SUCCESS(f"Froze published surveys: count={frozen}"))
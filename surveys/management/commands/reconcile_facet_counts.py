@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from surveys.models import SurveyFacetCount
+
+
+class Command(BaseCommand):
+    help = "Recount SurveyFacetCount rows from the surveys table and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.epilog = (
+            "Run periodically (e.g. from cron) to correct counts changed by bulk\n"
+            "updates or raw SQL that bypass the Survey/Status signal hooks.\n"
+        )
+
+    def handle(self, *args, **options):
+        drifted = SurveyFacetCount.rebuild()
+        if drifted:
+            self.stdout.write(self.style.WARNING(f"Repaired facet counts: drifted={drifted}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Facet counts are up to date"))
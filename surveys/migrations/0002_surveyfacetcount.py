@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_facet_counts(apps, schema_editor):
+    Survey = apps.get_model("surveys", "Survey")
+    SurveyFacetCount = apps.get_model("surveys", "SurveyFacetCount")
+    rows = (
+        Survey.objects.order_by()
+        .values_list("status__status", "assessment_type", "language")
+        .annotate(count=Count("id"))
+    )
+    SurveyFacetCount.objects.bulk_create(
+        [
+            SurveyFacetCount(
+                status=status or "",
+                assessment_type=assessment_type or "",
+                language=language or "",
+                count=count,
+            )
+            for status, assessment_type, language, count in rows
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(blank=True, default='', max_length=20)),
+                ('assessment_type', models.CharField(blank=True, default='', max_length=255)),
+                ('language', models.CharField(blank=True, default='', max_length=64)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('status', 'assessment_type', 'language'), name='uq_survey_facet_count_key')],
+            },
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
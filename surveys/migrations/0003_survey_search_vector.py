@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-17 10:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Case, Q, Value, When
+
+import surveys.operations
+
+SEARCH_CONFIGS = {
+    "ar": "arabic",
+    "en": "english",
+    "fr": "french",
+    "de": "german",
+    "es": "spanish",
+    "tr": "turkish",
+}
+
+
+def populate_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Survey = apps.get_model("surveys", "Survey")
+    config = Case(
+        *[
+            When(Q(language__iexact=code) | Q(language__istartswith=f"{code}-"), then=Value(name))
+            for code, name in SEARCH_CONFIGS.items()
+        ],
+        default=Value("simple"),
+    )
+    Survey.objects.update(
+        search_vector=SearchVector("title", weight="A", config=config)
+        + SearchVector("short_description", weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0002_surveyfacetcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+        surveys.operations.PostgresAddIndex(
+            model_name='survey',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='ix_survey_search_vector'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 11:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+import surveys.operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0003_survey_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        surveys.operations.PostgresAddIndex(
+            model_name='survey',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='ix_survey_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 12:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_current_status(apps, schema_editor):
+    Survey = apps.get_model("surveys", "Survey")
+    Status = apps.get_model("surveys", "Status")
+    Survey.objects.filter(status__isnull=False).update(
+        current_status=Subquery(Status.objects.filter(pk=OuterRef("status_id")).values("status")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0004_survey_title_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='current_status',
+            field=models.CharField(blank=True, choices=[('draft', 'Draft'), ('pending', 'Pending'), ('published', 'Published'), ('archived', 'Archived'), ('suspended', 'Suspended'), ('canceled', 'Canceled'), ('rejected', 'Rejected'), ('approved', 'Approved'), ('started', 'Started'), ('ended', 'Ended')], editable=False, max_length=20, null=True, verbose_name='Current Status'),
+        ),
+        migrations.RunPython(populate_current_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['current_status', '-created_at', '-id'], name='ix_survey_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['-created_at', '-id'], name='ix_survey_created'),
+        ),
+    ]
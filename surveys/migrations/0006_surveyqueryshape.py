@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 13:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0005_survey_current_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyQueryShape',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.CharField(max_length=64, unique=True)),
+                ('equality', models.JSONField(default=list)),
+                ('ranges', models.JSONField(default=list)),
+                ('sort', models.JSONField(default=list)),
+                ('has_search', models.BooleanField(default=False)),
+                ('sample', models.JSONField(default=dict)),
+                ('hits', models.PositiveBigIntegerField(default=0)),
+                ('last_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
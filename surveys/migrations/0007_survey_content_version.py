@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0006_surveyqueryshape'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Content Version'),
+        ),
+    ]
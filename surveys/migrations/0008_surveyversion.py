@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-17 16:05
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0007_survey_content_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('content_version', models.PositiveIntegerField()),
+                ('definition', models.JSONField(editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('published_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('published_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='surveys.survey')),
+            ],
+            options={
+                'ordering': ['survey', 'number'],
+            },
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='published_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='surveys.surveyversion', verbose_name='Published Version'),
+        ),
+        migrations.AddConstraint(
+            model_name='surveyversion',
+            constraint=models.UniqueConstraint(fields=('survey', 'number'), name='uq_survey_version_number'),
+        ),
+    ]
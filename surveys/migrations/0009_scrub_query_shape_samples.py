@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-17 18:20
+
+from django.db import migrations
+
+SAMPLED_FILTERS = ('status', 'language', 'assessment_type')
+
+
+def scrub_samples(apps, schema_editor):
+    SurveyQueryShape = apps.get_model('surveys', 'SurveyQueryShape')
+    for record in SurveyQueryShape.objects.exclude(sample={}).iterator():
+        sample = {
+            name: value if name in SAMPLED_FILTERS or isinstance(value, bool) else '?'
+            for name, value in record.sample.items()
+        }
+        if sample != record.sample:
+            SurveyQueryShape.objects.filter(pk=record.pk).update(sample=sample)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0008_surveyversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(scrub_samples, migrations.RunPython.noop),
+    ]
@@ -2,14 +2,19 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.db.models.signals import post_delete, post_save
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from uuid import uuid4
 
+from surveys.cache import bump_catalogue_version
 from taxonomy.models import Category
 
 UserModel = get_user_model()
@@ -77,6 +82,39 @@ class Status(models.Model):
         return dict(self.STATUS_CHOICES).get(self.status)
 
 
+# Postgres text-search configuration per survey language; anything else is
+# indexed with the language-agnostic "simple" configuration.
+SEARCH_CONFIGS = {
+    "ar": "arabic",
+    "en": "english",
+    "fr": "french",
+    "de": "german",
+    "es": "spanish",
+    "tr": "turkish",
+}
+SEARCH_WEIGHTS = {"title": "A", "short_description": "B", "description": "C"}
+
+
+def search_config_for(language: str | None) -> str:
+    code = (language or "").split("-")[0].lower()
+    return SEARCH_CONFIGS.get(code, "simple")
+
+
+def search_vector_expression() -> SearchVector:
+    config = Case(
+        *[
+            When(Q(language__iexact=code) | Q(language__istartswith=f"{code}-"), then=Value(name))
+            for code, name in SEARCH_CONFIGS.items()
+        ],
+        default=Value("simple"),
+    )
+    vectors = [SearchVector(field, weight=SEARCH_WEIGHTS[field], config=config) for field in Survey.SEARCH_INDEX]
+    vector = vectors[0]
+    for other in vectors[1:]:
+        vector = vector + other
+    return vector
+
+
 class Survey(models.Model):
     DISPLAY_OPTION_SINGLE_QUESTION = "single_question"
     DISPLAY_OPTION_LIST = "list"
@@ -113,6 +151,12 @@ class Survey(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="ix_survey_search_vector"),
+            GinIndex(fields=["title"], opclasses=["gin_trgm_ops"], name="ix_survey_title_trgm"),
+            models.Index(fields=["current_status", "-created_at", "-id"], name="ix_survey_status_created"),
+            models.Index(fields=["-created_at", "-id"], name="ix_survey_created"),
+        ]
 
     title = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Title"))
     description = models.TextField(null=True, blank=True, verbose_name=_("Description"))
@@ -135,6 +179,34 @@ class Survey(models.Model):
         related_name="current_surveys",
         verbose_name=_("Status"),
     )
+    # Copy of `status.status` for filtering, sorting and facets without the
+    # join; `Status` remains the audit log.
+    current_status = models.CharField(
+        max_length=20,
+        choices=Status.STATUS_CHOICES,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Current Status"),
+    )
+    # Incremented by saves that change the survey's own definition fields and
+    # by the child signals below; versions the compiled definition and the
+    # `Query.survey` ETag.
+    content_version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name=_("Content Version"),
+    )
+    # Snapshot respondents read; set by publishing (see update_status).
+    published_version = models.ForeignKey(
+        "SurveyVersion",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        verbose_name=_("Published Version"),
+    )
     assessment_type = models.CharField(
         max_length=255,
         choices=ASSESSMENT_TYPES,
@@ -202,13 +274,73 @@ class Survey(models.Model):
     )
     price = models.FloatField(default=0)
 
+    # full-text search, maintained on save (Postgres only)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    # Saving only these leaves content_version alone.
+    NON_DEFINITION_FIELDS = frozenset({"content_version", "updated_at", "search_vector"})
+
     def __str__(self):
         return str(self.title)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept so save() can tell whether definition fields changed.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def _definition_changed(self, update_fields) -> bool:
+        loaded = getattr(self, "_loaded_values", None)
+        for field in self._meta.concrete_fields:
+            if field.name in self.NON_DEFINITION_FIELDS or field.attname not in self.__dict__:
+                continue
+            if update_fields is not None and not {field.name, field.attname} & set(update_fields):
+                continue
+            if loaded is None or field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname]:
+                return True
+        return False
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "status" in update_fields:
+            self.current_status = self.status.status if self.status_id else None
+            if update_fields is not None:
+                update_fields = {*update_fields, "current_status"}
+        existing = self.pk is not None and not self._state.adding
+        bump = existing and self._definition_changed(update_fields)
+        if bump:
+            # Django 6 reads the incremented value back with the UPDATE's
+            # RETURNING clause, so no refresh is needed afterwards.
+            self.content_version = F("content_version") + 1
+        elif existing and update_fields is None:
+            # Child edits bump the row behind this instance's back; a full
+            # save must not write a stale version over theirs.
+            self.content_version = F("content_version")
+        if update_fields is not None:
+            update_fields = {*update_fields, "updated_at"}
+            if bump:
+                update_fields.add("content_version")
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
     def update_status(self, status: str, user: UserModel | None = None) -> Status:
-        entry = Status.objects.create(survey=self, user=user, status=status)
-        self.status = entry
-        self.save(update_fields=["status"])
+        with transaction.atomic():
+            entry = Status.objects.create(survey=self, user=user, status=status)
+            self.status = entry
+            update_fields = ["status", "current_status"]
+            if status == Status.STATUS_PUBLISHED:
+                # Imported here: surveys.versions compiles definitions from these models.
+                from surveys.versions import publish_survey_version
+
+                self.published_version = publish_survey_version(self, user)
+                update_fields.append("published_version")
+            self.save(update_fields=update_fields)
         return entry
 
     @property
@@ -217,9 +349,7 @@ class Survey(models.Model):
 
     @property
     def get_status(self):
-        if self.status_id is None:
-            return None
-        return self.status.get_status
+        return dict(Status.STATUS_CHOICES).get(self.current_status)
 
     @property
     def get_evaluation_type(self):
@@ -249,6 +379,120 @@ class SurveyMediaAsset(models.Model):
     asset_type = models.CharField(max_length=32, choices=AssetType.choices)
 
 
+class SurveyFacetCount(models.Model):
+    """
+    Precomputed survey counts per (status, assessment_type, language) combination.
+    NULL dimension values are stored as "" so the combination stays unique.
+    """
+
+    DIMENSIONS = ("status", "assessment_type", "language")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["status", "assessment_type", "language"],
+                name="uq_survey_facet_count_key",
+            ),
+        ]
+
+    status = models.CharField(max_length=20, blank=True, default="")
+    assessment_type = models.CharField(max_length=255, blank=True, default="")
+    language = models.CharField(max_length=64, blank=True, default="")
+    count = models.IntegerField(default=0)
+
+    @staticmethod
+    def key_for(status: str | None, assessment_type: str | None, language: str | None) -> tuple[str, str, str]:
+        return (status or "", assessment_type or "", language or "")
+
+    @classmethod
+    def shift(cls, key: tuple[str, str, str], delta: int) -> None:
+        if not delta:
+            return
+        lookup = dict(zip(cls.DIMENSIONS, key))
+        if cls.objects.filter(**lookup).update(count=F("count") + delta):
+            return
+        _, created = cls.objects.get_or_create(**lookup, defaults={"count": delta})
+        if not created:
+            cls.objects.filter(**lookup).update(count=F("count") + delta)
+
+    @classmethod
+    def rebuild(cls) -> int:
+        """Recount every combination from `Survey`; returns the number of rows that drifted."""
+        with transaction.atomic():
+            current = {
+                tuple(row[:3]): row[3]
+                for row in cls.objects.select_for_update().values_list(*cls.DIMENSIONS, "count")
+            }
+            expected = {
+                cls.key_for(*row[:3]): row[3]
+                for row in Survey.objects.order_by()
+                .values_list("current_status", "assessment_type", "language")
+                .annotate(count=Count("id"))
+            }
+            drifted = sum(
+                1 for key in expected.keys() | current.keys() if expected.get(key, 0) != current.get(key, 0)
+            )
+            if drifted:
+                cls.objects.all().delete()
+                cls.objects.bulk_create(
+                    [cls(**dict(zip(cls.DIMENSIONS, key)), count=count) for key, count in expected.items()]
+                )
+        return drifted
+
+
+class SurveyQueryShape(models.Model):
+    """
+    A filter/sort combination received by `Query.surveys`, recorded for a
+    sample of requests and read by the `advise_survey_indexes` command.
+    """
+
+    signature = models.CharField(max_length=64, unique=True)
+    equality = models.JSONField(default=list)
+    ranges = models.JSONField(default=list)
+    sort = models.JSONField(default=list)
+    has_search = models.BooleanField(default=False)
+    sample = models.JSONField(default=dict)
+    hits = models.PositiveBigIntegerField(default=0)
+    last_seen_at = models.DateTimeField(default=now)
+
+    @classmethod
+    def record(cls, signature: str, **shape) -> None:
+        seen = now()
+        sample = shape.pop("sample", {})
+        if cls.objects.filter(signature=signature).update(hits=F("hits") + 1, last_seen_at=seen, sample=sample):
+            return
+        _, created = cls.objects.get_or_create(
+            signature=signature,
+            defaults={**shape, "sample": sample, "hits": 1, "last_seen_at": seen},
+        )
+        if not created:
+            cls.objects.filter(signature=signature).update(hits=F("hits") + 1, last_seen_at=seen)
+
+
+class SurveyVersion(models.Model):
+    """
+    Immutable snapshot of a survey's compiled definition, frozen when the
+    survey is published. Respondents and their `UserAssessment` rows read
+    from here, never from the editable tree.
+    """
+
+    class Meta:
+        ordering = ["survey", "number"]
+        constraints = [
+            models.UniqueConstraint(fields=["survey", "number"], name="uq_survey_version_number"),
+        ]
+
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name="versions")
+    number = models.PositiveIntegerField()
+    content_version = models.PositiveIntegerField()
+    definition = models.JSONField(encoder=DjangoJSONEncoder, editable=False)
+    published_at = models.DateTimeField(default=now)
+    published_by = models.ForeignKey(UserModel, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    def __str__(self):
+        return f"{self.survey_id} v{self.number}"
+
+
 class HasSoftDelete(models.Model):
     class Meta:
         abstract = True
@@ -591,6 +835,195 @@ def _update_question_order(sender, instance: Question, **kwargs):
     Question.objects.bulk_update(questions, ["order"])
 
 
+@receiver(post_save, sender=Survey)
+def _update_survey_search_vector(sender, instance: Survey, update_fields=None, **kwargs):
+    if connection.vendor != "postgresql":
+        return
+    if update_fields is not None and not {*Survey.SEARCH_INDEX, "language"} & set(update_fields):
+        return
+    Survey.objects.filter(pk=instance.pk).update(search_vector=search_vector_expression())
+
+
+def _survey_facet_key_from_db(survey_id) -> tuple[str, str, str] | None:
+    row = (
+        Survey.objects.filter(pk=survey_id)
+        .values_list("current_status", "assessment_type", "language")
+        .first()
+    )
+    return SurveyFacetCount.key_for(*row) if row else None
+
+
+@receiver(pre_save, sender=Survey)
+def _capture_survey_facet_key(sender, instance: Survey, update_fields=None, **kwargs):
+    instance._facet_count_key = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not {"current_status", "assessment_type", "language"} & set(update_fields):
+        instance._facet_count_key = False
+        return
+    instance._facet_count_key = _survey_facet_key_from_db(instance.pk)
+
+
+@receiver(post_save, sender=Survey)
+def _update_survey_facet_counts(sender, instance: Survey, created: bool, **kwargs):
+    previous = getattr(instance, "_facet_count_key", None)
+    if previous is False:
+        return
+    current = SurveyFacetCount.key_for(
+        instance.current_status,
+        instance.assessment_type,
+        instance.language,
+    )
+    if previous == current:
+        return
+    if previous is not None:
+        SurveyFacetCount.shift(previous, -1)
+    SurveyFacetCount.shift(current, 1)
+
+
+@receiver(pre_delete, sender=Survey)
+def _capture_deleted_survey_facet_key(sender, instance: Survey, **kwargs):
+    instance._facet_count_key = _survey_facet_key_from_db(instance.pk)
+
+
+@receiver(post_delete, sender=Survey)
+def _decrement_survey_facet_counts(sender, instance: Survey, **kwargs):
+    previous = getattr(instance, "_facet_count_key", None)
+    if previous:
+        SurveyFacetCount.shift(previous, -1)
+
+
+def _shift_status_facet_counts(survey_ids, old_status: str | None, new_status: str | None) -> None:
+    rows = (
+        Survey.objects.filter(pk__in=survey_ids)
+        .order_by()
+        .values_list("assessment_type", "language")
+        .annotate(count=Count("id"))
+    )
+    for assessment_type, language, count in rows:
+        SurveyFacetCount.shift(SurveyFacetCount.key_for(old_status, assessment_type, language), -count)
+        SurveyFacetCount.shift(SurveyFacetCount.key_for(new_status, assessment_type, language), count)
+
+
+@receiver(pre_save, sender=Status)
+def _capture_previous_status(sender, instance: Status, **kwargs):
+    instance._previous_status = (
+        Status.objects.filter(pk=instance.pk).values_list("status", flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Status)
+def _update_status_facet_counts(sender, instance: Status, created: bool, **kwargs):
+    previous = getattr(instance, "_previous_status", None)
+    if created or previous == instance.status:
+        return
+    survey_ids = list(Survey.objects.filter(status=instance).values_list("pk", flat=True))
+    # .update() skips Survey.save, so move content_version (definition cache,
+    # ETag) here; the catalogue version is bumped by _bump_catalogue_version.
+    Survey.objects.filter(pk__in=survey_ids).update(
+        current_status=instance.status, content_version=F("content_version") + 1
+    )
+    _shift_status_facet_counts(survey_ids, previous, instance.status)
+
+
+@receiver(pre_delete, sender=Status)
+def _update_deleted_status_facet_counts(sender, instance: Status, **kwargs):
+    # Surveys pointing at this entry fall back to a NULL status. Surveys deleted
+    # in the same cascade are handled by their own hooks, so only shift the
+    # ones that still exist once the deletion has committed.
+    survey_ids = list(Survey.objects.filter(status=instance).values_list("pk", flat=True))
+    if not survey_ids:
+        return
+    old_status = instance.status
+
+    def _clear_current_status():
+        Survey.objects.filter(pk__in=survey_ids, status__isnull=True).update(
+            current_status=None, content_version=F("content_version") + 1
+        )
+        _shift_status_facet_counts(survey_ids, old_status, None)
+        # current_status only changes now, so lists cached since the delete are stale.
+        bump_catalogue_version()
+
+    transaction.on_commit(_clear_current_status)
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=AnswerSchema)
+@receiver(post_delete, sender=AnswerSchema)
+@receiver(post_save, sender=AnswerSchemaOption)
+@receiver(post_delete, sender=AnswerSchemaOption)
+@receiver(post_save, sender=Classification)
+@receiver(post_delete, sender=Classification)
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+@receiver(post_save, sender=Recommendation)
+@receiver(post_delete, sender=Recommendation)
+def _touch_survey_definition(sender, instance, using, **kwargs):
+    # Child edits move Survey.content_version, which versions the cached
+    # definition served by surveys.definitions and the survey ETag.
+    if instance.survey_id:
+        survey_ids = [instance.survey_id]
+    elif getattr(instance, "section_id", None):
+        survey_ids = Survey.objects.using(using).filter(sections=instance.section_id).values_list("pk", flat=True)
+    elif getattr(instance, "option_id", None):
+        survey_ids = Survey.objects.using(using).filter(answerschemaoption=instance.option_id).values_list("pk", flat=True)
+    else:
+        return
+    _touch_surveys(set(survey_ids), using)
+
+
+def _touch_surveys(survey_ids: set, using: str) -> None:
+    """
+    Bump the surveys' content_version once when the current transaction
+    commits (at once outside one), so building or deleting a tree costs one
+    UPDATE rather than one per child.
+    """
+    conn = transaction.get_connection(using)
+    if not conn.in_atomic_block:
+        _bump_content_version(survey_ids, using)
+        return
+    state = getattr(conn, "_survey_touches", None)
+    # A rollback discards the callback, and with it the ids it held.
+    if state is None or not any(callback is state[0] for _, callback, _ in conn.run_on_commit):
+        pending = set()
+
+        def bump():
+            conn._survey_touches = None
+            _bump_content_version(pending, using)
+
+        state = conn._survey_touches = (bump, pending)
+        transaction.on_commit(bump, using=using)
+    state[1].update(survey_ids)
+
+
+def _bump_content_version(survey_ids: set, using: str) -> None:
+    if survey_ids:
+        Survey.objects.using(using).filter(pk__in=survey_ids).update(
+            updated_at=now(), content_version=F("content_version") + 1
+        )
+
+
+@receiver(post_delete, sender=Survey)
+def _skip_deleted_survey_touches(sender, instance: Survey, using, **kwargs):
+    # The survey's children were deleted (and touched it) first.
+    state = getattr(transaction.get_connection(using), "_survey_touches", None)
+    if state is not None:
+        state[1].discard(instance.pk)
+
+
+@receiver(post_save, sender=Survey)
+@receiver(post_delete, sender=Survey)
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def _bump_catalogue_version(sender, **kwargs):
+    transaction.on_commit(bump_catalogue_version)
+
+
 # NOTE: The rest of this file contains legacy (monolith) Django models that
 # depend on apps/modules not installed in this service. We keep the source here
 # for upcoming restructuring work, but we intentionally prevent Django from
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class PostgresAddIndex(migrations.AddIndex):
+    """
+    AddIndex for Postgres-only index types (GIN, trigram opclasses). The model
+    state is always updated; the index itself is skipped on other backends so
+    local SQLite databases keep migrating.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,167 @@
+import base64
+import datetime
+import json
+import operator
+from dataclasses import dataclass
+from functools import reduce
+from typing import Any
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Model, Q, QuerySet
+
+
+@dataclass(frozen=True)
+class KeysetKey:
+    """One column of a keyset ordering (a model lookup or an annotation name)."""
+
+    lookup: str
+    descending: bool = False
+
+    def reversed(self) -> "KeysetKey":
+        return KeysetKey(lookup=self.lookup, descending=not self.descending)
+
+    @property
+    def token(self) -> str:
+        return f"-{self.lookup}" if self.descending else self.lookup
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates datetimes to milliseconds, which breaks the
+    # equality half of the seek predicate; keep full precision instead.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    items: list
+    next_cursor: str | None
+    previous_cursor: str | None
+
+
+def _alias(index: int) -> str:
+    return f"keyset_{index}"
+
+
+def resolve_lookup_field(model: type[Model], lookup: str):
+    field = None
+    for part in lookup.split("__"):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if field.is_relation and field.related_model is not None:
+            model = field.related_model
+    return field
+
+
+def encode_cursor(keys: list[KeysetKey], values: list[Any]) -> str:
+    payload = json.dumps(
+        {"k": [key.token for key in keys], "v": values},
+        cls=CursorJSONEncoder,
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(model: type[Model], keys: list[KeysetKey], cursor: str) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        tokens, values = payload["k"], payload["v"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid pagination cursor.")
+
+    if tokens != [key.token for key in keys] or len(values) != len(keys):
+        raise ValueError("Pagination cursor does not match the requested sort.")
+
+    decoded = []
+    for key, value in zip(keys, values):
+        field = resolve_lookup_field(model, key.lookup)
+        decoded.append(field.to_python(value) if field is not None and value is not None else value)
+    return decoded
+
+
+def _equal(alias: str, value: Any) -> Q:
+    if value is None:
+        return Q(**{f"{alias}__isnull": True})
+    return Q(**{alias: value})
+
+
+def _beyond(alias: str, key: KeysetKey, value: Any) -> Q | None:
+    # NULLs sort last ascending and first descending, matching Postgres defaults
+    # so plain btree indexes can serve the ordering.
+    if key.descending:
+        if value is None:
+            return Q(**{f"{alias}__isnull": False})
+        return Q(**{f"{alias}__lt": value})
+    if value is None:
+        return None
+    return Q(**{f"{alias}__gt": value}) | Q(**{f"{alias}__isnull": True})
+
+
+def _after(keys: list[KeysetKey], values: list[Any]) -> Q | None:
+    branches = []
+    for index, key in enumerate(keys):
+        beyond = _beyond(_alias(index), key, values[index])
+        if beyond is None:
+            continue
+        prefix = [_equal(_alias(i), values[i]) for i in range(index)]
+        branches.append(reduce(operator.and_, prefix, beyond))
+    if not branches:
+        return None
+    return reduce(operator.or_, branches)
+
+
+def _order_by(keys: list[KeysetKey]) -> list:
+    ordering = []
+    for index, key in enumerate(keys):
+        expression = F(_alias(index))
+        ordering.append(expression.desc(nulls_first=True) if key.descending else expression.asc(nulls_last=True))
+    return ordering
+
+
+def paginate_keyset(
+    qs: QuerySet,
+    keys: list[KeysetKey],
+    limit: int,
+    after: str | None = None,
+    before: str | None = None,
+) -> KeysetPage:
+    """
+    Return one page of `qs` ordered by `keys`, seeking past the cursor instead of
+    using OFFSET. `keys` must end with a unique column so the order is total.
+    """
+    # An empty cursor means no cursor, not "page backwards from the end".
+    after, before = after or None, before or None
+    if after and before:
+        raise ValueError("Only one of `after` and `before` may be provided.")
+
+    backwards = before is not None
+    cursor = before if backwards else after
+    seek_keys = [key.reversed() for key in keys] if backwards else keys
+
+    qs = qs.annotate(**{_alias(index): F(key.lookup) for index, key in enumerate(keys)})
+    if cursor:
+        condition = _after(seek_keys, decode_cursor(qs.model, keys, cursor))
+        qs = qs.filter(condition) if condition is not None else qs.none()
+
+    rows = list(qs.order_by(*_order_by(seek_keys))[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(row) -> str:
+        return encode_cursor(keys, [getattr(row, _alias(index)) for index in range(len(keys))])
+
+    has_next = has_more if not backwards else True
+    has_previous = bool(cursor) if not backwards else has_more
+    return KeysetPage(
+        items=rows,
+        next_cursor=cursor_for(rows[-1]) if rows and has_next else None,
+        previous_cursor=cursor_for(rows[0]) if rows and has_previous else None,
+    )
@@ -1,27 +1,267 @@
-from dataclasses import fields as dc_fields
-from typing import List
+import asyncio
+from dataclasses import dataclass, fields as dc_fields
+from typing import List, Optional
 
 import strawberry
 import strawberry_django
-from django.db.models import Count
-from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import QuerySet
+from django.http import Http404
 from pkg_filters.integrations.django import DjangoQueryContext
 from pkg_filters.integrations.strawberry import has_any_under_prefix, get_root_field_paths
+from strawberry.extensions import ParserCache, ValidationCache
+from strawberry.utils.inspect import in_async_context
 from strawberry_django.optimizer import DjangoOptimizerExtension
+from strawberry_django.resolvers import django_resolver
 
-from app.auth import strawberry_auth
-from .filters import pipeline, survey_sort_input_to_spec, SurveyProjection, SurveySpec
-from .inputs import SurveyFilters, SurveyFiltersInput, SurveysListInput
+from accounts.identity import resolve_user
+from app.auth import CanEnrollUsers, RequireAuth
+from app.persisted_queries import PersistedQueriesExtension
+from app.query_cost import QueryCostExtension
+from .advisor import record_query_shape
+from .cache import aget_or_compute, canonical, get_or_compute, selection_key
+from .cost import SURVEY_FIELD_WEIGHTS, SURVEY_LIST_SIZES, SURVEY_PAGINATED_FIELDS
+from .definitions import hydrate_survey
+from .facets import DEFAULT_SURVEY_FACETS, compute_facets, facets_from_counts
+from .filters import (
+    FULL_TEXT_ORDERING,
+    full_text_pipeline,
+    pipeline,
+    survey_sort_input_to_keyset,
+    survey_sort_input_to_spec,
+    SurveyProjection,
+    SurveySpec,
+)
+from .inputs import (
+    AnswerInput,
+    EnrollmentInput,
+    SurveyFilters,
+    SurveyFiltersInput,
+    SurveyPaginationMode,
+    SurveySearchMode,
+    SurveysListInput,
+    SurveyTotalMode,
+)
+from .loaders import RelationLoaderExtension, track
 from .models import Survey
-from .types import FacetGQL, FacetValueGQL, SurveyResultsGQL, SurveyType, UserAssessmentType
+from .pagination import KeysetPage, paginate_keyset
+from .search import apply_full_text_search, suggest_survey_titles
+from .totals import count_total
+from .types import (
+    BulkEnrollmentResultGQL,
+    FacetGQL,
+    FacetValueGQL,
+    SurveyResultsGQL,
+    SurveyTitleSuggestionGQL,
+    SurveyType,
+    UserAssessmentType,
+)
+from .versions import get_respondent_definition
 from user_surveys.models import UserAssessment
-from user_surveys.services import enroll_user_in_assessment
+from user_surveys.answers import AnswerData, submit_answers, submit_assessment
+from user_surveys.autosave import autosave_answer
+from user_surveys.services import bulk_enroll_users_in_assessment, enroll_user_in_assessment
 from strawberry.types import Info
 
-RequireAuth = strawberry_auth.require_authenticated()
-UserModel = get_user_model()
 
+def _facet_value(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+@dataclass(frozen=True)
+class _SurveyListPlan:
+    paths: list
+    input: SurveysListInput
+    filters_data: dict
+    spec: SurveySpec
+    base_qs: QuerySet
+    full_text: bool
+
+    @property
+    def wants_counts(self) -> bool:
+        return has_any_under_prefix(self.paths, ("facets",)) or has_any_under_prefix(self.paths, ("total",))
+
+
+def _list_filters_data(surveys_list_input: SurveysListInput) -> dict:
+    filters_input: SurveyFiltersInput | None = surveys_list_input.filters
+    filters_data = {}
+    for field in dc_fields(SurveyFilters):
+        name = field.name
+        if name in {"created_at", "updated_at"}:
+            value = getattr(filters_input, name, None) if filters_input else None
+            filters_data[name] = value.to_vo() if value else None
+            continue
+        filters_data[name] = getattr(filters_input, name, None) if filters_input else None
+    return filters_data
+
+
+def _record_list_shape(surveys_list_input: SurveysListInput) -> None:
+    # Recorded per request, cache hits included, so the advisor sees the real
+    # workload rather than only the misses.
+    record_query_shape(_list_filters_data(surveys_list_input), surveys_list_input.sort)
+
+
+def _plan_survey_list(paths, surveys_list_input: SurveysListInput) -> _SurveyListPlan:
+    qs = Survey.objects.all()
+    if has_any_under_prefix(paths, ("items", "contentType")):
+        qs = qs.select_related("content_type")
+    # Prefetching is delegated to strawberry_django optimizer to avoid
+    # conflicting lookups when it applies its own Prefetch querysets.
+
+    filters_data = _list_filters_data(surveys_list_input)
+    spec = SurveySpec(
+        limit=surveys_list_input.limit,
+        offset=surveys_list_input.offset,
+        projection=SurveyProjection.from_paths(paths),
+        filters=SurveyFilters(**filters_data),
+        sort=survey_sort_input_to_spec(surveys_list_input.sort),
+    )
+    full_text = (
+        surveys_list_input.search_mode == SurveySearchMode.FULL_TEXT
+        and bool(filters_data["q"])
+        and connection.vendor == "postgresql"
+    )
+    if full_text:
+        base_qs = full_text_pipeline.run(DjangoQueryContext(qs, spec)).stmt
+        base_qs = apply_full_text_search(base_qs, filters_data["q"], filters_data["language"])
+        if spec.sort is None:
+            base_qs = base_qs.order_by(*FULL_TEXT_ORDERING)
+    else:
+        base_qs = pipeline.run(DjangoQueryContext(qs, spec)).stmt
+    return _SurveyListPlan(paths, surveys_list_input, filters_data, spec, base_qs, full_text)
+
+
+def _survey_list_counts(plan: _SurveyListPlan) -> tuple[int | None, SurveyTotalMode, List[FacetGQL]]:
+    if has_any_under_prefix(plan.paths, ("facets",)):
+        facet_names = [f.value for f in plan.input.facets or []] or DEFAULT_SURVEY_FACETS
+        facet_result = facets_from_counts(plan.filters_data, facet_names) or compute_facets(plan.base_qs, facet_names)
+        facets = [
+            FacetGQL(
+                name=name,
+                values=[FacetValueGQL(value=_facet_value(value), count=count) for value, count in values],
+            )
+            for name, values in facet_result.facets.items()
+        ]
+        return facet_result.total, SurveyTotalMode.EXACT, facets
+    if has_any_under_prefix(plan.paths, ("total",)):
+        total, total_mode = count_total(plan.base_qs, plan.input.total_mode)
+        return total, total_mode, []
+    return None, SurveyTotalMode.NONE, []
+
+
+def _survey_list_page(plan: _SurveyListPlan) -> KeysetPage:
+    surveys_list_input = plan.input
+    items_qs = plan.spec.projection.apply(plan.base_qs)
+    if surveys_list_input.pagination == SurveyPaginationMode.CURSOR:
+        return paginate_keyset(
+            items_qs,
+            survey_sort_input_to_keyset(
+                surveys_list_input.sort,
+                **({"default_ordering": FULL_TEXT_ORDERING} if plan.full_text else {}),
+            ),
+            limit=surveys_list_input.limit,
+            after=surveys_list_input.after,
+            before=surveys_list_input.before,
+        )
+    offset = surveys_list_input.offset
+    return KeysetPage(
+        items=list(items_qs[offset: offset + surveys_list_input.limit]),
+        next_cursor=None,
+        previous_cursor=None,
+    )
+
+
+def _survey_results(counts, page: KeysetPage) -> SurveyResultsGQL:
+    total, total_mode, facets = counts
+    return SurveyResultsGQL(
+        items=page.items,
+        total=total,
+        facets=facets,
+        total_mode=total_mode,
+        next_cursor=page.next_cursor,
+        previous_cursor=page.previous_cursor,
+    )
+
+
+def _survey_list_parts(plan: _SurveyListPlan) -> tuple[tuple, KeysetPage]:
+    return _survey_list_counts(plan), _survey_list_page(plan)
+
+
+def _list_surveys(paths, surveys_list_input: SurveysListInput) -> SurveyResultsGQL:
+    return _survey_results(*_survey_list_parts(_plan_survey_list(paths, surveys_list_input)))
+
+
+def _on_own_connection(func):
+    """
+    Run `func` off the event loop in a pool thread rather than the request's
+    thread, so it gets its own database connection and overlaps with the
+    request's other queries.
+    """
+
+    def run(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def _plan_survey_list_async(paths, surveys_list_input: SurveysListInput) -> tuple[_SurveyListPlan, bool]:
+    # Pool-thread connections cannot see the writes of an open transaction.
+    return _plan_survey_list(paths, surveys_list_input), connection.in_atomic_block
 
+
+async def _alist_surveys(paths, surveys_list_input: SurveysListInput) -> SurveyResultsGQL:
+    plan, in_transaction = await sync_to_async(_plan_survey_list_async)(paths, surveys_list_input)
+    if not settings.SURVEYS_LIST_CONCURRENT_COUNTS or not plan.wants_counts or in_transaction:
+        return _survey_results(*await sync_to_async(_survey_list_parts)(plan))
+    # The total/facets and the page are independent queries over the same
+    # filtered set; issue them concurrently on separate connections.
+    counts, page = await asyncio.gather(
+        _on_own_connection(_survey_list_counts)(plan),
+        _on_own_connection(_survey_list_page)(plan),
+    )
+    return _survey_results(counts, page)
+
+
+def _list_cache_input(surveys_list_input: SurveysListInput) -> dict:
+    data = canonical(surveys_list_input)
+    if surveys_list_input.pagination == SurveyPaginationMode.CURSOR:
+        data.pop("offset", None)
+    else:
+        data.pop("after", None)
+        data.pop("before", None)
+    return data
+
+
+async def _asurveys(key_parts: tuple, paths, surveys_list_input: SurveysListInput) -> SurveyResultsGQL:
+    if settings.SURVEYS_QUERY_SHAPE_SAMPLE_RATE > 0:
+        await sync_to_async(_record_list_shape)(surveys_list_input)
+    result = await aget_or_compute(
+        key_parts,
+        lambda: _alist_surveys(paths, surveys_list_input),
+        namespace="list",
+        timeout=settings.SURVEYS_LIST_CACHE_TIMEOUT,
+    )
+    track(result.items)
+    return result
+
+
+def _request_user(info: Info):
+    ctx_user = getattr(info.context, "user", None)
+    return resolve_user(getattr(ctx_user, "identity", None) if ctx_user else None)
+
+
+# Resolvers that touch the database are wrapped with django_resolver: they run
+# inline under the WSGI view and in a worker thread under the ASGI one.
 @strawberry.type
 class Query:
     @strawberry.field()
@@ -31,127 +271,159 @@ class Query:
             surveys_list_input: SurveysListInput,
     ) -> SurveyResultsGQL:
         paths = get_root_field_paths(info, "surveys")
-        qs = Survey.objects.all()
-        if has_any_under_prefix(paths, ("items", "contentType")):
-            qs = qs.select_related("content_type")
-        # Prefetching is delegated to strawberry_django optimizer to avoid
-        # conflicting lookups when it applies its own Prefetch querysets.
-
-        filters_input: SurveyFiltersInput | None = surveys_list_input.filters
-        filters_data = {}
-        for field in dc_fields(SurveyFilters):
-            name = field.name
-            if name in {"created_at", "updated_at"}:
-                value = getattr(filters_input, name, None) if filters_input else None
-                filters_data[name] = value.to_vo() if value else None
-                continue
-            filters_data[name] = getattr(filters_input, name, None) if filters_input else None
-
-        spec = SurveySpec(
-            limit=surveys_list_input.limit,
-            offset=surveys_list_input.offset,
-            projection=SurveyProjection(),
-            filters=SurveyFilters(**filters_data),
-            sort=survey_sort_input_to_spec(surveys_list_input.sort),
+        key_parts = (_list_cache_input(surveys_list_input), selection_key(paths))
+        if in_async_context():
+            return _asurveys(key_parts, paths, surveys_list_input)
+        _record_list_shape(surveys_list_input)
+        result = get_or_compute(
+            key_parts,
+            lambda: _list_surveys(paths, surveys_list_input),
+            namespace="list",
+            timeout=settings.SURVEYS_LIST_CACHE_TIMEOUT,
         )
-        base_qs = pipeline.run(DjangoQueryContext(qs, spec)).stmt
+        track(result.items)
+        return result
 
-        total = base_qs.count()
-        items = base_qs[surveys_list_input.offset: surveys_list_input.offset + surveys_list_input.limit]
-
-        facets: List[FacetGQL] = []
-        if has_any_under_prefix(paths, ("facets",)):
-            status_values = [
-                FacetValueGQL(value=row["status__status"], count=row["count"])
-                for row in base_qs.values("status__status")
-                .annotate(count=Count("id"))
-                .order_by("status__status")
-            ]
-            facets.append(FacetGQL(name="status", values=status_values))
-
-            assessment_type_values = [
-                FacetValueGQL(value=row["assessment_type"], count=row["count"])
-                for row in base_qs.values("assessment_type")
-                .annotate(count=Count("id"))
-                .order_by("assessment_type")
-            ]
-            facets.append(FacetGQL(name="assessment_type", values=assessment_type_values))
-
-            language_values = [
-                FacetValueGQL(value=row["language"], count=row["count"])
-                for row in base_qs.values("language").annotate(count=Count("id")).order_by("language")
-            ]
-            facets.append(FacetGQL(name="language", values=language_values))
-
-        return SurveyResultsGQL(items=items, total=total, facets=facets)
+    @strawberry.field()
+    @django_resolver
+    def survey_title_suggestions(self, info: Info, prefix: str, limit: int = 10) -> List[SurveyTitleSuggestionGQL]:
+        return [
+            SurveyTitleSuggestionGQL(id=survey_id, title=title)
+            for survey_id, title in suggest_survey_titles(prefix, limit)
+        ]
 
     @strawberry.field()
-    def survey(self, info: Info, id: int) -> SurveyType | None:
-        try:
-            return Survey.objects.get(pk=id)
-        except Survey.DoesNotExist:
+    @django_resolver
+    def survey(self, info: Info, id: int, version: int | None = None) -> SurveyType | None:
+        definition = get_respondent_definition(id, version)
+        if definition is None:
             return None
+        return track([hydrate_survey(definition)])[0]
 
     @strawberry.field(permission_classes=[RequireAuth])
+    @django_resolver
     def user_assessments(self, info: Info, limit: int = 20, offset: int = 0) -> list[UserAssessmentType]:
-        ctx_user = getattr(info.context, "user", None)
-        identity = getattr(ctx_user, "identity", None) if ctx_user else None
-        subject = getattr(getattr(identity, "subject", None), "value", None)
-        preferred_username = getattr(identity, "preferred_username", None) if identity else None
-        email_val = getattr(getattr(identity, "email", None), "value", None)
-        first_name = getattr(identity, "first_name", "") if identity else ""
-        last_name = getattr(identity, "last_name", "") if identity else ""
-
-        django_user, _created = UserModel.objects.get_or_create(
-            id=subject,
-            defaults={
-                "username": preferred_username or subject,
-                "email": email_val or "",
-                "first_name": first_name or "",
-                "last_name": last_name or "",
-            },
-        )
+        django_user = _request_user(info)
+        if django_user is None:
+            raise ValueError("Authentication required to list assessments.")
 
         qs = UserAssessment.objects.filter(user=django_user).order_by("-submitted_at")
-        return list(qs[offset : offset + limit])
+        return track(qs[offset : offset + limit])
 
 
 @strawberry.type
 class Mutation:
     @strawberry.mutation(permission_classes=[RequireAuth])
+    @django_resolver
     def enroll_assessment(self, info: Info, survey_id: int, child_id: str | None = None) -> UserAssessmentType:
+        django_user = _request_user(info)
+        if django_user is None:
+            raise ValueError("Authentication required to enroll in an assessment.")
+
         try:
-            survey = Survey.objects.get(pk=survey_id)
-        except Survey.DoesNotExist:
+            user_assessment, _created = enroll_user_in_assessment(
+                request_user=django_user,
+                survey_id=survey_id,
+                child_id=child_id,
+            )
+        except Http404:
             raise ValueError(f"Survey not found: {survey_id}")
+        return user_assessment
 
-        ctx_user = getattr(info.context, "user", None)
-        identity = getattr(ctx_user, "identity", None) if ctx_user else None
-        subject = getattr(getattr(identity, "subject", None), "value", None)
-        preferred_username = getattr(identity, "preferred_username", None) if identity else None
-        email_val = getattr(getattr(identity, "email", None), "value", None)
-        first_name = getattr(identity, "first_name", "") if identity else ""
-        last_name = getattr(identity, "last_name", "") if identity else ""
+    @strawberry.mutation(permission_classes=[CanEnrollUsers])
+    @django_resolver
+    def bulk_enroll_assessment(
+            self,
+            info: Info,
+            survey_id: int,
+            enrollments: List[EnrollmentInput],
+    ) -> BulkEnrollmentResultGQL:
+        if len(enrollments) > settings.BULK_ENROLLMENT_MAX_SIZE:
+            raise ValueError(f"At most {settings.BULK_ENROLLMENT_MAX_SIZE} enrollments per request.")
 
-        if not subject:
-            raise ValueError("Authentication required to enroll in an assessment.")
+        try:
+            result = bulk_enroll_users_in_assessment(
+                survey_id,
+                [(enrollment.user_id, enrollment.child_id) for enrollment in enrollments],
+                batch_size=settings.BULK_ENROLLMENT_BATCH_SIZE,
+            )
+        except Http404:
+            raise ValueError(f"Survey not found: {survey_id}")
+        track(result.created + result.existing)
+        return BulkEnrollmentResultGQL(created=result.created, existing=result.existing)
+
+    @strawberry.mutation(permission_classes=[RequireAuth])
+    @django_resolver
+    def submit_answers(
+            self,
+            info: Info,
+            user_assessment_id: int,
+            answers: List[AnswerInput],
+    ) -> UserAssessmentType:
+        django_user = _request_user(info)
+        if django_user is None:
+            raise ValueError("Authentication required to submit answers.")
+        if len(answers) > settings.SUBMIT_ANSWERS_MAX_SIZE:
+            raise ValueError(f"At most {settings.SUBMIT_ANSWERS_MAX_SIZE} answers per request.")
 
-        django_user, _created = UserModel.objects.get_or_create(
-            id=subject,
-            defaults={
-                "username": preferred_username or subject,
-                "email": email_val or "",
-                "first_name": first_name or "",
-                "last_name": last_name or "",
-            },
+        return submit_answers(
+            django_user,
+            user_assessment_id,
+            [
+                AnswerData(
+                    question_id=answer.question_id,
+                    answer=answer.answer,
+                    selected_option_ids=tuple(answer.selected_option_ids or ()),
+                )
+                for answer in answers
+            ],
         )
 
-        user_assessment, _created = enroll_user_in_assessment(
-            request_user=django_user,
-            survey_id=survey.id,
-            child_id=child_id,
+    @strawberry.mutation(permission_classes=[RequireAuth])
+    @django_resolver
+    def submit_assessment(
+            self,
+            info: Info,
+            user_assessment_id: int,
+            answers: Optional[List[AnswerInput]] = None,
+    ) -> UserAssessmentType:
+        django_user = _request_user(info)
+        if django_user is None:
+            raise ValueError("Authentication required to submit an assessment.")
+        answers = answers or []
+        if len(answers) > settings.SUBMIT_ANSWERS_MAX_SIZE:
+            raise ValueError(f"At most {settings.SUBMIT_ANSWERS_MAX_SIZE} answers per request.")
+
+        return submit_assessment(
+            django_user,
+            user_assessment_id,
+            [
+                AnswerData(
+                    question_id=answer.question_id,
+                    answer=answer.answer,
+                    selected_option_ids=tuple(answer.selected_option_ids or ()),
+                )
+                for answer in answers
+            ],
         )
-        return user_assessment
+
+    @strawberry.mutation(permission_classes=[RequireAuth])
+    @django_resolver
+    def autosave_answer(self, info: Info, user_assessment_id: int, answer: AnswerInput) -> bool:
+        django_user = _request_user(info)
+        if django_user is None:
+            raise ValueError("Authentication required to save answers.")
+
+        autosave_answer(
+            django_user,
+            user_assessment_id,
+            AnswerData(
+                question_id=answer.question_id,
+                answer=answer.answer,
+                selected_option_ids=tuple(answer.selected_option_ids or ()),
+            ),
+        )
+        return True
 
     @strawberry.field(permission_classes=[RequireAuth])
     def me(self, info: Info) -> str:
@@ -163,6 +435,17 @@ schema = strawberry.Schema(
     query=Query,
     mutation=Mutation,
     extensions=[
+        PersistedQueriesExtension,
+        ParserCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        ValidationCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        QueryCostExtension(
+            max_cost=lambda: settings.GRAPHQL_MAX_QUERY_COST,
+            max_depth=lambda: settings.GRAPHQL_MAX_QUERY_DEPTH,
+            weights=SURVEY_FIELD_WEIGHTS,
+            list_sizes=SURVEY_LIST_SIZES,
+            paginated_fields=SURVEY_PAGINATED_FIELDS,
+        ),
         DjangoOptimizerExtension,
+        RelationLoaderExtension,
     ],
 )
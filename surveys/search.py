@@ -0,0 +1,74 @@
+import operator
+import re
+from functools import reduce
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, IntegerField, Q, QuerySet, Value, When
+from django.db.models.functions import Cast
+
+from surveys.models import SEARCH_CONFIGS, Survey, search_config_for
+
+MAX_TITLE_SUGGESTIONS = 20
+
+
+def apply_full_text_search(qs: QuerySet, q: str, language: str | None = None) -> QuerySet:
+    """
+    Match `q` against `Survey.search_vector` and annotate `search_rank`.
+    Without a language filter the query is parsed with every configured
+    text-search configuration so Arabic and English documents both match.
+    """
+    if language:
+        configs = [search_config_for(language)]
+    else:
+        configs = sorted({*SEARCH_CONFIGS.values(), "simple"})
+    query = reduce(
+        operator.or_,
+        [SearchQuery(q, search_type="websearch", config=config) for config in configs],
+    )
+    # ts_rank returns float4. Keyset cursors carry the rank through JSON as a
+    # Python float and compare it as float8, so the annotation must already
+    # be float8 for the equality half of the seek predicate to hold.
+    return qs.filter(search_vector=query).annotate(
+        search_rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+    )
+
+
+def suggest_survey_titles(prefix: str, limit: int = 10) -> list[tuple[int, str]]:
+    """
+    Return up to `limit` (id, title) pairs for a search-box prefix. On Postgres
+    titles are matched by prefix or by trigram word similarity (`<%`), both
+    served by `ix_survey_title_trgm`, so small typos still match.
+    """
+    # The prefix filter is an anchored case-insensitive regex (`~*`), which
+    # pg_trgm can answer from the index. istartswith compiles to
+    # UPPER(title) LIKE ..., which it cannot, and being OR'ed with the
+    # similarity match it would turn the whole query into a sequential scan.
+    prefix = prefix.strip()
+    limit = max(1, min(limit, MAX_TITLE_SUGGESTIONS))
+    if not prefix:
+        return []
+
+    if connection.vendor != "postgresql":
+        qs = Survey.objects.filter(title__icontains=prefix).annotate(
+            prefix_match=Case(
+                When(title__istartswith=prefix, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+        return list(qs.order_by("prefix_match", "title", "id").values_list("id", "title")[:limit])
+
+    qs = (
+        Survey.objects.filter(Q(title__iregex=f"^{re.escape(prefix)}") | Q(title__trigram_word_similar=prefix))
+        .annotate(
+            prefix_match=Case(
+                When(title__istartswith=prefix, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramWordSimilarity(prefix, "title"),
+        )
+        .order_by("prefix_match", "-similarity", "title", "id")
+    )
+    return list(qs.values_list("id", "title")[:limit])
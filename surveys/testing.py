@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from typing import Any
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from strawberry.types import ExecutionResult
+
+
+@dataclass
+class OperationQueries:
+    result: ExecutionResult
+    queries: list[dict]
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+
+def run_operation(
+    query: str,
+    variables: dict[str, Any] | None = None,
+    context_value: Any = None,
+    schema=None,
+    using: str = DEFAULT_DB_ALIAS,
+) -> OperationQueries:
+    """Execute a GraphQL operation and capture the SQL it issued."""
+    if schema is None:
+        from surveys.schema import schema
+
+    with CaptureQueriesContext(connections[using]) as captured:
+        result = schema.execute_sync(query, variable_values=variables, context_value=context_value)
+    return OperationQueries(result=result, queries=list(captured.captured_queries))
+
+
+class OperationQueryCountMixin:
+    """TestCase mixin asserting how many SQL queries a GraphQL operation runs."""
+
+    def runOperation(self, query: str, variables=None, context_value=None) -> OperationQueries:
+        run = run_operation(query, variables=variables, context_value=context_value)
+        self.assertIsNone(run.result.errors, run.result.errors)
+        return run
+
+    def assertOperationQueries(self, expected: int, query: str, variables=None, context_value=None) -> ExecutionResult:
+        run = self.runOperation(query, variables=variables, context_value=context_value)
+        if run.count != expected:
+            sql = "\n".join(f"{index}. {entry['sql']}" for index, entry in enumerate(run.queries, start=1))
+            self.fail(f"{run.count} queries executed, {expected} expected\nCaptured queries were:\n{sql}")
+        return run.result
@@ -0,0 +1,955 @@
+from unittest import mock, skipUnless
+from uuid import uuid4
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, FloatField
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from surveys import models
+from surveys.cache import catalogue_version
+from surveys.definitions import local_definitions, local_versions
+from surveys.facets import compute_facets
+from surveys.models import (
+    Action,
+    AnswerSchema,
+    AnswerSchemaOption,
+    Classification,
+    Question,
+    Recommendation,
+    Section,
+    Status,
+    Survey,
+    SurveyFacetCount,
+    SurveyQueryShape,
+)
+from surveys.pagination import KeysetKey, paginate_keyset
+from surveys.testing import OperationQueryCountMixin, OperationQueries, run_operation
+from taxonomy.models import Category
+
+SURVEYS_TREE = """
+query ($input: SurveysListInput!) {
+  surveys(surveysListInput: $input) {
+    items {
+      id
+      status
+      sections {
+        id
+        questions { id title }
+      }
+    }
+  }
+}
+"""
+
+SURVEY_TREE = """
+query ($id: Int!) {
+  survey(id: $id) {
+    id
+    title
+    sections {
+      id
+      questions { id title }
+    }
+  }
+}
+"""
+
+FULL_SURVEY_TREE = """
+query ($id: Int!) {
+  survey(id: $id) {
+    id
+    classifications { id name }
+    actions { id title }
+    recommendations { id }
+    sections {
+      id
+      questions {
+        id
+        answerSchema {
+          id
+          type
+          options {
+            id
+            text
+            classification { id name }
+            recommendations { id description }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+FULL_SURVEYS_TREE = """
+query ($input: SurveysListInput!) {
+  surveys(surveysListInput: $input) {
+    items {
+      id
+      classifications { id }
+      actions { id }
+      recommendations { id }
+      sections {
+        id
+        questions {
+          id
+          answerSchema {
+            id
+            options {
+              id
+              classification { id }
+              recommendations { id }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def create_survey(sections: int = 2, questions_per_section: int = 2) -> Survey:
+    survey = Survey.objects.create(title="Survey")
+    for _ in range(sections):
+        # Each new section already gets its first question from a signal.
+        section = Section.objects.create(survey=survey)
+        for _ in range(questions_per_section - 1):
+            Question.objects.create(survey=survey, section=section)
+    survey.update_status("published")
+    return survey
+
+
+@override_settings(SURVEYS_LIST_CACHE_TIMEOUT=0, SURVEYS_QUERY_SHAPE_SAMPLE_RATE=0)
+class RelationBatchingTests(OperationQueryCountMixin, TestCase):
+    def setUp(self):
+        caches["surveys"].clear()
+        local_definitions.clear()
+        local_versions.clear()
+
+    def test_survey_list_relations_do_not_scale_with_rows(self):
+        for _ in range(3):
+            create_survey()
+        small = self.runOperation(SURVEYS_TREE, {"input": {"limit": 100}})
+        for _ in range(47):
+            create_survey()
+        large = self.runOperation(SURVEYS_TREE, {"input": {"limit": 100}})
+
+        self.assertEqual(len(large.result.data["surveys"]["items"]), 50)
+        self.assertEqual(small.count, large.count)
+
+    def test_published_survey_is_read_from_its_snapshot(self):
+        survey = create_survey(sections=3, questions_per_section=4)
+        # published version lookup, snapshot row
+        self.assertOperationQueries(2, SURVEY_TREE, {"id": survey.pk})
+        result = self.assertOperationQueries(1, SURVEY_TREE, {"id": survey.pk})
+
+        sections = result.data["survey"]["sections"]
+        self.assertEqual([len(section["questions"]) for section in sections], [4, 4, 4])
+
+
+def create_exam(questions: int, options_per_question: int = 4) -> Survey:
+    """A one-section exam built with bulk inserts (signals skipped)."""
+    survey = Survey.objects.create(title="Exam", use_classifications=True)
+    classifications = Classification.objects.bulk_create(
+        [Classification(survey=survey, name=f"Level {index}", score=index) for index in range(3)]
+    )
+    Action.objects.bulk_create([Action(survey=survey, title="Retake"), Action(survey=survey, title="Pass")])
+    section = Section.objects.create(survey=survey)
+    Question.objects.filter(section=section).delete()
+
+    created = Question.objects.bulk_create(
+        [Question(survey=survey, section=section, order=index, type="radio") for index in range(questions)]
+    )
+    schemas = AnswerSchema.objects.bulk_create(
+        [AnswerSchema(survey=survey, section=section, question=question, type="radio", is_mcq=True) for question in created]
+    )
+    options = AnswerSchemaOption.objects.bulk_create(
+        [
+            AnswerSchemaOption(
+                survey=survey,
+                section=section,
+                question=schema.question,
+                schema=schema,
+                text=f"Option {index}",
+                score=index,
+                classification=classifications[index % len(classifications)],
+                order=index,
+            )
+            for schema in schemas
+            for index in range(options_per_question)
+        ]
+    )
+    Recommendation.objects.bulk_create(
+        [Recommendation(survey=survey, option=option, description="Review") for option in options[::2]]
+    )
+    survey.save()
+    return survey
+
+
+@override_settings(SURVEYS_LIST_CACHE_TIMEOUT=0, SURVEYS_QUERY_SHAPE_SAMPLE_RATE=0)
+class SurveyTreeQueryPlanTests(OperationQueryCountMixin, TestCase):
+    # version check, survey, sections, questions, answer schemas, options,
+    # option recommendations, classifications, actions, recommendations
+    COMPILE_QUERIES = 10
+
+    def setUp(self):
+        caches["surveys"].clear()
+        local_definitions.clear()
+        local_versions.clear()
+
+    def assertSurveyTreeQueries(self, questions: int):
+        survey = create_exam(questions)
+
+        result = self.assertOperationQueries(self.COMPILE_QUERIES, FULL_SURVEY_TREE, {"id": survey.pk})
+        self.assertOperationQueries(1, FULL_SURVEY_TREE, {"id": survey.pk})
+
+        data = result.data["survey"]
+        self.assertEqual(len(data["classifications"]), 3)
+        self.assertEqual(len(data["actions"]), 2)
+        questions_data = data["sections"][0]["questions"]
+        self.assertEqual(len(questions_data), questions)
+        options = questions_data[-1]["answerSchema"]["options"]
+        self.assertEqual(len(options), 4)
+        self.assertIsNotNone(options[0]["classification"])
+        self.assertEqual(len(options[0]["recommendations"]), 1)
+
+    def test_survey_tree_with_10_questions(self):
+        self.assertSurveyTreeQueries(10)
+
+    def test_survey_tree_with_500_questions(self):
+        self.assertSurveyTreeQueries(500)
+
+    def test_survey_list_tree_does_not_scale_with_questions(self):
+        create_exam(10)
+        small = self.runOperation(FULL_SURVEYS_TREE, {"input": {"limit": 10}})
+        Survey.objects.all().delete()
+        create_exam(500)
+        large = self.runOperation(FULL_SURVEYS_TREE, {"input": {"limit": 10}})
+
+        self.assertEqual(len(large.result.data["surveys"]["items"][0]["sections"][0]["questions"]), 500)
+        self.assertEqual(small.count, large.count)
+
+
+@override_settings(SURVEYS_LIST_CACHE_TIMEOUT=0, SURVEYS_QUERY_SHAPE_SAMPLE_RATE=0)
+class SurveyVersionTests(OperationQueryCountMixin, TestCase):
+    def setUp(self):
+        caches["surveys"].clear()
+        local_definitions.clear()
+        local_versions.clear()
+
+    def survey_titles(self, survey: Survey, version: int | None = None) -> list[str]:
+        result = self.runOperation(
+            "query ($id: Int!, $version: Int) { survey(id: $id, version: $version) { title sections { questions { title } } } }",
+            {"id": survey.pk, "version": version},
+        ).result
+        data = result.data["survey"]
+        return [data["title"]] + [question["title"] for section in data["sections"] for question in section["questions"]]
+
+    def test_edits_after_publishing_do_not_reach_respondents(self):
+        survey = create_survey(sections=1, questions_per_section=1)
+        Question.objects.filter(survey=survey).update(title="Original")
+        survey.update_status("published")
+        question = Question.objects.get(survey=survey)
+        question.title = "Edited"
+        question.save()
+
+        self.assertEqual(self.survey_titles(survey), ["Survey", "Original"])
+
+        survey.update_status("published")
+        self.assertEqual(self.survey_titles(survey), ["Survey", "Edited"])
+        self.assertEqual(self.survey_titles(survey, version=2), ["Survey", "Original"])
+        self.assertEqual(list(survey.versions.values_list("number", flat=True)), [1, 2, 3])
+
+    def test_unpublished_survey_is_read_live(self):
+        survey = create_exam(2)
+        self.assertEqual(self.survey_titles(survey), ["Exam", None, None])
+
+
+class SurveyContentVersionTests(TestCase):
+    def setUp(self):
+        self.survey = create_survey(sections=1, questions_per_section=1)
+        self.survey.refresh_from_db()
+
+    def test_saves_without_definition_changes_keep_the_version(self):
+        version = self.survey.content_version
+
+        self.survey.save()
+        self.survey.save(update_fields=["search_vector"])
+
+        self.assertEqual(self.survey.content_version, version)
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.content_version, version)
+
+    def test_definition_edit_bumps_the_version_in_the_update(self):
+        version = self.survey.content_version
+        seen = []
+
+        def receiver(sender, instance, **kwargs):
+            seen.append(instance.content_version)
+
+        post_save.connect(receiver, sender=Survey)
+        self.addCleanup(post_save.disconnect, receiver, sender=Survey)
+        self.survey.title = "Renamed"
+        with self.assertNumQueries(1):
+            self.survey.save(update_fields=["title"])
+
+        self.assertEqual(self.survey.content_version, version + 1)
+        self.assertEqual(seen, [version + 1])
+        self.assertEqual(Survey.objects.get(pk=self.survey.pk).content_version, version + 1)
+
+class SurveyTouchTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.survey = create_exam(1)
+        self.survey.refresh_from_db()
+        self.version = self.survey.content_version
+        patcher = mock.patch("surveys.models._bump_content_version", wraps=models._bump_content_version)
+        self.bump = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def bumped(self) -> list[set]:
+        return [call.args[0] for call in self.bump.call_args_list if call.args[0]]
+
+    def test_tree_edits_bump_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            section = Section.objects.create(survey=self.survey)
+            for _ in range(5):
+                Question.objects.create(survey=self.survey, section=section)
+            self.assertEqual(self.bumped(), [])
+
+        self.assertEqual(self.bumped(), [{self.survey.pk}])
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.content_version, self.version + 1)
+
+    def test_rolled_back_edits_are_not_bumped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = create_exam(1)
+        self.bump.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                Section.objects.create(survey=other)
+                raise IntegrityError
+            Section.objects.create(survey=self.survey)
+
+        self.assertEqual(self.bumped(), [{self.survey.pk}])
+
+    def test_deleting_a_survey_does_not_touch_it(self):
+        survey = create_survey(sections=2, questions_per_section=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            survey.delete()
+
+        self.assertEqual(self.bumped(), [])
+
+class StatusSignalTests(TestCase):
+    def setUp(self):
+        caches["surveys"].clear()
+        self.survey = create_survey(sections=1, questions_per_section=1)
+        self.entry = self.survey.update_status(Status.STATUS_DRAFT)
+        self.versions = (self.survey.content_version, catalogue_version())
+
+    def assertVersionsMoved(self):
+        self.survey.refresh_from_db()
+        content_version, catalogue = self.versions
+        self.assertGreater(self.survey.content_version, content_version)
+        self.assertGreater(catalogue_version(), catalogue)
+
+    def test_editing_the_status_entry_moves_the_versions(self):
+        self.entry.status = Status.STATUS_PUBLISHED
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.save()
+
+        self.assertVersionsMoved()
+        self.assertEqual(self.survey.current_status, Status.STATUS_PUBLISHED)
+
+    def test_deleting_the_status_entry_moves_the_versions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.delete()
+
+        self.assertVersionsMoved()
+        self.assertIsNone(self.survey.current_status)
+
+
+class SurveyFacetCountTests(TestCase):
+    def setUp(self):
+        self.survey = Survey.objects.create(title="Exam", assessment_type=Survey.ASSESSMENT_TYPE_EXAM, language="en")
+        Survey.objects.create(title="Form", assessment_type=Survey.ASSESSMENT_TYPE_SMART_FORM, language="ar")
+        Survey.objects.create(title="Untyped", language=None)
+
+    def assertCountsMatch(self):
+        expected = {
+            SurveyFacetCount.key_for(*row[:3]): row[3]
+            for row in Survey.objects.order_by()
+            .values_list("current_status", "assessment_type", "language")
+            .annotate(count=Count("id"))
+        }
+        stored = {
+            tuple(row[:3]): row[3]
+            for row in SurveyFacetCount.objects.exclude(count=0).values_list(*SurveyFacetCount.DIMENSIONS, "count")
+        }
+        self.assertEqual(stored, expected)
+
+    def test_create(self):
+        self.assertCountsMatch()
+
+    def test_status_changes(self):
+        self.survey.update_status(Status.STATUS_DRAFT)
+        self.assertCountsMatch()
+        self.survey.update_status(Status.STATUS_PUBLISHED)
+        self.assertCountsMatch()
+
+    def test_status_entry_edit_and_delete(self):
+        entry = self.survey.update_status(Status.STATUS_DRAFT)
+        entry.status = Status.STATUS_ARCHIVED
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()
+        self.assertCountsMatch()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.delete()
+        self.assertCountsMatch()
+
+    def test_language_and_type_changes(self):
+        self.survey.language = "ar"
+        self.survey.save()
+        self.assertCountsMatch()
+
+        self.survey.assessment_type = Survey.ASSESSMENT_TYPE_SURVEY
+        self.survey.save(update_fields=["assessment_type"])
+        self.assertCountsMatch()
+
+        # Saves that skip the facet columns leave the counts alone.
+        self.survey.title = "Renamed"
+        self.survey.save(update_fields=["title"])
+        self.assertCountsMatch()
+
+    def test_survey_delete(self):
+        self.survey.update_status(Status.STATUS_PUBLISHED)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.survey.delete()
+        self.assertCountsMatch()
+
+    def test_rebuild_reports_and_repairs_drift(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        Survey.objects.filter(pk=self.survey.pk).update(language="ar")
+
+        self.assertEqual(SurveyFacetCount.rebuild(), 2)
+        self.assertCountsMatch()
+        out = StringIO()
+        call_command("reconcile_facet_counts", stdout=out)
+        self.assertIn("Facet counts are up to date", out.getvalue())
+
+class ComputeFacetsTests(TestCase):
+    NAMES = ("status", "language", "sponsor", "is_timed")
+
+    def setUp(self):
+        Survey.objects.create(title="a", language="en", sponsor=1, is_timed=True).update_status(Status.STATUS_PUBLISHED)
+        Survey.objects.create(title="b", language="en", sponsor=None)
+        Survey.objects.create(title="c", language=None, sponsor=2)
+        Survey.objects.create(title="d", language="ar", sponsor=None).update_status(Status.STATUS_DRAFT)
+
+    def test_counts_match_the_rows_with_nulls_last(self):
+        result = compute_facets(Survey.objects.exclude(title="d"), self.NAMES)
+
+        self.assertEqual(result.total, 3)
+        self.assertEqual(
+            result.facets,
+            {
+                "status": [("published", 1), (None, 2)],
+                "language": [("en", 2), (None, 1)],
+                "sponsor": [(1, 1), (2, 1), (None, 1)],
+                "is_timed": [(False, 2), (True, 1)],
+            },
+        )
+
+    def test_empty_selection(self):
+        result = compute_facets(Survey.objects.none(), ["language"])
+        self.assertEqual((result.total, result.facets), (0, {"language": []}))
+
+        result = compute_facets(Survey.objects.all(), [])
+        self.assertEqual((result.total, result.facets), (4, {}))
+
+    @skipUnless(connection.vendor == "postgresql", "GROUPING SETS needs Postgres")
+    def test_grouping_sets_and_union_all_agree(self):
+        from surveys.facets import SURVEY_FACETS, _grouping_sets_rows, _union_rows
+
+        facets = [SURVEY_FACETS[name] for name in self.NAMES]
+        for language in (None, "en", "fr"):
+            qs = Survey.objects.filter(language=language) if language else Survey.objects.all()
+            with self.subTest(language=language), connection.cursor() as cursor:
+                self.assertCountEqual(_grouping_sets_rows(cursor, qs, facets), _union_rows(cursor, qs, facets))
+
+class FullTextSearchTests(TestCase):
+    def configs(self, language: str | None) -> list[str]:
+        from django.contrib.postgres.search import SearchQuery
+
+        from surveys.search import apply_full_text_search
+
+        with mock.patch("surveys.search.SearchQuery", wraps=SearchQuery) as search_query:
+            qs = apply_full_text_search(Survey.objects.all(), "exam", language)
+        self.assertIsInstance(qs.query.annotations["search_rank"].output_field, FloatField)
+        self.assertEqual({call.kwargs["search_type"] for call in search_query.call_args_list}, {"websearch"})
+        return [call.kwargs["config"] for call in search_query.call_args_list]
+
+    def test_language_selects_its_config(self):
+        self.assertEqual(self.configs("ar"), ["arabic"])
+        self.assertEqual(self.configs("en-GB"), ["english"])
+        self.assertEqual(self.configs("xx"), ["simple"])
+
+    def test_no_language_parses_with_every_config(self):
+        expected = sorted({*models.SEARCH_CONFIGS.values(), "simple"})
+
+        self.assertEqual(self.configs(None), expected)
+        self.assertEqual(self.configs(""), expected)
+
+    @skipUnless(connection.vendor == "postgresql", "full-text search needs Postgres")
+    def test_rank_round_trips_through_a_keyset_cursor(self):
+        from surveys.filters import FULL_TEXT_ORDERING
+        from surveys.search import apply_full_text_search
+
+        for title, description in [("Exam", ""), ("Exam exam", ""), ("Final", "exam"), ("Exam", ""), ("Other", "")]:
+            Survey.objects.create(title=title, description=description, language="en")
+        qs = apply_full_text_search(Survey.objects.all(), "exam", "en")
+        keys = [KeysetKey(token.lstrip("-"), descending=token.startswith("-")) for token in FULL_TEXT_ORDERING]
+
+        seen, cursor = [], None
+        while True:
+            page = paginate_keyset(qs, keys, 1, after=cursor)
+            seen += [survey.pk for survey in page.items]
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, list(qs.order_by(*FULL_TEXT_ORDERING).values_list("pk", flat=True)))
+        self.assertEqual(len(seen), 4)
+
+class SurveyProjectionTests(TestCase):
+    def projection(self, *paths: tuple[str, ...]):
+        from surveys.filters import SurveyProjection
+
+        return SurveyProjection.from_paths(paths)
+
+    def test_maps_camel_case_fields_to_columns(self):
+        projection = self.projection(
+            ("total",),
+            ("items",),
+            ("items", "title"),
+            ("items", "shortDescription"),
+            ("items", "categoryId"),
+            ("items", "contentType", "id"),
+            # Relation resolvers read no Survey column.
+            ("items", "sections", "id"),
+            ("items", "classifications", "id"),
+        )
+
+        self.assertEqual(projection.columns, {"title", "short_description", "category", "content_type"})
+
+    def test_resolver_fields_project_the_columns_they_read(self):
+        self.assertEqual(self.projection(("items", "status")).columns, {"current_status"})
+
+    def test_apply_defers_the_other_columns(self):
+        survey = Survey.objects.create(title="Exam", description="Long text")
+
+        loaded = self.projection(("items", "title"), ("items", "status")).apply(Survey.objects.all()).get()
+
+        self.assertEqual(loaded.pk, survey.pk)
+        deferred = loaded.get_deferred_fields()
+        self.assertNotIn("title", deferred)
+        self.assertNotIn("current_status", deferred)
+        self.assertIn("description", deferred)
+
+    def test_empty_projection_loads_every_column(self):
+        Survey.objects.create(title="Exam")
+        qs = Survey.objects.all()
+
+        self.assertIs(self.projection(("total",)).apply(qs), qs)
+        self.assertEqual(qs.get().get_deferred_fields(), set())
+
+@override_settings(SURVEYS_TOTAL_ESTIMATE_THRESHOLD=100)
+class CountTotalTests(TestCase):
+    def setUp(self):
+        for title in ("a", "b", "c"):
+            Survey.objects.create(title=title)
+        self.qs = Survey.objects.filter(title__in=["a", "b"])
+
+    def count_total(self, mode_name: str, estimate: int | None = None):
+        from surveys.inputs import SurveyTotalMode
+        from surveys.totals import count_total
+
+        with mock.patch("surveys.totals.estimate_count", return_value=estimate) as estimate_count:
+            total, mode = count_total(self.qs, SurveyTotalMode[mode_name])
+        return total, mode.name, estimate_count.call_count
+
+    def test_exact_counts_without_estimating(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.count_total("EXACT", estimate=5000), (2, "EXACT", 0))
+
+    def test_none_runs_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count_total("NONE"), (None, "NONE", 0))
+
+    def test_estimated_at_or_above_the_threshold(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count_total("ESTIMATED", estimate=5000), (5000, "ESTIMATED", 1))
+            self.assertEqual(self.count_total("ESTIMATED", estimate=100), (100, "ESTIMATED", 1))
+
+    def test_estimated_falls_back_to_exact(self):
+        # Below the threshold, or on a backend without a planner estimate.
+        for estimate in (99, None):
+            with self.subTest(estimate=estimate), self.assertNumQueries(1):
+                self.assertEqual(self.count_total("ESTIMATED", estimate=estimate), (2, "EXACT", 1))
+
+    @skipUnless(connection.vendor == "postgresql", "planner estimates need Postgres")
+    def test_estimate_count_reads_the_plan(self):
+        from surveys.totals import estimate_count
+
+        self.assertIsInstance(estimate_count(self.qs), int)
+
+@override_settings(SURVEYS_LIST_CACHE_TIMEOUT=300, SURVEYS_QUERY_SHAPE_SAMPLE_RATE=0)
+class SurveyListCacheTests(TestCase):
+    LIST = "query ($input: SurveysListInput!) { surveys(surveysListInput: $input) { items { id title status } } }"
+
+    def setUp(self):
+        caches["surveys"].clear()
+        self.category = Category.objects.create(tree_id=uuid4(), name="Science")
+        self.survey = create_survey(sections=1, questions_per_section=1)
+        self.survey.category = self.category
+        self.survey.save(update_fields=["category"])
+
+    def list_surveys(self) -> OperationQueries:
+        run = run_operation(self.LIST, {"input": {"limit": 10}})
+        self.assertIsNone(run.result.errors, run.result.errors)
+        return run
+
+    def assertInvalidatedOnCommit(self, edit) -> dict:
+        cached = self.list_surveys().result.data
+        with self.captureOnCommitCallbacks(execute=True):
+            edit()
+            before_commit = self.list_surveys()
+            self.assertEqual(before_commit.count, 0)
+            self.assertEqual(before_commit.result.data, cached)
+        after_commit = self.list_surveys()
+        self.assertGreater(after_commit.count, 0)
+        return after_commit.result.data
+
+    def test_survey_edit_invalidates_on_commit(self):
+        def rename():
+            self.survey.title = "Renamed"
+            self.survey.save(update_fields=["title"])
+
+        data = self.assertInvalidatedOnCommit(rename)
+        self.assertEqual(data["surveys"]["items"][0]["title"], "Renamed")
+
+    def test_status_edit_invalidates_on_commit(self):
+        self.survey.update_status(Status.STATUS_DRAFT)
+        entry = self.survey.status
+
+        def publish():
+            entry.status = Status.STATUS_PUBLISHED
+            entry.save()
+
+        data = self.assertInvalidatedOnCommit(publish)
+        self.assertEqual(data["surveys"]["items"][0]["status"], Status.STATUS_PUBLISHED)
+
+    def test_category_edit_invalidates_on_commit(self):
+        def rename():
+            self.category.name = "Physics"
+            self.category.save()
+
+        self.assertInvalidatedOnCommit(rename)
+
+    @override_settings(SURVEYS_QUERY_SHAPE_SAMPLE_RATE=1)
+    def test_query_shapes_are_recorded_on_cache_hits(self):
+        self.list_surveys()
+        self.list_surveys()
+
+        self.assertEqual(SurveyQueryShape.objects.get().hits, 2)
+
+@override_settings(SURVEYS_LIST_CACHE_TIMEOUT=0, SURVEYS_QUERY_SHAPE_SAMPLE_RATE=0)
+class AsyncExecutionTests(TestCase):
+    def setUp(self):
+        caches["surveys"].clear()
+        local_definitions.clear()
+        local_versions.clear()
+
+    def assertSameResult(self, query: str, variables: dict):
+        from surveys.schema import schema
+
+        expected = schema.execute_sync(query, variable_values=variables)
+        actual = async_to_sync(schema.execute)(query, variable_values=variables)
+        self.assertIsNone(actual.errors, actual.errors)
+        self.assertEqual(actual.data, expected.data)
+
+    def test_async_resolvers_match_sync(self):
+        survey = create_survey(sections=2, questions_per_section=3)
+        create_survey()
+
+        self.assertSameResult(
+            "query ($input: SurveysListInput!) { surveys(surveysListInput: $input) { total items { id sections { id questions { id } } } } }",
+            {"input": {"limit": 10}},
+        )
+        self.assertSameResult(FULL_SURVEY_TREE, {"id": survey.pk})
+
+
+@override_settings(SURVEYS_LIST_CACHE_TIMEOUT=0, SURVEYS_QUERY_SHAPE_SAMPLE_RATE=0)
+class ConcurrentListCountTests(TransactionTestCase):
+    # A TestCase transaction keeps _alist_surveys on the sequential path.
+    QUERY = "query ($input: SurveysListInput!) { surveys(surveysListInput: $input) { total items { id title } } }"
+
+    def setUp(self):
+        caches["surveys"].clear()
+        create_survey()
+        create_survey()
+
+    def execute(self):
+        from surveys import schema
+
+        with mock.patch("surveys.schema._on_own_connection", wraps=schema._on_own_connection) as own_connection:
+            expected = schema.schema.execute_sync(self.QUERY, variable_values={"input": {"limit": 1}})
+            actual = async_to_sync(schema.schema.execute)(self.QUERY, variable_values={"input": {"limit": 1}})
+        self.assertIsNone(actual.errors, actual.errors)
+        self.assertEqual(actual.data, expected.data)
+        self.assertEqual(actual.data["surveys"]["total"], 2)
+        return own_connection.call_count
+
+    @override_settings(SURVEYS_LIST_CONCURRENT_COUNTS=True)
+    def test_counts_and_page_run_on_their_own_connections(self):
+        self.assertEqual(self.execute(), 2)
+
+    def test_sequential_by_default(self):
+        self.assertEqual(self.execute(), 0)
+
+class QueryCostTests(TestCase):
+    def cost(self, query: str, variables: dict):
+        from graphql import parse
+
+        from app.query_cost import query_cost
+        from surveys.cost import SURVEY_FIELD_WEIGHTS, SURVEY_LIST_SIZES, SURVEY_PAGINATED_FIELDS
+        from surveys.schema import schema
+
+        return query_cost(
+            schema._schema,
+            parse(query),
+            None,
+            variables,
+            SURVEY_FIELD_WEIGHTS,
+            SURVEY_LIST_SIZES,
+            paginated_fields=SURVEY_PAGINATED_FIELDS,
+        )
+
+    def test_repo_operations_fit_the_default_budget(self):
+        from django.conf import settings
+
+        documents = [
+            (SURVEYS_TREE, {"input": {"limit": 100}}),
+            (SURVEY_TREE, {"id": 1}),
+            (FULL_SURVEY_TREE, {"id": 1}),
+            (FULL_SURVEYS_TREE, {"input": {"limit": 10}}),
+        ]
+        for query, variables in documents:
+            with self.subTest(query=query.split("{")[1].strip(), variables=variables):
+                cost = self.cost(query, variables)
+                self.assertLessEqual(cost.cost, settings.GRAPHQL_MAX_QUERY_COST)
+                self.assertLessEqual(cost.depth, settings.GRAPHQL_MAX_QUERY_DEPTH)
+
+    def test_only_items_scale_with_limit(self):
+        facets = "query ($input: SurveysListInput!) { surveys(surveysListInput: $input) { facets { name values { value } } } }"
+        self.assertEqual(self.cost(facets, {"input": {"limit": 1}}), self.cost(facets, {"input": {"limit": 100}}))
+        self.assertGreater(
+            self.cost(SURVEYS_TREE, {"input": {"limit": 100}}).cost,
+            self.cost(SURVEYS_TREE, {"input": {"limit": 1}}).cost,
+        )
+
+    @override_settings(GRAPHQL_MAX_QUERY_COST=10)
+    def test_budget_is_read_per_request(self):
+        result = run_operation(FULL_SURVEY_TREE, {"id": 1}).result
+
+        self.assertIsNone(result.data)
+        self.assertEqual(result.errors[0].extensions["code"], "QUERY_TOO_COSTLY")
+
+
+class BulkEnrollmentPermissionTests(TestCase):
+    MUTATION = """
+    mutation ($surveyId: Int!) {
+      bulkEnrollAssessment(surveyId: $surveyId, enrollments: [{userId: "student-1"}]) { created { id } }
+    }
+    """
+
+    def context(self, **claims):
+        from django.test import RequestFactory
+
+        from app.auth import AuthContext, AuthenticatedUser
+        from app.tokens import Identity
+
+        identity = Identity.from_claims({"sub": "caller-1", **claims})
+        return AuthContext(request=RequestFactory().post("/graphql"), response=None, user=AuthenticatedUser(identity))
+
+    def test_respondents_cannot_enroll_users(self):
+        from django.contrib.auth import get_user_model
+
+        survey = Survey.objects.create(title="Exam")
+
+        result = run_operation(self.MUTATION, {"surveyId": survey.pk}, context_value=self.context()).result
+
+        self.assertEqual(result.errors[0].message, "Permission denied")
+        self.assertFalse(get_user_model().objects.filter(pk="student-1").exists())
+
+    def test_enrollment_role_is_allowed(self):
+        from django.conf import settings
+
+        survey = Survey.objects.create(title="Exam")
+        context = self.context(resource_access={settings.KEYCLOAK_CLIENT_ID: {"roles": ["assessments:enroll"]}})
+
+        result = run_operation(self.MUTATION, {"surveyId": survey.pk}, context_value=context).result
+
+        self.assertIsNone(result.errors, result.errors)
+        self.assertEqual(len(result.data["bulkEnrollAssessment"]["created"]), 1)
+
+
+class IndexAdvisorTests(TestCase):
+    def test_samples_keep_only_low_cardinality_values(self):
+        from surveys.advisor import query_shape
+
+        shape, sample = query_shape(
+            {"title": "Jane's exam", "object_id": 42, "status": "published", "is_timed": True, "language": None},
+            None,
+        )
+
+        self.assertEqual(shape.equality, ("is_timed", "object_id", "status", "title"))
+        self.assertEqual(sample, {"is_timed": True, "object_id": "?", "status": "published", "title": "?"})
+
+    def test_propose_index_puts_equality_before_range_and_sort(self):
+        from surveys.advisor import QueryShape, propose_index
+
+        sort = ("-created_at", "-id")
+        index = propose_index(QueryShape(("language", "status"), ("created_at",), sort, False), {})
+        self.assertEqual(index.fields, ["language", "current_status", "-created_at", "-id"])
+        self.assertIsNone(index.condition)
+
+        # A range on a column the sort does not lead with replaces the sort keys.
+        index = propose_index(QueryShape(("language",), ("updated_at",), sort, False), {})
+        self.assertEqual(index.fields, ["language", "updated_at"])
+
+    def test_propose_index_turns_boolean_filters_into_a_condition(self):
+        from django.db.models import Q
+
+        from surveys.advisor import QueryShape, propose_index
+
+        shape = QueryShape(("is_timed", "title"), (), ("-created_at", "-id"), False)
+        index = propose_index(shape, {"is_timed": True, "title": "?"})
+
+        self.assertEqual(index.fields, ["title", "-created_at", "-id"])
+        self.assertEqual(index.condition, Q(is_timed=True))
+        self.assertEqual(index.name, propose_index(shape, {"is_timed": True, "title": "?"}).name)
+
+    def test_is_covered_by_a_btree_index_prefix(self):
+        from django.db.models import Index
+
+        from surveys.advisor import is_covered
+
+        self.assertTrue(is_covered(Index(fields=["current_status", "-created_at"], name="ix_a")))
+        self.assertFalse(is_covered(Index(fields=["-created_at", "current_status"], name="ix_b")))
+        # ix_survey_title_trgm is a GIN index.
+        self.assertFalse(is_covered(Index(fields=["title"], name="ix_c")))
+
+    def test_emit_migration_writes_the_accepted_indexes(self):
+        import os
+        import tempfile
+        from io import StringIO
+
+        from django.core.management import CommandError, call_command
+        from django.db.migrations.writer import MigrationWriter
+
+        SurveyQueryShape.objects.create(signature="a", equality=["language"], sort=["-created_at", "-id"], hits=5)
+        SurveyQueryShape.objects.create(signature="b", equality=["title"], sample={"title": "?"}, hits=3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "migration.py")
+            with mock.patch.object(MigrationWriter, "path", new_callable=mock.PropertyMock, return_value=path):
+                out = StringIO()
+                call_command("advise_survey_indexes", "--emit-migration", stdout=out)
+                names = [line.split()[0] for line in out.getvalue().splitlines() if line.startswith("ix_survey_adv_")]
+                self.assertEqual(len(names), 2)
+
+                call_command("advise_survey_indexes", "--emit-migration", "--accept", names[0], stdout=StringIO())
+                with open(path, encoding="utf-8") as fh:
+                    migration = fh.read()
+
+            self.assertIn("migrations.AddIndex(", migration)
+            self.assertIn(names[0], migration)
+            self.assertNotIn(names[1], migration)
+            self.assertIn("('surveys', '0009_scrub_query_shape_samples')", migration)
+            with self.assertRaises(CommandError):
+                call_command("advise_survey_indexes", "--emit-migration", "--accept", "ix_unknown", stdout=StringIO())
+
+
+class KeysetPaginationTests(TestCase):
+    ASCENDING = [KeysetKey("title"), KeysetKey("id")]
+    DESCENDING = [KeysetKey("title", descending=True), KeysetKey("id", descending=True)]
+
+    def setUp(self):
+        for title in ["b", None, "a", "b", None, "b"]:
+            Survey.objects.create(title=title)
+
+    def expected(self, descending: bool) -> list[int]:
+        # NULLs sort last ascending and first descending; ids break ties.
+        rows = Survey.objects.values_list("title", "id")
+        ordered = sorted(rows, key=lambda row: (row[0] is None, row[0] or "", row[1]))
+        if descending:
+            ordered.reverse()
+        return [survey_id for _, survey_id in ordered]
+
+    def walk(self, keys: list[KeysetKey], limit: int) -> tuple[list[int], list[int]]:
+        forward, cursor = [], None
+        while True:
+            page = paginate_keyset(Survey.objects.all(), keys, limit, after=cursor)
+            forward += [survey.pk for survey in page.items]
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        backward, cursor = [survey.pk for survey in page.items], page.previous_cursor
+        while cursor is not None:
+            page = paginate_keyset(Survey.objects.all(), keys, limit, before=cursor)
+            backward = [survey.pk for survey in page.items] + backward
+            cursor = page.previous_cursor
+        return forward, backward
+
+    def test_pages_across_nulls_in_both_directions(self):
+        for keys, descending in [(self.ASCENDING, False), (self.DESCENDING, True)]:
+            for limit in (1, 2, 4):
+                with self.subTest(descending=descending, limit=limit):
+                    forward, backward = self.walk(keys, limit)
+                    self.assertEqual(forward, self.expected(descending))
+                    self.assertEqual(backward, self.expected(descending))
+
+    def test_ties_are_broken_by_id(self):
+        Survey.objects.exclude(title="b").delete()
+
+        forward, backward = self.walk(self.ASCENDING, 1)
+
+        ids = sorted(Survey.objects.values_list("id", flat=True))
+        self.assertEqual(forward, ids)
+        self.assertEqual(backward, ids)
+
+    def test_cursor_for_another_sort_is_rejected(self):
+        cursor = paginate_keyset(Survey.objects.all(), self.ASCENDING, 2).next_cursor
+
+        with self.assertRaisesMessage(ValueError, "does not match the requested sort"):
+            paginate_keyset(Survey.objects.all(), self.DESCENDING, 2, after=cursor)
+        with self.assertRaisesMessage(ValueError, "Invalid pagination cursor"):
+            paginate_keyset(Survey.objects.all(), self.ASCENDING, 2, after="not-a-cursor")
+
+    def test_empty_cursors_mean_the_first_page(self):
+        first = paginate_keyset(Survey.objects.all(), self.ASCENDING, 2)
+
+        for cursors in ({"before": ""}, {"after": ""}, {"after": "", "before": ""}):
+            with self.subTest(**cursors):
+                page = paginate_keyset(Survey.objects.all(), self.ASCENDING, 2, **cursors)
+                self.assertEqual(page, first)
+                self.assertIsNone(page.previous_cursor)
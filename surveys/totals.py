@@ -0,0 +1,30 @@
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import QuerySet
+
+from surveys.inputs import SurveyTotalMode
+
+
+def estimate_count(qs: QuerySet) -> int | None:
+    """Planner row estimate for `qs` on Postgres; None on other backends."""
+    if connections[qs.db].vendor != "postgresql":
+        return None
+    plan = json.loads(qs.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_total(qs: QuerySet, mode: SurveyTotalMode) -> tuple[int | None, SurveyTotalMode]:
+    """
+    Return the total for `qs` and the mode that actually produced it.
+    ESTIMATED falls back to an exact count below
+    `SURVEYS_TOTAL_ESTIMATE_THRESHOLD` or when no estimate is available.
+    """
+    if mode == SurveyTotalMode.NONE:
+        return None, SurveyTotalMode.NONE
+    if mode == SurveyTotalMode.ESTIMATED:
+        estimate = estimate_count(qs)
+        if estimate is not None and estimate >= settings.SURVEYS_TOTAL_ESTIMATE_THRESHOLD:
+            return estimate, SurveyTotalMode.ESTIMATED
+    return qs.count(), SurveyTotalMode.EXACT
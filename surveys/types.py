@@ -1,13 +1,28 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
 import strawberry
 import strawberry_django
 from strawberry import auto
+from strawberry_django.resolvers import django_resolver
 
 
-from .models import Question, Section, Survey
+from .definitions import hydrate_survey
+from .inputs import SurveyTotalMode
+from .loaders import load_related, track
+from .models import (
+    Action,
+    AnswerSchema,
+    AnswerSchemaOption,
+    Classification,
+    Question,
+    Recommendation,
+    Section,
+    Survey,
+    SurveyVersion,
+)
+from .versions import get_version_definition
 from user_surveys.models import UserAssessment
 
 
@@ -40,11 +55,26 @@ class SurveyType:
     price: auto
     created_at: auto
     updated_at: auto
-    sections: List["SectionType"]
 
     @strawberry.field
     def status(self) -> str | None:
-        return self.status.status if self.status_id else None
+        return self.current_status
+
+    @strawberry.field
+    def sections(self) -> List["SectionType"]:
+        return load_related(self, "sections")
+
+    @strawberry.field
+    def classifications(self) -> List["ClassificationType"]:
+        return load_related(self, "classifications", Classification.objects.filter(deleted_at__isnull=True))
+
+    @strawberry.field
+    def actions(self) -> List["ActionType"]:
+        return load_related(self, "actions")
+
+    @strawberry.field
+    def recommendations(self) -> List["RecommendationType"]:
+        return load_related(self, "recommendations", Recommendation.objects.filter(deleted_at__isnull=True))
 
 
 @strawberry_django.type(Section)
@@ -58,7 +88,10 @@ class SectionType:
     cover_asset_id: auto
     created_at: auto
     updated_at: auto
-    questions: List["QuestionType"]
+
+    @strawberry.field
+    def questions(self) -> List["QuestionType"]:
+        return load_related(self, "questions")
 
 
 @strawberry_django.type(Question)
@@ -82,10 +115,87 @@ class QuestionType:
             return None
         return str(value)
 
+    @strawberry.field
+    def answer_schema(self) -> Optional["AnswerSchemaType"]:
+        return load_related(self, "answer_schema")
+
+
+@strawberry_django.type(AnswerSchema)
+class AnswerSchemaType:
+    id: auto
+    survey_id: auto
+    section_id: auto
+    question_id: auto
+    type: auto
+    with_file: auto
+    is_mcq: auto
+    is_grid: auto
+
+    @strawberry.field
+    def options(self) -> List["AnswerSchemaOptionType"]:
+        return load_related(self, "options")
+
+
+@strawberry_django.type(AnswerSchemaOption)
+class AnswerSchemaOptionType:
+    id: auto
+    survey_id: auto
+    section_id: auto
+    question_id: auto
+    schema_id: auto
+    text: auto
+    score: auto
+    classification_id: auto
+    image_asset_id: auto
+    is_row: auto
+    is_column: auto
+    ending_option: auto
+    order: auto
+
+    @strawberry.field
+    def classification(self) -> Optional["ClassificationType"]:
+        return load_related(self, "classification")
+
+    @strawberry.field
+    def recommendations(self) -> List["RecommendationType"]:
+        return load_related(
+            self, "option_recommendations", Recommendation.objects.filter(deleted_at__isnull=True)
+        )
+
+
+@strawberry_django.type(Classification)
+class ClassificationType:
+    id: auto
+    name: auto
+    score: auto
+    survey_id: auto
+    created_at: auto
+    updated_at: auto
+
+
+@strawberry_django.type(Action)
+class ActionType:
+    id: auto
+    title: auto
+    description: auto
+    survey_id: auto
+    upper_limit: auto
+    lower_limit: auto
+
+
+@strawberry_django.type(Recommendation)
+class RecommendationType:
+    id: auto
+    description: auto
+    survey_id: auto
+    option_id: auto
+    created_at: auto
+    updated_at: auto
+
 
 @strawberry.type
 class FacetValueGQL:
-    value: str
+    value: Optional[str]
     count: int
 
 
@@ -98,8 +208,31 @@ class FacetGQL:
 @strawberry.type
 class SurveyResultsGQL:
     items: List[SurveyType]
-    total: int
+    total: Optional[int]
     facets: List[FacetGQL]
+    total_mode: SurveyTotalMode = SurveyTotalMode.EXACT
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+
+@strawberry.type
+class SurveyTitleSuggestionGQL:
+    id: int
+    title: str
+
+
+@strawberry_django.type(SurveyVersion)
+class SurveyVersionType:
+    id: auto
+    survey_id: auto
+    number: auto
+    published_at: auto
+
+    @strawberry.field
+    @django_resolver
+    def survey(self) -> Optional[SurveyType]:
+        definition = get_version_definition(self.pk)
+        return track([hydrate_survey(definition)])[0] if definition is not None else None
 
 
 @strawberry_django.type(UserAssessment)
@@ -107,6 +240,7 @@ class UserAssessmentType:
     id: auto
     is_paid: auto
     survey_id: auto
+    survey_version_id: auto
     user_id: auto
     child_id: auto
     count_of_ending_options: auto
@@ -116,3 +250,21 @@ class UserAssessmentType:
     progress: auto
     last_question_id: auto
     action_id: auto
+
+    @strawberry.field
+    def survey(self) -> Optional[SurveyType]:
+        return load_related(self, "survey")
+
+    @strawberry.field
+    def survey_version(self) -> Optional[SurveyVersionType]:
+        return load_related(self, "survey_version", SurveyVersion.objects.defer("definition"))
+
+    @strawberry.field
+    def last_question(self) -> Optional[QuestionType]:
+        return load_related(self, "last_question")
+
+
+@strawberry.type
+class BulkEnrollmentResultGQL:
+    created: List[UserAssessmentType]
+    existing: List[UserAssessmentType]
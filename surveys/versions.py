@@ -0,0 +1,97 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Max
+
+from surveys.cache import survey_cache
+from surveys.definitions import (
+    DEFINITION_FORMAT,
+    SurveyDefinition,
+    compile_survey_definition,
+    definition_from_document,
+    definition_to_document,
+    definition_version,
+    draft_survey_definition,
+    local_versions,
+)
+from surveys.models import Survey, SurveyVersion
+
+logger = logging.getLogger(__name__)
+
+def _version_tag(version_id: int) -> str:
+    return f"v{version_id}"
+
+
+def _shared_key(version_id: int) -> str:
+    return f"surveys:version:{DEFINITION_FORMAT}:{version_id}"
+
+
+def publish_survey_version(survey: Survey, user=None) -> SurveyVersion:
+    """Freeze the current tree of `survey` as its next `SurveyVersion`."""
+    with transaction.atomic():
+        # Serialises concurrent publishes of the same survey.
+        Survey.objects.select_for_update().filter(pk=survey.pk).values_list("pk").first()
+        definition = compile_survey_definition(survey.pk)
+        if definition is None:
+            raise ValueError(f"Survey not found: {survey.pk}")
+        number = (survey.versions.aggregate(number=Max("number"))["number"] or 0) + 1
+        return SurveyVersion.objects.create(
+            survey=survey,
+            number=number,
+            content_version=int(definition.version),
+            definition=definition_to_document(definition),
+            published_by=user,
+        )
+
+
+def get_version_definition(version_id: int) -> SurveyDefinition | None:
+    """Definition frozen in `SurveyVersion` `version_id`: process LRU, shared cache, then the row."""
+    tag = _version_tag(version_id)
+    definition = local_versions.get(version_id, tag)
+    if definition is not None:
+        return definition
+
+    cache = survey_cache()
+    try:
+        definition = cache.get(_shared_key(version_id))
+    except Exception:
+        logger.exception("Survey version cache read failed")
+        definition = None
+
+    if definition is None:
+        documents = SurveyVersion.objects.filter(pk=version_id).values_list("definition", flat=True)
+        if not documents:
+            return None
+        definition = definition_from_document(documents[0], version=tag)
+        try:
+            cache.set(_shared_key(version_id), definition, timeout=None)
+        except Exception:
+            logger.exception("Survey version cache write failed")
+
+    local_versions.put(definition, key=version_id)
+    return definition
+
+
+def get_respondent_definition(survey_id: int, number: int | None = None) -> SurveyDefinition | None:
+    """
+    What respondents see of `survey_id`: version `number` if given, else the
+    published snapshot, else (never published) the live draft.
+    """
+    if number is not None:
+        version_id = (
+            SurveyVersion.objects.filter(survey_id=survey_id, number=number).values_list("pk", flat=True).first()
+        )
+        return get_version_definition(version_id) if version_id is not None else None
+
+    row = (
+        Survey.objects.filter(pk=survey_id)
+        .order_by()
+        .values_list("published_version_id", "content_version")
+        .first()
+    )
+    if row is None:
+        return None
+    published_version_id, content_version = row
+    if published_version_id is not None:
+        return get_version_definition(published_version_id)
+    return draft_survey_definition(survey_id, definition_version(content_version))
@@ -0,0 +1,245 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils.timezone import now
+
+from surveys.models import AnswerSchemaOption, Question
+from surveys.versions import get_version_definition
+from .models import UserAnswer, UserAssessment
+from .scoring import evaluate_assessment, get_scoring_table
+
+SINGLE_CHOICE_TYPES = (Question.QUESTION_TYPE_RADIO_MCQ, Question.QUESTION_TYPE_DROPDOWN_MCQ)
+
+
+@dataclass(frozen=True)
+class AnswerData:
+    question_id: int
+    answer: str | None = None
+    selected_option_ids: tuple[int, ...] = field(default_factory=tuple)
+
+
+@dataclass(frozen=True)
+class _QuestionRow:
+    pk: int
+    title: str | None
+    type: str | None
+    order: int | None
+    section_order: int | None
+
+    @property
+    def key(self) -> tuple[int, int, int]:
+        return self.section_order or 0, self.order or 0, self.pk
+
+
+@dataclass(frozen=True)
+class _AnswerScope:
+    """What a page of answers is checked against: the pinned version, else the live survey."""
+
+    questions: dict[int, _QuestionRow]
+    option_questions: dict[int, int]
+    # Questions progress is counted over.
+    progress_filter: Q
+    # Snapshot questions and options since deleted from the live tree; there
+    # is no row left to attach answers or selections to.
+    missing_questions: frozenset[int] = frozenset()
+    missing_options: frozenset[int] = frozenset()
+
+
+def _live_scope(user_assessment: UserAssessment, question_ids, option_ids) -> _AnswerScope:
+    questions = {
+        question.pk: _QuestionRow(
+            question.pk,
+            question.title,
+            question.type,
+            question.order,
+            question.section.order if question.section_id else None,
+        )
+        for question in Question.objects.filter(pk__in=question_ids, survey_id=user_assessment.survey_id)
+        .select_related("section")
+        .only("id", "title", "type", "order", "section__order")
+    }
+    option_questions = dict(
+        AnswerSchemaOption.objects.filter(pk__in=option_ids, question_id__in=question_ids).values_list("id", "question_id")
+    )
+    return _AnswerScope(questions, option_questions, Q(survey_id=user_assessment.survey_id))
+
+
+def _version_scope(definition, question_ids, option_ids) -> _AnswerScope:
+    wanted = set(question_ids)
+    snapshot_ids, questions, option_questions = [], {}, {}
+    for section in definition.sections:
+        for question in section["questions"]:
+            fields = question["fields"]
+            snapshot_ids.append(fields["id"])
+            if fields["id"] not in wanted:
+                continue
+            questions[fields["id"]] = _QuestionRow(
+                fields["id"], fields["title"], fields["type"], fields["order"], section["fields"]["order"]
+            )
+            schema = question["answer_schema"]
+            for option in schema["options"] if schema is not None else ():
+                option_questions[option["fields"]["id"]] = fields["id"]
+
+    live_questions = set(Question.objects.filter(pk__in=questions).values_list("pk", flat=True))
+    wanted_options = set(option_ids) & set(option_questions)
+    live_options = set(AnswerSchemaOption.objects.filter(pk__in=wanted_options).values_list("pk", flat=True))
+    return _AnswerScope(
+        questions,
+        option_questions,
+        Q(pk__in=snapshot_ids),
+        missing_questions=frozenset(set(questions) - live_questions),
+        missing_options=frozenset(wanted_options - live_options),
+    )
+
+
+def _answer_scope(user_assessment: UserAssessment, question_ids, option_ids) -> _AnswerScope:
+    if user_assessment.survey_version_id is not None:
+        definition = get_version_definition(user_assessment.survey_version_id)
+        if definition is not None:
+            return _version_scope(definition, question_ids, option_ids)
+    return _live_scope(user_assessment, question_ids, option_ids)
+
+
+def write_answers(user_assessment: UserAssessment, answers: Iterable[AnswerData]) -> list[UserAnswer]:
+    """
+    Upsert one page of answers: they are checked against the survey version
+    the assessment is pinned to (the live survey if unpinned), written with
+    bulk statements, and progress/last_question updated once. Later answers
+    to the same question replace earlier ones. Runs in the caller's
+    transaction.
+    """
+    answers = list({answer.question_id: answer for answer in answers}.values())
+    if not answers:
+        return []
+
+    question_ids = [answer.question_id for answer in answers]
+    option_ids = {option_id for answer in answers for option_id in answer.selected_option_ids}
+    scope = _answer_scope(user_assessment, question_ids, option_ids)
+    questions = scope.questions
+    unknown = sorted(set(question_ids) - set(questions))
+    if unknown:
+        raise ValueError(f"Questions not in this assessment: {unknown}")
+
+    for answer in answers:
+        invalid = [
+            option_id for option_id in answer.selected_option_ids
+            if scope.option_questions.get(option_id) != answer.question_id
+        ]
+        if invalid:
+            raise ValueError(f"Options {invalid} do not belong to question {answer.question_id}.")
+        if questions[answer.question_id].type in SINGLE_CHOICE_TYPES and len(set(answer.selected_option_ids)) > 1:
+            raise ValueError(f"Question {answer.question_id} accepts a single option.")
+
+    answers = [answer for answer in answers if answer.question_id not in scope.missing_questions]
+    if not answers:
+        return []
+    question_ids = [answer.question_id for answer in answers]
+
+    existing = {
+        row.question_id: row
+        for row in UserAnswer.objects.filter(user_assessment=user_assessment, question_id__in=question_ids)
+    }
+    rows, new_rows = [], []
+    for answer in answers:
+        question = questions[answer.question_id]
+        row = existing.get(question.pk)
+        if row is None:
+            row = UserAnswer(
+                survey_id=user_assessment.survey_id,
+                user_id=user_assessment.user_id,
+                user_assessment=user_assessment,
+                question_id=question.pk,
+            )
+            new_rows.append(row)
+        row.question_title = question.title
+        row.answer = answer.answer
+        row.type = question.type or Question.QUESTION_TYPE_RADIO_MCQ
+        row.order = question.order
+        rows.append(row)
+
+    updated = [row for row in rows if row.pk is not None]
+    if updated:
+        UserAnswer.objects.bulk_update(updated, ["question_title", "answer", "type", "order"])
+    UserAnswer.objects.bulk_create(new_rows)
+
+    Selected = UserAnswer.selected_options.through
+    if updated:
+        Selected.objects.filter(useranswer_id__in=[row.pk for row in updated]).delete()
+    Selected.objects.bulk_create(
+        [
+            Selected(useranswer_id=row.pk, answerschemaoption_id=option_id)
+            for row, answer in zip(rows, answers)
+            for option_id in dict.fromkeys(answer.selected_option_ids)
+            if option_id not in scope.missing_options
+        ]
+    )
+
+    counts = Question.objects.filter(scope.progress_filter).aggregate(
+        total=Count("id"),
+        answered=Count(
+            "id",
+            filter=Q(Exists(UserAnswer.objects.filter(user_assessment=user_assessment, question=OuterRef("pk")))),
+        ),
+    )
+    user_assessment.progress = round(100 * counts["answered"] / counts["total"]) if counts["total"] else 0
+    user_assessment.last_question_id = max((questions[pk] for pk in question_ids), key=lambda row: row.key).pk
+    user_assessment.save(update_fields=["progress", "last_question"])
+    return rows
+
+
+@contextmanager
+def _open_assessment(request_user, user_assessment_id):
+    # Locks the user's open assessment and writes its autosaved answers first,
+    # so whatever the caller writes next wins.
+    from .autosave import claim_for_submit, get_autosave_buffer, write_claim
+
+    buffer = get_autosave_buffer()
+    claim = claim_for_submit(user_assessment_id, buffer)
+    try:
+        with transaction.atomic():
+            user_assessment = (
+                UserAssessment.objects.select_for_update()
+                .filter(pk=user_assessment_id, user=request_user)
+                .first()
+            )
+            if user_assessment is None:
+                raise ValueError(f"Assessment not found: {user_assessment_id}")
+            if user_assessment.submitted_at is not None:
+                raise ValueError("This assessment has already been submitted.")
+            if claim is not None:
+                write_claim(user_assessment, claim)
+            yield user_assessment
+    except BaseException:
+        if claim is not None:
+            buffer.release(claim)
+        raise
+    if claim is not None:
+        buffer.ack(claim)
+
+
+def submit_answers(request_user, user_assessment_id, answers: Iterable[AnswerData]) -> UserAssessment:
+    """
+    Write a page of answers to the user's open assessment (see
+    write_answers), after any autosaved answers so the page wins.
+    """
+    with _open_assessment(request_user, user_assessment_id) as user_assessment:
+        write_answers(user_assessment, answers)
+    return user_assessment
+
+
+def submit_assessment(request_user, user_assessment_id, answers: Iterable[AnswerData] = ()) -> UserAssessment:
+    """
+    Write the final page of answers, close the assessment and, for
+    automatically evaluated surveys, score it (see scoring.evaluate_assessment).
+    """
+    with _open_assessment(request_user, user_assessment_id) as user_assessment:
+        write_answers(user_assessment, answers)
+        user_assessment.submitted_at = now()
+        user_assessment.save(update_fields=["submitted_at"])
+        table = get_scoring_table(user_assessment)
+        if table is not None and table.automatic:
+            evaluate_assessment(user_assessment, table)
+    return user_assessment
@@ -0,0 +1,448 @@
+import abc
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from app.metrics import registry
+from surveys.cache import survey_cache
+from .answers import AnswerData, submit_answers, write_answers
+from .models import UserAssessment
+
+logger = logging.getLogger(__name__)
+
+autosave_flushes = registry.counter("autosave_flushes_total", "Assessments whose buffered answers were written")
+autosave_flushed_answers = registry.counter("autosave_flushed_answers_total", "Buffered answers written to UserAnswer")
+autosave_flush_failures = registry.counter("autosave_flush_failures_total", "Flushes rolled back and left for retry")
+autosave_dropped_answers = registry.counter("autosave_dropped_answers_total", "Buffered answers discarded as invalid")
+
+OWNER_KEY = "user_surveys:autosave-owner:{}"
+OWNER_TIMEOUT = 3600
+
+
+@dataclass(frozen=True)
+class Claim:
+    """Answers taken from the buffer for one flush, held under a lease until acked or released."""
+
+    assessment_id: int
+    token: str
+    answers: dict[int, AnswerData]
+
+
+def _dump(answer: AnswerData) -> str:
+    return json.dumps({"answer": answer.answer, "options": list(answer.selected_option_ids)})
+
+
+def _load(question_id, payload) -> AnswerData:
+    data = json.loads(payload)
+    return AnswerData(question_id=int(question_id), answer=data["answer"], selected_option_ids=tuple(data["options"]))
+
+
+class AutosaveBuffer(abc.ABC):
+    """
+    Latest unsaved answer per (assessment, question). A flush claims an
+    assessment's answers under a lease: they move aside to a pending set,
+    which is only deleted once the database write has committed (`ack`). A
+    failed or interrupted flush leaves them pending for the next one, and
+    answers buffered meanwhile are merged over them when it claims.
+    """
+
+    @abc.abstractmethod
+    def put(self, assessment_id: int, answer: AnswerData) -> None:
+        ...
+
+    @abc.abstractmethod
+    def claim(self, assessment_id: int) -> Claim | None:
+        """Pending and buffered answers with a lease, or None if another flush holds it."""
+
+    @abc.abstractmethod
+    def ack(self, claim: Claim) -> None:
+        ...
+
+    @abc.abstractmethod
+    def release(self, claim: Claim) -> None:
+        ...
+
+    @abc.abstractmethod
+    def is_leased(self, assessment_id: int) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def due(self, dirty_before: float) -> list[int]:
+        """Assessments buffered since before `dirty_before`, or with pending answers."""
+
+    @abc.abstractmethod
+    def depth(self) -> int:
+        """Assessments with answers not yet in the database."""
+
+
+class LocalAutosaveBuffer(AutosaveBuffer):
+    """
+    Per-process buffer; flushed by the process itself, so lost if it is
+    killed. Only safe with a single worker: a submit handled by another
+    worker would not see (and could later be overwritten by) its answers.
+    """
+
+    def __init__(self, lease: float):
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._live: dict[int, dict[int, AnswerData]] = {}
+        self._dirty_since: dict[int, float] = {}
+        self._pending: dict[int, dict[int, AnswerData]] = {}
+        self._leases: dict[int, tuple[str, float]] = {}
+
+    def put(self, assessment_id, answer):
+        with self._lock:
+            self._live.setdefault(assessment_id, {})[answer.question_id] = answer
+            self._dirty_since.setdefault(assessment_id, time.time())
+
+    def claim(self, assessment_id):
+        with self._lock:
+            lease = self._leases.get(assessment_id)
+            if lease is not None and lease[1] > time.monotonic():
+                return None
+            pending = self._pending.setdefault(assessment_id, {})
+            pending.update(self._live.pop(assessment_id, {}))
+            self._dirty_since.pop(assessment_id, None)
+            if not pending:
+                del self._pending[assessment_id]
+                return None
+            token = uuid.uuid4().hex
+            self._leases[assessment_id] = (token, time.monotonic() + self.lease)
+            return Claim(assessment_id, token, dict(pending))
+
+    def _holds(self, claim: Claim) -> bool:
+        lease = self._leases.get(claim.assessment_id)
+        return lease is not None and lease[0] == claim.token
+
+    def ack(self, claim):
+        with self._lock:
+            if self._holds(claim):
+                del self._leases[claim.assessment_id]
+                self._pending.pop(claim.assessment_id, None)
+
+    def release(self, claim):
+        with self._lock:
+            if self._holds(claim):
+                del self._leases[claim.assessment_id]
+
+    def is_leased(self, assessment_id):
+        with self._lock:
+            lease = self._leases.get(assessment_id)
+            return lease is not None and lease[1] > time.monotonic()
+
+    def due(self, dirty_before):
+        with self._lock:
+            dirty = [assessment_id for assessment_id, since in self._dirty_since.items() if since <= dirty_before]
+            return list(dict.fromkeys(dirty + list(self._pending)))
+
+    def depth(self):
+        with self._lock:
+            return len(set(self._live) | set(self._pending))
+
+
+# KEYS: live hash, pending hash, lease, dirty zset, pending set; ARGV: id, token, lease ms.
+# The claim counter in the pending hash lets `ack` tell whether a later claim
+# (after this lease expired) has merged newer answers in.
+_CLAIM = """
+if redis.call('SET', KEYS[3], ARGV[2], 'NX', 'PX', ARGV[3]) == false then
+  return false
+end
+local live = redis.call('HGETALL', KEYS[1])
+for i = 1, #live, 2 do
+  redis.call('HSET', KEYS[2], live[i], live[i + 1])
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[4], ARGV[1])
+if redis.call('HLEN', KEYS[2]) == 0 then
+  redis.call('DEL', KEYS[3])
+  redis.call('SREM', KEYS[5], ARGV[1])
+  return false
+end
+redis.call('SADD', KEYS[5], ARGV[1])
+redis.call('HSET', KEYS[2], '#claim', ARGV[2])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# KEYS: pending hash, lease, pending set; ARGV: id, token.
+_ACK = """
+if redis.call('HGET', KEYS[1], '#claim') == ARGV[2] then
+  redis.call('DEL', KEYS[1])
+  redis.call('SREM', KEYS[3], ARGV[1])
+end
+if redis.call('GET', KEYS[2]) == ARGV[2] then
+  redis.call('DEL', KEYS[2])
+end
+"""
+
+# KEYS: lease; ARGV: token.
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  redis.call('DEL', KEYS[1])
+end
+"""
+
+
+class RedisAutosaveBuffer(AutosaveBuffer):
+    """Buffer shared by all workers; buffered and pending answers survive a worker crash."""
+
+    def __init__(self, client, lease: float, prefix: str = "autosave"):
+        self.client = client
+        self.lease = lease
+        self.prefix = prefix
+        self._claim = client.register_script(_CLAIM)
+        self._ack = client.register_script(_ACK)
+        self._release = client.register_script(_RELEASE)
+
+    def _key(self, kind: str, assessment_id: int | None = None) -> str:
+        return f"{self.prefix}:{kind}" if assessment_id is None else f"{self.prefix}:{kind}:{assessment_id}"
+
+    def put(self, assessment_id, answer):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key("live", assessment_id), str(answer.question_id), _dump(answer))
+        pipe.zadd(self._key("dirty"), {str(assessment_id): time.time()}, nx=True)
+        pipe.execute()
+
+    def claim(self, assessment_id):
+        token = uuid.uuid4().hex
+        fields = self._claim(
+            keys=[
+                self._key("live", assessment_id),
+                self._key("pending", assessment_id),
+                self._key("lease", assessment_id),
+                self._key("dirty"),
+                self._key("pending"),
+            ],
+            args=[assessment_id, token, int(self.lease * 1000)],
+        )
+        if not fields:
+            return None
+        pairs = dict(zip(fields[::2], fields[1::2]))
+        pairs.pop(b"#claim", None)
+        answers = {int(question_id): _load(question_id, payload) for question_id, payload in pairs.items()}
+        return Claim(assessment_id, token, answers)
+
+    def ack(self, claim):
+        self._ack(
+            keys=[self._key("pending", claim.assessment_id), self._key("lease", claim.assessment_id), self._key("pending")],
+            args=[claim.assessment_id, claim.token],
+        )
+
+    def release(self, claim):
+        self._release(keys=[self._key("lease", claim.assessment_id)], args=[claim.token])
+
+    def is_leased(self, assessment_id):
+        return bool(self.client.exists(self._key("lease", assessment_id)))
+
+    def due(self, dirty_before):
+        dirty = self.client.zrangebyscore(self._key("dirty"), "-inf", dirty_before)
+        pending = self.client.smembers(self._key("pending"))
+        return list(dict.fromkeys(int(assessment_id) for assessment_id in [*dirty, *pending]))
+
+    def depth(self):
+        pipe = self.client.pipeline()
+        pipe.zrange(self._key("dirty"), 0, -1)
+        pipe.smembers(self._key("pending"))
+        dirty, pending = pipe.execute()
+        return len(set(dirty) | set(pending))
+
+
+_buffer: AutosaveBuffer | None = None
+_buffer_lock = threading.Lock()
+
+
+def get_autosave_buffer() -> AutosaveBuffer | None:
+    """The configured buffer, or None with AUTOSAVE_BACKEND=direct (answers are written as they arrive)."""
+    global _buffer
+    if _buffer is None and settings.AUTOSAVE_BACKEND != "direct":
+        with _buffer_lock:
+            if _buffer is None:
+                if settings.AUTOSAVE_BACKEND == "shared":
+                    import redis
+
+                    _buffer = RedisAutosaveBuffer(
+                        redis.Redis.from_url(settings.REDIS_URL),
+                        lease=settings.AUTOSAVE_FLUSH_LEASE,
+                        prefix=f"{settings.SERVICE_NAME}:autosave",
+                    )
+                else:
+                    _buffer = LocalAutosaveBuffer(lease=settings.AUTOSAVE_FLUSH_LEASE)
+    return _buffer
+
+
+registry.gauge(
+    "autosave_buffered_assessments",
+    "Assessments with autosaved answers not yet written to UserAnswer",
+    read=lambda: buffer.depth() if (buffer := get_autosave_buffer()) is not None else 0,
+)
+
+
+def _write_valid(user_assessment: UserAssessment, answers: list[AnswerData]) -> int:
+    # Buffered answers are validated only now; one bad answer must not keep
+    # the rest of the batch in the buffer forever.
+    try:
+        with transaction.atomic():
+            write_answers(user_assessment, answers)
+        return len(answers)
+    except ValueError:
+        pass
+    written = 0
+    for answer in answers:
+        try:
+            with transaction.atomic():
+                write_answers(user_assessment, [answer])
+            written += 1
+        except ValueError as exc:
+            autosave_dropped_answers.inc()
+            logger.warning("Dropping autosaved answer for assessment %s: %s", user_assessment.pk, exc)
+    return written
+
+
+def write_claim(user_assessment: UserAssessment, claim: Claim) -> int:
+    """Write claimed answers inside the caller's transaction; the caller acks after commit."""
+    return _write_valid(user_assessment, list(claim.answers.values()))
+
+
+def flush_assessment(assessment_id: int, buffer: AutosaveBuffer | None = None) -> int:
+    """Write one assessment's buffered answers; returns how many were written."""
+    buffer = buffer or get_autosave_buffer()
+    claim = buffer.claim(assessment_id) if buffer is not None else None
+    if claim is None:
+        return 0
+    try:
+        with transaction.atomic():
+            user_assessment = (
+                UserAssessment.objects.select_for_update()
+                .filter(pk=assessment_id, submitted_at__isnull=True)
+                .first()
+            )
+            if user_assessment is None:
+                logger.warning("Discarding autosaved answers of closed assessment %s", assessment_id)
+                written = 0
+            else:
+                written = write_claim(user_assessment, claim)
+    except Exception:
+        buffer.release(claim)
+        autosave_flush_failures.inc()
+        logger.exception("Autosave flush of assessment %s failed", assessment_id)
+        return 0
+    buffer.ack(claim)
+    autosave_flushes.inc()
+    autosave_flushed_answers.inc(written)
+    return written
+
+
+def flush_due(max_age: float | None = None, buffer: AutosaveBuffer | None = None) -> int:
+    """Flush assessments buffered for at least `max_age` seconds (all when None)."""
+    buffer = buffer or get_autosave_buffer()
+    if buffer is None:
+        return 0
+    dirty_before = float("inf") if max_age is None else time.time() - max_age
+    return sum(flush_assessment(assessment_id, buffer) for assessment_id in buffer.due(dirty_before))
+
+
+def claim_for_submit(assessment_id: int, buffer: AutosaveBuffer | None = None) -> Claim | None:
+    """
+    Claim an assessment's buffered answers for a section submit, waiting out
+    a background flush so buffered answers can never land after the page.
+    """
+    buffer = buffer or get_autosave_buffer()
+    if buffer is None:
+        return None
+    deadline = time.monotonic() + settings.AUTOSAVE_SUBMIT_WAIT
+    while True:
+        claim = buffer.claim(assessment_id)
+        if claim is not None:
+            return claim
+        if not buffer.is_leased(assessment_id):
+            # The lease may have been released since the attempt above.
+            return buffer.claim(assessment_id)
+        if time.monotonic() >= deadline:
+            raise ValueError("Autosaved answers are being saved; please retry.")
+        time.sleep(0.05)
+
+
+class AutosaveFlusher:
+    """Background thread flushing due assessments every `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._thread_pid: int | None = None
+        self._stopped = threading.Event()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                flush_due(self.interval)
+            except Exception:
+                logger.exception("Autosave flush cycle failed")
+            finally:
+                close_old_connections()
+
+    def start(self) -> None:
+        # Threads do not survive a fork, so each worker process starts its own.
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="autosave-flush", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def shutdown(self) -> None:
+        self.stop()
+        try:
+            flush_due()
+        except Exception:
+            logger.exception("Autosave flush at exit failed")
+
+
+flusher = AutosaveFlusher(interval=settings.AUTOSAVE_FLUSH_INTERVAL)
+
+
+def _owner_id(assessment_id: int) -> str | None:
+    cache = survey_cache()
+    key = OWNER_KEY.format(assessment_id)
+    owner = cache.get(key)
+    if owner is None:
+        owner = (
+            UserAssessment.objects.filter(pk=assessment_id, submitted_at__isnull=True)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+        if owner is not None:
+            cache.set(key, owner, timeout=OWNER_TIMEOUT)
+    return owner
+
+
+def autosave_answer(request_user, user_assessment_id: int, answer: AnswerData) -> None:
+    """
+    Buffer an in-progress answer; it reaches UserAnswer on the next flush
+    (interval, section submit, or `flush_autosave`). Only the assessment's
+    owner is checked here, from cache; the answer is validated when flushed.
+    With AUTOSAVE_BACKEND=direct it is written at once, as a one-answer page.
+    """
+    buffer = get_autosave_buffer()
+    if buffer is None:
+        submit_answers(request_user, user_assessment_id, [answer])
+        return
+    if _owner_id(user_assessment_id) != request_user.pk:
+        raise ValueError(f"Assessment not found: {user_assessment_id}")
+    buffer.put(user_assessment_id, answer)
+    if settings.AUTOSAVE_FLUSH_INTERVAL > 0:
+        flusher.start()
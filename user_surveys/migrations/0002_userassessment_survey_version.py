@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-17 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0008_surveyversion'),
+        ('user_surveys', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userassessment',
+            name='survey_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='surveys.surveyversion'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-17 19:40
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_open_enrollments(apps, schema_editor):
+    """
+    Keep the most advanced of each group of duplicate open enrollments and
+    drop the rest, which must not have answers yet.
+    """
+    UserAssessment = apps.get_model("user_surveys", "UserAssessment")
+    UserAnswer = apps.get_model("user_surveys", "UserAnswer")
+    seen = {}
+    duplicates = []
+    open_enrollments = (
+        UserAssessment.objects.filter(submitted_at__isnull=True)
+        .order_by(
+            "user_id",
+            "survey_id",
+            Coalesce("child_id", models.Value("")),
+            models.F("progress").desc(nulls_last=True),
+            "id",
+        )
+        .values_list("id", "user_id", "survey_id", "child_id")
+    )
+    for pk, user_id, survey_id, child_id in open_enrollments.iterator():
+        key = (user_id, survey_id, child_id or "")
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen[key] = pk
+    if not duplicates:
+        return
+
+    answered = sorted(
+        set(UserAnswer.objects.filter(user_assessment_id__in=duplicates).values_list("user_assessment_id", flat=True))
+    )
+    if answered:
+        raise RuntimeError(
+            "Duplicate open enrollments with answers must be merged or submitted by hand "
+            f"before adding uniq_open_user_assessment: {answered}"
+        )
+    UserAssessment.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_surveys', '0002_userassessment_survey_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_open_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userassessment',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('survey'), django.db.models.functions.comparison.Coalesce('child_id', models.Value('')), condition=models.Q(('submitted_at__isnull', True)), name='uniq_open_user_assessment'),
+        ),
+    ]
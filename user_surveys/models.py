@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -10,6 +12,7 @@ from surveys.models import (
     Question,
     Recommendation,
     Survey,
+    SurveyVersion,
 )
 
 UserModel = get_user_model()
@@ -18,9 +21,22 @@ UserModel = get_user_model()
 class UserAssessment(models.Model):
     class Meta:
         ordering = ["submitted_at"]
+        constraints = [
+            # One open enrollment per user, survey and child (no child counts
+            # as one). Enrollment inserts against it with ON CONFLICT.
+            models.UniqueConstraint(
+                F("user"),
+                F("survey"),
+                Coalesce("child_id", Value("")),
+                condition=Q(submitted_at__isnull=True),
+                name="uniq_open_user_assessment",
+            ),
+        ]
 
     is_paid = models.BooleanField(default=False)
     survey = models.ForeignKey(Survey, on_delete=models.SET_NULL, null=True, blank=True)
+    # Published snapshot the respondent answers against, pinned at enrollment.
+    survey_version = models.ForeignKey(SurveyVersion, on_delete=models.SET_NULL, null=True, blank=True)
     user = models.ForeignKey(UserModel, on_delete=models.SET_NULL, null=True, blank=True)
     child_id = models.CharField(max_length=255, null=True, blank=True)
     count_of_ending_options = models.IntegerField(default=0)
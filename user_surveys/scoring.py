@@ -0,0 +1,212 @@
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from surveys.definitions import SurveyDefinition, get_survey_definition
+from surveys.models import Survey
+from surveys.versions import get_version_definition
+from .models import UserAnswer, UserAssessment, UserAssessmentClassification, UserAssessmentRecommendation
+
+
+@dataclass(frozen=True)
+class ScoringTable:
+    """
+    A survey definition reduced to what evaluation reads. Options are
+    numbered 0..n-1 (`slots`); per-slot arrays hold the option's score, the
+    index of its classification in `classification_ids` (-1 for none), and,
+    CSR-style, the indexes of its recommendations in `recommendation_ids`
+    (`recommendations[recommendation_offsets[s]:recommendation_offsets[s + 1]]`).
+    """
+
+    slots: dict[int, int]
+    scores: array
+    classifications: array
+    recommendation_offsets: array
+    recommendations: array
+    classification_ids: tuple[int, ...]
+    recommendation_ids: tuple[int, ...]
+    # (lower_limit, upper_limit, action id) in Action ordering.
+    actions: tuple[tuple[float, float, int], ...]
+    use_score: bool
+    use_classifications: bool
+    use_recommendations: bool
+    use_actions: bool
+    # Evaluated on submit (is_evaluable with automatic evaluation).
+    automatic: bool
+
+
+def compile_scoring_table(definition: SurveyDefinition) -> ScoringTable:
+    classification_index = {row["id"]: index for index, row in enumerate(definition.classifications)}
+    recommendation_ids: dict[int, int] = {}
+    slots = {}
+    scores, classifications = array("q"), array("l")
+    recommendation_offsets, recommendations = array("l", [0]), array("l")
+
+    for section in definition.sections:
+        for question in section["questions"]:
+            schema = question["answer_schema"]
+            for option in schema["options"] if schema is not None else ():
+                fields = option["fields"]
+                slots[fields["id"]] = len(scores)
+                scores.append(fields["score"] or 0)
+                classifications.append(classification_index.get(fields["classification_id"], -1))
+                for recommendation in option["recommendations"]:
+                    recommendations.append(recommendation_ids.setdefault(recommendation["id"], len(recommendation_ids)))
+                recommendation_offsets.append(len(recommendations))
+
+    survey = definition.survey
+    return ScoringTable(
+        slots=slots,
+        scores=scores,
+        classifications=classifications,
+        recommendation_offsets=recommendation_offsets,
+        recommendations=recommendations,
+        classification_ids=tuple(row["id"] for row in definition.classifications),
+        recommendation_ids=tuple(recommendation_ids),
+        actions=tuple((row["lower_limit"], row["upper_limit"], row["id"]) for row in definition.actions),
+        use_score=survey["use_score"],
+        use_classifications=survey["use_classifications"],
+        use_recommendations=survey["use_recommendations"],
+        use_actions=survey["use_actions"],
+        automatic=bool(survey["is_evaluable"])
+        and survey["evaluation_type"] == Survey.EVALUATION_TYPE_AUTOMATIC_EVALUATION,
+    )
+
+
+class _LocalScoringTables:
+    """Per-process LRU of compiled tables by (survey id, definition version)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: OrderedDict[tuple[int, str], ScoringTable] = OrderedDict()
+
+    def get(self, definition: SurveyDefinition) -> ScoringTable:
+        key = (definition.survey_id, definition.version)
+        with self._lock:
+            table = self._items.get(key)
+            if table is not None:
+                self._items.move_to_end(key)
+                return table
+        table = compile_scoring_table(definition)
+        with self._lock:
+            self._items[key] = table
+            while len(self._items) > settings.SURVEYS_DEFINITION_LOCAL_SIZE:
+                self._items.popitem(last=False)
+        return table
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+local_scoring_tables = _LocalScoringTables()
+
+
+def get_scoring_table(user_assessment: UserAssessment) -> ScoringTable | None:
+    """Table for the version the assessment was taken against (the live survey if unpinned)."""
+    if user_assessment.survey_version_id is not None:
+        definition = get_version_definition(user_assessment.survey_version_id)
+    else:
+        definition = get_survey_definition(user_assessment.survey_id)
+    return local_scoring_tables.get(definition) if definition is not None else None
+
+
+@dataclass(frozen=True)
+class Evaluation:
+    score: int
+    # Answer id -> sum of its selected options' scores.
+    answer_scores: dict[int, int]
+    classification_counts: dict[int, int]
+    recommendation_counts: dict[int, int]
+    action_id: int | None
+
+
+def evaluate_selections(table: ScoringTable, selections: list[tuple[int, int]]) -> Evaluation:
+    """Evaluate (answer id, option id) pairs; options not in the table count for nothing."""
+    answer_ids = array("q")
+    option_slots = array("l")
+    for answer_id, option_id in selections:
+        slot = table.slots.get(option_id)
+        if slot is not None:
+            answer_ids.append(answer_id)
+            option_slots.append(slot)
+
+    scores = [table.scores[slot] for slot in option_slots]
+    answer_scores = Counter()
+    for answer_id, score in zip(answer_ids, scores):
+        answer_scores[answer_id] += score
+    score = sum(scores)
+
+    classification_counts = {}
+    if table.use_classifications:
+        counts = Counter(table.classifications[slot] for slot in option_slots)
+        counts.pop(-1, None)
+        classification_counts = {table.classification_ids[index]: count for index, count in counts.items()}
+
+    recommendation_counts = {}
+    if table.use_recommendations:
+        offsets, recommendations = table.recommendation_offsets, table.recommendations
+        counts = Counter(
+            index for slot in option_slots for index in recommendations[offsets[slot]:offsets[slot + 1]]
+        )
+        recommendation_counts = {table.recommendation_ids[index]: count for index, count in counts.items()}
+
+    action_id = None
+    if table.use_actions:
+        action_id = next((action for lower, upper, action in table.actions if lower <= score <= upper), None)
+
+    return Evaluation(score, dict(answer_scores), classification_counts, recommendation_counts, action_id)
+
+
+def evaluate_assessment(user_assessment: UserAssessment, table: ScoringTable | None = None) -> Evaluation | None:
+    """
+    Score a submitted assessment against its compiled table and store the
+    score, per-answer scores, classification and recommendation counts and
+    action, replacing any earlier evaluation (answers without scored options
+    get a null score). Returns None if the survey no longer exists.
+    """
+    table = table or get_scoring_table(user_assessment)
+    if table is None:
+        return None
+
+    # One row per selected option, and (answer id, None) for answers without
+    # any, so every answer's score is rewritten below.
+    rows = list(
+        UserAnswer.objects.filter(user_assessment=user_assessment).values_list("id", "selected_options")
+    )
+    selections = [(answer_id, option_id) for answer_id, option_id in rows if option_id is not None]
+    evaluation = evaluate_selections(table, selections)
+    scored = {answer_id for answer_id, _ in selections} if table.use_score else set()
+
+    with transaction.atomic():
+        answers = [
+            UserAnswer(pk=answer_id, score=evaluation.answer_scores.get(answer_id, 0) if answer_id in scored else None)
+            for answer_id in {answer_id for answer_id, _ in rows}
+        ]
+        if answers:
+            UserAnswer.objects.bulk_update(answers, ["score"])
+        UserAssessmentClassification.objects.filter(user_assessment=user_assessment).delete()
+        UserAssessmentClassification.objects.bulk_create(
+            [
+                UserAssessmentClassification(user_assessment=user_assessment, classification_id=pk, count=count)
+                for pk, count in evaluation.classification_counts.items()
+            ]
+        )
+        UserAssessmentRecommendation.objects.filter(user_assessment=user_assessment).delete()
+        UserAssessmentRecommendation.objects.bulk_create(
+            [
+                UserAssessmentRecommendation(user_assessment=user_assessment, recommendation_id=pk, count=count)
+                for pk, count in evaluation.recommendation_counts.items()
+            ]
+        )
+        user_assessment.score = evaluation.score if table.use_score else None
+        user_assessment.action_id = evaluation.action_id
+        user_assessment.evaluated_at = now()
+        user_assessment.save(update_fields=["score", "action", "evaluated_at"])
+    return evaluation
+
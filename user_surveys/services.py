@@ -1,51 +1,170 @@
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 
 from .models import UserAssessment
 from surveys.models import Survey
 from user_surveys.models import UserAssessment as AssessmentModel  # alias if needed for clarity
 
+BULK_ENROLLMENT_ATTEMPTS = 3
+
+
+def _enrollment_child(survey, child_id) -> str | None:
+    if not getattr(survey, "assignable_to_user", False):
+        return None
+    if not child_id:
+        raise ValueError("child_id is required for this survey.")
+    # In this codebase we store child_id as a string on UserAssessment; no Child model present.
+    return str(child_id)
+
+
+def open_enrollments(survey):
+    """Open enrollments of `survey`, with `child_key` matching uniq_open_user_assessment."""
+    return UserAssessment.objects.alias(child_key=Coalesce("child_id", Value(""))).filter(
+        survey=survey,
+        submitted_at__isnull=True,
+    )
+
+
+def _upsert_open_enrollment(assessment: UserAssessment) -> tuple[UserAssessment, bool]:
+    """
+    INSERT ... ON CONFLICT against uniq_open_user_assessment, returning the
+    new row or the open one that already existed, in one statement. The
+    no-op update locks the existing row so a concurrent insert is returned
+    rather than missed.
+    """
+    connection = connections[router.db_for_write(UserAssessment)]
+    meta = UserAssessment._meta
+    quote = connection.ops.quote_name
+    fields = [field for field in meta.concrete_fields if not field.primary_key]
+    returned = meta.concrete_fields
+    child = quote(meta.get_field("child_id").column)
+    sql = (
+        f"INSERT INTO {quote(meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT ({quote(meta.get_field('user').column)}, {quote(meta.get_field('survey').column)}, "
+        f"(COALESCE({child}, ''))) WHERE {quote(meta.get_field('submitted_at').column)} IS NULL "
+        f"DO UPDATE SET {child} = {quote(meta.db_table)}.{child} "
+        f"RETURNING {', '.join(quote(field.column) for field in returned)}, (xmax = 0)"
+    )
+    params = [field.get_db_prep_save(field.pre_save(assessment, True), connection) for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        *values, created = cursor.fetchone()
+    return UserAssessment.from_db(connection.alias, [field.attname for field in returned], values), created
+
 
 def enroll_user_in_assessment(request_user, survey_id, child_id=None):
     """
     Enroll the given user into a survey (assessment).
     Returns (user_assessment, created) where created is False if an open enrollment already exists.
     """
-    survey = get_object_or_404(Survey, id=survey_id)
-
-    if getattr(survey, "assignable_to_user", False):
-        if not child_id:
-            raise ValueError("child_id is required for this survey.")
-
-        # In this codebase we store child_id as a string on UserAssessment; no Child model present.
-        child = str(child_id)
-
-        existing = UserAssessment.objects.filter(
-            user=request_user,
-            survey=survey,
-            child_id=child,
-            submitted_at__isnull=True,
-        ).first()
-        if existing:
-            return existing, False
-
-        user_assessment = UserAssessment.objects.create(
-            user=request_user,
-            survey=survey,
-            child_id=child,
-        )
-        return user_assessment, True
-
-    existing = UserAssessment.objects.filter(
+    survey = get_object_or_404(
+        Survey.objects.only("id", "assignable_to_user", "published_version_id"),
+        id=survey_id,
+    )
+    child = _enrollment_child(survey, child_id)
+    assessment = UserAssessment(
         user=request_user,
         survey=survey,
-        child_id__isnull=True,
-        submitted_at__isnull=True,
-    ).first()
-    if existing:
-        return existing, False
+        survey_version_id=survey.published_version_id,
+        child_id=child,
+    )
 
-    user_assessment = UserAssessment.objects.create(
-        user=request_user,
-        survey=survey,
+    if connections[router.db_for_write(UserAssessment)].vendor == "postgresql":
+        return _upsert_open_enrollment(assessment)
+
+    # Elsewhere the constraint still arbitrates: insert, and on a conflict
+    # read back the enrollment that won.
+    try:
+        with transaction.atomic():
+            assessment.save(force_insert=True)
+        return assessment, True
+    except IntegrityError:
+        return open_enrollments(survey).get(user=request_user, child_key=child or ""), False
+
+
+@dataclass
+class BulkEnrollmentResult:
+    created: list[UserAssessment] = field(default_factory=list)
+    existing: list[UserAssessment] = field(default_factory=list)
+
+
+def _enrollment_key(user_id, child_id) -> tuple[str, str | None]:
+    return str(user_id), child_id or None
+
+
+def _bulk_enroll(survey, pairs, batch_size: int) -> BulkEnrollmentResult:
+    existing: dict[tuple[str, str | None], UserAssessment] = {}
+    matches = open_enrollments(survey).filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        child_key__in={child_id or "" for _, child_id in pairs},
+    )
+    for assessment in matches:
+        existing[_enrollment_key(assessment.user_id, assessment.child_id)] = assessment
+
+    created = UserAssessment.objects.bulk_create(
+        [
+            UserAssessment(
+                user_id=user_id,
+                survey=survey,
+                survey_version_id=survey.published_version_id,
+                child_id=child_id,
+            )
+            for user_id, child_id in pairs
+            if (user_id, child_id) not in existing
+        ],
+        batch_size=batch_size,
+    )
+
+    return BulkEnrollmentResult(
+        created=created,
+        existing=[existing[pair] for pair in pairs if pair in existing],
+    )
+
+
+def bulk_enroll_users_in_assessment(
+    survey_id,
+    enrollments: Iterable[tuple[str, str | None]],
+    batch_size: int = 1000,
+) -> BulkEnrollmentResult:
+    """
+    Enroll many (user_id, child_id) pairs into a survey at once. Open
+    enrollments are looked up with one query and the missing ones inserted in
+    batches; users not seen before (no login yet) get a placeholder row that
+    their first token fills in. Duplicate pairs are enrolled once.
+    """
+    survey = get_object_or_404(
+        Survey.objects.only("id", "assignable_to_user", "published_version_id"),
+        id=survey_id,
+    )
+
+    pairs: dict[tuple[str, str | None], None] = {}
+    for user_id, child_id in enrollments:
+        if not user_id:
+            raise ValueError("user_id is required for every enrollment.")
+        pairs[_enrollment_key(user_id, _enrollment_child(survey, child_id))] = None
+    if not pairs:
+        return BulkEnrollmentResult()
+
+    UserModel = get_user_model()
+    user_ids = {user_id for user_id, _ in pairs}
+    UserModel.objects.bulk_create(
+        [UserModel(id=user_id, username=user_id) for user_id in sorted(user_ids)],
+        batch_size=batch_size,
+        ignore_conflicts=True,
     )
-    return user_assessment, True
+    # A concurrent enrollment of one of the pairs fails the batch on
+    # uniq_open_user_assessment; look the open rows up again and retry.
+    for attempt in range(BULK_ENROLLMENT_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _bulk_enroll(survey, pairs, batch_size)
+        except IntegrityError:
+            if attempt == BULK_ENROLLMENT_ATTEMPTS - 1:
+                raise
@@ -1,3 +1,408 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+
+from surveys.definitions import local_definitions, local_versions
+from surveys.models import Action, AnswerSchemaOption, Classification, Question, Recommendation, Survey
+from surveys.tests import create_exam, create_survey
+from user_surveys import autosave
+from user_surveys.answers import AnswerData, submit_answers, submit_assessment
+from user_surveys.autosave import LocalAutosaveBuffer, RedisAutosaveBuffer, autosave_answer, flush_assessment
+from user_surveys.models import UserAnswer, UserAssessment, UserAssessmentClassification, UserAssessmentRecommendation
+from user_surveys.scoring import evaluate_assessment, local_scoring_tables
+from user_surveys.services import bulk_enroll_users_in_assessment, enroll_user_in_assessment
+
+
+def exam_options(survey: Survey) -> dict[int, list[int]]:
+    """Option ids of each question of a create_exam survey, in creation order."""
+    options = {}
+    for option_id, question_id in AnswerSchemaOption.objects.filter(survey=survey).values_list("id", "question_id"):
+        options.setdefault(question_id, []).append(option_id)
+    return options
+
+
+def choose(options: dict[int, list[int]], questions, choice: int = 0) -> list[AnswerData]:
+    """Answer each question with its `choice`-th option."""
+    return [
+        AnswerData(question_id=question.pk, selected_option_ids=(options[question.pk][choice],)) for question in questions
+    ]
+
+
+class EnrollmentTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(id="user-1", username="user")
+
+    def test_enrollment_is_idempotent_while_open(self):
+        survey = Survey.objects.create(title="Quiz")
+
+        first, created = enroll_user_in_assessment(self.user, survey.pk)
+        again, created_again = enroll_user_in_assessment(self.user, survey.pk)
+
+        self.assertEqual((created, created_again), (True, False))
+        self.assertEqual(again.pk, first.pk)
+
+        UserAssessment.objects.filter(pk=first.pk).update(submitted_at="2026-01-01T00:00:00Z")
+        retake, created = enroll_user_in_assessment(self.user, survey.pk)
+        self.assertTrue(created)
+        self.assertNotEqual(retake.pk, first.pk)
+
+    def test_constraint_rejects_a_second_open_enrollment(self):
+        survey = Survey.objects.create(title="Quiz")
+        UserAssessment.objects.create(user=self.user, survey=survey)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserAssessment.objects.create(user=self.user, survey=survey, child_id="")
+        UserAssessment.objects.create(user=self.user, survey=survey, child_id="child-1")
+
+    def test_deleting_a_survey_keeps_pinned_enrollments(self):
+        survey = create_survey()
+        assessment, _ = enroll_user_in_assessment(self.user, survey.pk)
+        self.assertIsNotNone(assessment.survey_version_id)
+
+        survey.delete()
+
+        assessment.refresh_from_db()
+        self.assertEqual((assessment.survey_id, assessment.survey_version_id), (None, None))
+
+
+class BulkEnrollmentTests(TestCase):
+    def setUp(self):
+        self.survey = Survey.objects.create(title="Exam", assignable_to_user=True)
+        self.parent = get_user_model().objects.create(id="parent-1", username="parent")
+
+    def test_reports_created_and_existing_enrollments(self):
+        existing, _ = enroll_user_in_assessment(self.parent, self.survey.pk, child_id="child-1")
+        pairs = [("parent-1", "child-1"), ("parent-1", "child-2"), ("parent-2", "child-3"), ("parent-1", "child-2")]
+
+        # survey, savepoint, users, open enrollments, one INSERT, release
+        with self.assertNumQueries(6):
+            result = bulk_enroll_users_in_assessment(self.survey.pk, pairs)
+
+        self.assertEqual([assessment.pk for assessment in result.existing], [existing.pk])
+        self.assertEqual(
+            [(assessment.user_id, assessment.child_id) for assessment in result.created],
+            [("parent-1", "child-2"), ("parent-2", "child-3")],
+        )
+        self.assertTrue(all(assessment.pk for assessment in result.created))
+        self.assertTrue(get_user_model().objects.filter(pk="parent-2").exists())
+
+        again = bulk_enroll_users_in_assessment(self.survey.pk, pairs)
+        self.assertEqual(again.created, [])
+        self.assertEqual(len(again.existing), 3)
+        self.assertEqual(UserAssessment.objects.filter(survey=self.survey).count(), 3)
+
+    def test_submitted_enrollments_are_not_reused(self):
+        existing, _ = enroll_user_in_assessment(self.parent, self.survey.pk, child_id="child-1")
+        UserAssessment.objects.filter(pk=existing.pk).update(submitted_at="2026-01-01T00:00:00Z")
+
+        result = bulk_enroll_users_in_assessment(self.survey.pk, [("parent-1", "child-1")])
+
+        self.assertEqual(len(result.created), 1)
+        self.assertEqual(result.existing, [])
+
+    def test_child_id_is_required_for_assignable_surveys(self):
+        with self.assertRaises(ValueError):
+            bulk_enroll_users_in_assessment(self.survey.pk, [("parent-1", None)])
+
+
+class SubmitAnswersTests(TestCase):
+    def setUp(self):
+        caches["surveys"].clear()
+        local_versions.clear()
+        self.user = get_user_model().objects.create(id="user-1", username="user")
+        self.survey = create_exam(50)
+        self.assessment, _ = enroll_user_in_assessment(self.user, self.survey.pk)
+        self.questions = list(Question.objects.filter(survey=self.survey).order_by("order"))
+        self.options = exam_options(self.survey)
+
+    def test_section_submit_costs_a_fixed_number_of_queries(self):
+        # assessment, questions, options, existing answers, answers INSERT,
+        # selections INSERT, progress, assessment UPDATE, plus the savepoint pair
+        with self.assertNumQueries(10):
+            submit_answers(self.user, self.assessment.pk, choose(self.options, self.questions))
+
+        self.assessment.refresh_from_db()
+        self.assertEqual(self.assessment.progress, 100)
+        self.assertEqual(self.assessment.last_question_id, self.questions[-1].pk)
+        self.assertEqual(UserAnswer.objects.filter(user_assessment=self.assessment).count(), 50)
+        self.assertEqual(UserAnswer.selected_options.through.objects.count(), 50)
+
+    def test_resubmitting_replaces_answers(self):
+        submit_answers(self.user, self.assessment.pk, choose(self.options, self.questions[:10]))
+        submit_answers(self.user, self.assessment.pk, choose(self.options, self.questions[:5], choice=1))
+
+        self.assessment.refresh_from_db()
+        self.assertEqual(self.assessment.progress, 20)
+        self.assertEqual(self.assessment.last_question_id, self.questions[4].pk)
+        self.assertEqual(UserAnswer.objects.filter(user_assessment=self.assessment).count(), 10)
+        first = UserAnswer.objects.get(user_assessment=self.assessment, question=self.questions[0])
+        self.assertEqual(list(first.selected_options.values_list("id", flat=True)), [self.options[self.questions[0].pk][1]])
+
+    def test_pinned_version_decides_valid_questions_and_progress(self):
+        survey = create_exam(4)
+        survey.update_status("published")
+        assessment, _ = enroll_user_in_assessment(self.user, survey.pk)
+        self.assertIsNotNone(assessment.survey_version_id)
+        first, second, removed, _ = Question.objects.filter(survey=survey).order_by("order")
+        options = dict(AnswerSchemaOption.objects.filter(survey=survey).values_list("question_id", "id").order_by("-order"))
+
+        # Draft edits after publishing: a new question, and one removed.
+        added = Question.objects.create(survey=survey, section=first.section)
+        removed_id = removed.pk
+        removed.delete()
+
+        with self.assertRaises(ValueError):
+            submit_answers(self.user, assessment.pk, [AnswerData(question_id=added.pk, answer="draft only")])
+        submit_answers(
+            self.user,
+            assessment.pk,
+            [
+                AnswerData(question_id=first.pk, selected_option_ids=(options[first.pk],)),
+                AnswerData(question_id=second.pk, selected_option_ids=(options[second.pk],)),
+                AnswerData(question_id=removed_id, answer="no longer stored"),
+            ],
+        )
+
+        assessment.refresh_from_db()
+        # Two of the three snapshot questions that still exist.
+        self.assertEqual(assessment.progress, 67)
+        self.assertEqual(assessment.last_question_id, second.pk)
+        self.assertEqual(UserAnswer.objects.filter(user_assessment=assessment).count(), 2)
+
+    def test_rejects_foreign_options_and_other_users(self):
+        foreign = AnswerData(question_id=self.questions[0].pk, selected_option_ids=(self.options[self.questions[1].pk][0],))
+        with self.assertRaises(ValueError):
+            submit_answers(self.user, self.assessment.pk, [foreign])
+        stranger = get_user_model().objects.create(id="user-2", username="stranger")
+        with self.assertRaises(ValueError):
+            submit_answers(stranger, self.assessment.pk, choose(self.options, self.questions[:1]))
+        self.assertFalse(UserAnswer.objects.exists())
+
+
+@override_settings(AUTOSAVE_FLUSH_INTERVAL=0)
+class AutosaveTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(id="user-1", username="user")
+        self.survey = create_exam(3)
+        self.assessment, _ = enroll_user_in_assessment(self.user, self.survey.pk)
+        self.questions = list(Question.objects.filter(survey=self.survey).order_by("order"))
+        self.buffer = LocalAutosaveBuffer(lease=60)
+        patcher = mock.patch.object(autosave, "_buffer", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def answer(self, question, text: str) -> AnswerData:
+        return AnswerData(question_id=question.pk, answer=text)
+
+    def saved(self) -> dict[int, str]:
+        return dict(UserAnswer.objects.filter(user_assessment=self.assessment).values_list("question_id", "answer"))
+
+    def test_buffered_answers_are_coalesced_into_one_write(self):
+        for text in ("a", "ab", "abc"):
+            autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[0], text))
+        autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[1], "x"))
+        self.assertFalse(UserAnswer.objects.exists())
+        self.assertEqual(self.buffer.depth(), 1)
+
+        self.assertEqual(flush_assessment(self.assessment.pk), 2)
+
+        self.assertEqual(self.saved(), {self.questions[0].pk: "abc", self.questions[1].pk: "x"})
+        self.assertEqual(self.buffer.depth(), 0)
+
+    def test_failed_flush_keeps_answers_for_retry(self):
+        autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[0], "first"))
+        with mock.patch.object(autosave, "write_answers", side_effect=RuntimeError("database went away")), \
+                self.assertLogs("user_surveys.autosave", "ERROR"):
+            self.assertEqual(flush_assessment(self.assessment.pk), 0)
+        autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[1], "second"))
+
+        self.assertEqual(flush_assessment(self.assessment.pk), 2)
+        self.assertEqual(self.saved(), {self.questions[0].pk: "first", self.questions[1].pk: "second"})
+
+    def test_section_submit_flushes_buffer_before_the_page(self):
+        autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[0], "draft"))
+        autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[1], "kept"))
+
+        submit_answers(self.user, self.assessment.pk, [self.answer(self.questions[0], "final")])
+
+        self.assertEqual(self.saved(), {self.questions[0].pk: "final", self.questions[1].pk: "kept"})
+        self.assertEqual(self.buffer.depth(), 0)
+
+    def test_rejects_other_users_and_drops_invalid_answers(self):
+        stranger = get_user_model().objects.create(id="user-2", username="stranger")
+        with self.assertRaises(ValueError):
+            autosave_answer(stranger, self.assessment.pk, self.answer(self.questions[0], "nope"))
+
+        autosave_answer(self.user, self.assessment.pk, AnswerData(question_id=-1, answer="lost"))
+        autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[2], "ok"))
+        with self.assertLogs("user_surveys.autosave", "WARNING"):
+            self.assertEqual(flush_assessment(self.assessment.pk), 1)
+        self.assertEqual(self.saved(), {self.questions[2].pk: "ok"})
+
+    @override_settings(AUTOSAVE_BACKEND="direct")
+    def test_direct_backend_writes_without_buffering(self):
+        with mock.patch.object(autosave, "_buffer", None):
+            autosave_answer(self.user, self.assessment.pk, self.answer(self.questions[0], "now"))
+            self.assertEqual(self.saved(), {self.questions[0].pk: "now"})
+
+            stranger = get_user_model().objects.create(id="user-2", username="stranger")
+            with self.assertRaises(ValueError):
+                autosave_answer(stranger, self.assessment.pk, self.answer(self.questions[1], "nope"))
+            self.assertEqual(flush_assessment(self.assessment.pk), 0)
+
+
+@override_settings(AUTOSAVE_FLUSH_INTERVAL=0)
+class RedisAutosaveBufferTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(id="user-1", username="user")
+        self.survey = create_exam(2)
+        self.assessment, _ = enroll_user_in_assessment(self.user, self.survey.pk)
+        self.questions = list(Question.objects.filter(survey=self.survey).order_by("order"))
+        self.client = fakeredis.FakeRedis()
+        self.buffer = RedisAutosaveBuffer(self.client, lease=60, prefix="test")
+
+    def answer(self, question, text: str) -> AnswerData:
+        return AnswerData(question_id=question.pk, answer=text)
+
+    def test_claim_coalesces_and_excludes_other_flushes(self):
+        for text in ("a", "ab"):
+            self.buffer.put(self.assessment.pk, self.answer(self.questions[0], text))
+        self.buffer.put(self.assessment.pk, AnswerData(question_id=self.questions[1].pk, selected_option_ids=(7,)))
+        self.assertEqual(self.buffer.due(time.time()), [self.assessment.pk])
+
+        claim = self.buffer.claim(self.assessment.pk)
+
+        self.assertEqual(
+            claim.answers,
+            {
+                self.questions[0].pk: self.answer(self.questions[0], "ab"),
+                self.questions[1].pk: AnswerData(question_id=self.questions[1].pk, selected_option_ids=(7,)),
+            },
+        )
+        self.assertIsNone(self.buffer.claim(self.assessment.pk))
+        self.assertTrue(self.buffer.is_leased(self.assessment.pk))
+        self.assertEqual(self.buffer.depth(), 1)
+
+    def test_expired_lease_is_reclaimed_with_newer_answers(self):
+        self.buffer.lease = 0.05
+        self.buffer.put(self.assessment.pk, self.answer(self.questions[0], "first"))
+        crashed = self.buffer.claim(self.assessment.pk)
+        self.buffer.put(self.assessment.pk, self.answer(self.questions[1], "second"))
+        time.sleep(0.1)
+
+        retry = self.buffer.claim(self.assessment.pk)
+        self.assertEqual(sorted(retry.answers), [self.questions[0].pk, self.questions[1].pk])
+
+        # The crashed flush coming back must not discard what the retry holds.
+        self.buffer.ack(crashed)
+        self.assertEqual(self.buffer.depth(), 1)
+        self.buffer.ack(retry)
+        self.assertEqual(self.buffer.depth(), 0)
+        self.assertEqual(self.client.keys("test:*"), [])
+
+    def test_pending_answers_are_kept_until_the_write_commits(self):
+        self.buffer.put(self.assessment.pk, self.answer(self.questions[0], "saved"))
+        with mock.patch.object(autosave, "write_answers", side_effect=RuntimeError("database went away")), \
+                self.assertLogs("user_surveys.autosave", "ERROR"):
+            self.assertEqual(flush_assessment(self.assessment.pk, self.buffer), 0)
+        self.assertFalse(UserAnswer.objects.exists())
+        self.assertEqual(self.buffer.due(0), [self.assessment.pk])
+
+        self.assertEqual(flush_assessment(self.assessment.pk, self.buffer), 1)
+
+        self.assertEqual(
+            list(UserAnswer.objects.filter(user_assessment=self.assessment).values_list("answer", flat=True)), ["saved"]
+        )
+        self.assertEqual(self.buffer.depth(), 0)
+
+
+class ScoringTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(id="user-1", username="user")
+        self.survey = create_exam(10)
+        self.configure(is_evaluable=True, use_recommendations=True, use_actions=True)
+        retake, passed = Action.objects.filter(survey=self.survey).order_by("id")
+        Action.objects.filter(pk=retake.pk).update(lower_limit=0, upper_limit=14)
+        Action.objects.filter(pk=passed.pk).update(lower_limit=15, upper_limit=30)
+        self.passed = passed
+        self.assessment, _ = enroll_user_in_assessment(self.user, self.survey.pk)
+        self.questions = list(Question.objects.filter(survey=self.survey).order_by("order"))
+        self.options = exam_options(self.survey)
+        caches["surveys"].clear()
+        local_definitions.clear()
+        local_scoring_tables.clear()
+
+    def configure(self, **fields):
+        for name, value in fields.items():
+            setattr(self.survey, name, value)
+        self.survey.save(update_fields=list(fields))
+
+    def test_submit_evaluates_score_classifications_recommendations_and_action(self):
+        assessment = submit_assessment(self.user, self.assessment.pk, choose(self.options, self.questions, choice=2))
+
+        assessment.refresh_from_db()
+        self.assertIsNotNone(assessment.submitted_at)
+        self.assertIsNotNone(assessment.evaluated_at)
+        self.assertEqual(assessment.score, 20)
+        self.assertEqual(assessment.action_id, self.passed.pk)
+        self.assertEqual(set(UserAnswer.objects.filter(user_assessment=assessment).values_list("score", flat=True)), {2})
+        level_2 = Classification.objects.get(survey=self.survey, name="Level 2")
+        self.assertEqual(
+            list(UserAssessmentClassification.objects.filter(user_assessment=assessment).values_list("classification", "count")),
+            [(level_2.pk, 10)],
+        )
+        recommended = Recommendation.objects.filter(option_id__in=[self.options[q.pk][2] for q in self.questions])
+        self.assertEqual(
+            set(UserAssessmentRecommendation.objects.filter(user_assessment=assessment).values_list("recommendation", "count")),
+            {(recommendation.pk, 1) for recommendation in recommended},
+        )
+
+    def test_evaluation_cost_does_not_grow_with_answers(self):
+        submit_answers(self.user, self.assessment.pk, choose(self.options, self.questions, choice=1))
+        evaluate_assessment(self.assessment)
+
+        # survey version, answers with selections, then answer scores, classifications
+        # DELETE + INSERT, recommendations DELETE (none to insert) and the
+        # assessment UPDATE, plus the savepoint pair
+        with self.assertNumQueries(9):
+            evaluation = evaluate_assessment(self.assessment)
+        self.assertEqual(evaluation.score, 10)
+        self.assertNotEqual(evaluation.action_id, self.passed.pk)
+
+    def test_reevaluation_clears_scores_of_answers_without_options(self):
+        submit_answers(self.user, self.assessment.pk, choose(self.options, self.questions, choice=2))
+        evaluate_assessment(self.assessment)
+        submit_answers(self.user, self.assessment.pk, [AnswerData(question_id=self.questions[0].pk, answer="skipped")])
+
+        evaluation = evaluate_assessment(self.assessment)
+
+        self.assertEqual(evaluation.score, 18)
+        first = UserAnswer.objects.get(user_assessment=self.assessment, question=self.questions[0])
+        self.assertIsNone(first.score)
+        self.assertEqual(UserAnswer.objects.filter(user_assessment=self.assessment, score=2).count(), 9)
+
+    def test_disabled_outputs_are_not_stored(self):
+        self.configure(use_score=False, use_classifications=False, use_recommendations=False, use_actions=False)
+        assessment = submit_assessment(self.user, self.assessment.pk, choose(self.options, self.questions, choice=3))
+
+        assessment.refresh_from_db()
+        self.assertIsNotNone(assessment.evaluated_at)
+        self.assertEqual((assessment.score, assessment.action_id), (None, None))
+        self.assertFalse(UserAnswer.objects.filter(user_assessment=assessment, score__isnull=False).exists())
+        self.assertFalse(UserAssessmentClassification.objects.exists())
+        self.assertFalse(UserAssessmentRecommendation.objects.exists())
+
+    def test_manual_evaluation_surveys_are_only_closed(self):
+        self.configure(evaluation_type=Survey.EVALUATION_TYPE_MANUAL_EVALUATION)
+        assessment = submit_assessment(self.user, self.assessment.pk, choose(self.options, self.questions, choice=2))
+
+        assessment.refresh_from_db()
+        self.assertIsNotNone(assessment.submitted_at)
+        self.assertIsNone(assessment.evaluated_at)
+        with self.assertRaises(ValueError):
+            submit_assessment(self.user, self.assessment.pk)